@@ -1,48 +1,242 @@
 from mcp.types import TextContent
 from mcp import types
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Iterator, Union
 import math
 import re
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
-from rich import box
-from pywinauto.application import Application
-import win32gui
-import win32con
-import time
-from PIL import Image as PILImage
+import sys
+import importlib.util
+import itertools
+from collections import Counter
+from decimal import Decimal, MAX_EMAX, localcontext
+from output import ConsoleSink
+from evaluation_context import current_context
+from verification import EVALUATOR_VERSION, evaluate_expression
+from memory import CACHEABLE_EXPRESSION
+from result_cache import normalize_expression
+import number_theory
 
-console = Console()
+def _lazy_import(name: str):
+    """Import a module on first attribute access, or return None when it is not installed."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+# NumPy is only loaded once a list tool runs; scalar tools keep working without it
+np = _lazy_import("numpy")
+
+try:
+    # Only needed by the Windows Paint tools
+    from pywinauto.application import Application
+    import win32gui
+    import win32con
+    from PIL import Image as PILImage
+except ImportError:
+    Application = win32gui = win32con = PILImage = None
+
+# Values processed per step by the list tools, which bounds temporary memory
+CHUNK_SIZE = 1 << 16
+
+# Significant digits returned by int_list_to_exponential_sum(mode="exact")
+EXACT_SUM_DIGITS = 50
+
+def _is_array(value: Any) -> bool:
+    """Whether a tool argument holds many values rather than one."""
+    # Only a value of a NumPy type can be an ndarray, so scalar calls never trigger the import
+    return isinstance(value, (list, tuple)) or (
+        type(value).__module__ == "numpy" and isinstance(value, np.ndarray)
+    )
+
+def _as_array(value: Any, dtype=float):
+    """Convert a tool argument to a NumPy array."""
+    if np is None:
+        raise ImportError("NumPy is required for array inputs")
+    return np.asarray(value, dtype=dtype)
+
+def _iter_chunks(values: Any) -> Iterator[Any]:
+    """Yield float64 arrays of at most CHUNK_SIZE values from a sequence or any iterable."""
+    if isinstance(values, (list, tuple, np.ndarray)):
+        for start in range(0, len(values), CHUNK_SIZE):
+            yield np.asarray(values[start:start + CHUNK_SIZE], dtype=float)
+        return
+    iterator = iter(values)
+    while True:
+        chunk = np.fromiter(itertools.islice(iterator, CHUNK_SIZE), dtype=float)
+        if not chunk.size:
+            return
+        yield chunk
+
+def _float_exp_sum(values: Any) -> float:
+    """sum(exp(x)) as a float."""
+    if np is None:
+        return sum(math.exp(x) for x in values)
+    total = 0.0
+    with np.errstate(over='raise'):
+        try:
+            for chunk in _iter_chunks(values):
+                total += float(np.exp(chunk).sum())
+        except FloatingPointError:
+            raise OverflowError("math range error")
+    if math.isinf(total):
+        raise OverflowError("math range error")
+    return total
+
+def _log_sum_exp(values: Any) -> float:
+    """log(sum(exp(x))), shifted by the running maximum so it never overflows."""
+    if np is None:
+        values = list(values)
+        if not values:
+            return -math.inf
+        peak = max(values)
+        return peak + math.log(sum(math.exp(x - peak) for x in values))
+    peak = -math.inf
+    scaled_total = 0.0  # sum(exp(x - peak)) over the values seen so far
+    for chunk in _iter_chunks(values):
+        chunk_peak = float(chunk.max())
+        if chunk_peak > peak:
+            scaled_total *= math.exp(peak - chunk_peak)
+            peak = chunk_peak
+        scaled_total += float(np.exp(chunk - peak).sum())
+    if scaled_total == 0.0:
+        return -math.inf
+    return peak + math.log(scaled_total)
+
+def _exact_exp_sum(values: Any) -> Decimal:
+    """sum(exp(x)) in arbitrary precision, computing exp once per distinct value."""
+    counts = Counter()
+    if np is None:
+        counts.update(values)
+    else:
+        for chunk in _iter_chunks(values):
+            distinct, occurrences = np.unique(chunk, return_counts=True)
+            counts.update(dict(zip(distinct.tolist(), occurrences.tolist())))
+    with localcontext() as context:
+        context.prec = EXACT_SUM_DIGITS + 10
+        context.Emax = MAX_EMAX
+        total = sum((count * Decimal(value).exp() for value, count in counts.items()), Decimal(0))
+        context.prec = EXACT_SUM_DIGITS
+        return +total
+
+def _check_domain(invalid, message: str):
+    """Raise the scalar tool's error if any element falls outside the domain."""
+    if invalid.any():
+        indices = np.flatnonzero(invalid)
+        raise ValueError(f"{message} (at indices {indices[:10].tolist()})")
+
+def _as_pair(pair: Any):
+    """(expression, expected) from a tuple, a dict or a model with those fields."""
+    if isinstance(pair, dict):
+        return pair["expression"], pair["expected"]
+    if hasattr(pair, "expression"):
+        return pair.expression, pair.expected
+    expression, expected = pair
+    return expression, expected
 
 class Action:
     """Component responsible for executing actions to affect the environment."""
     
-    def __init__(self, memory, perceive):
+    def __init__(self, memory, perceive, sink: Any = "console", result_cache=None, executor=None):
+        """Create the Action component.
+        
+        `sink` receives an event per tool call: "console" (default) renders them
+        with rich, None discards them at no cost, and any object with an
+        `emit(event, **fields)` method (e.g. `output.CallbackSink`) gets them as data.
+        `result_cache` (a `result_cache.ResultCache`) serves expressions the memory's
+        index misses, e.g. ones another worker process computed.
+        `executor` (a `verification.VerificationExecutor`) evaluates expressions and
+        verification steps in worker processes, so one that runs too long times out.
+        """
         self.memory = memory
+        self.result_cache = result_cache
         self.perceive = perceive
+        self.sink = ConsoleSink() if sink == "console" else sink
+        self.executor = executor
         self.paint_app = None
+        self._decision = None
     
-    def calculate(self, expression: str) -> TextContent:
-        """Calculate the result of an expression."""
-        console.print("[blue]FUNCTION CALL:[/blue] calculate()")
-        console.print(f"[blue]Expression:[/blue] {expression}")
+    @property
+    def decision(self):
+        """Decision component shared across calls, so its consistency checks stay incremental."""
+        if self._decision is None:
+            from decision import Decision
+            self._decision = Decision(self.memory, executor=self.executor)
+        return self._decision
+    
+    def _evaluate(self, expression: str) -> Any:
+        """Evaluate an expression through the current solve's context, if any.
+        
+        With an executor every evaluation runs in its workers, so none escapes the step timeout.
+        """
+        evaluate = self.executor.evaluate if self.executor else evaluate_expression
+        context = current_context()
+        if context is None:
+            return evaluate(expression)
+        return context.evaluate(expression, evaluate, fold=self.executor is None)
+    
+    def _compute(self, expression: str):
+        """Evaluate an expression through the memory's result index and record it.
+        
+        Returns (result, cached). Failures are recorded as error patterns and re-raised.
+        """
         try:
-            result = eval(expression)
-            console.print(f"[green]Result:[/green] {result}")
+            # Serve repeated expressions from the memory's result index
+            result = self.memory.get_cached_result(expression)
+            shareable = self.result_cache is not None and CACHEABLE_EXPRESSION.fullmatch(expression)
+            if result is None and shareable:
+                result = self.result_cache.get("expression", normalize_expression(expression), (EVALUATOR_VERSION,))
+            cached = result is not None
+            context = current_context()
+            if cached and context is not None:
+                context.record(expression, result)
+            elif not cached:
+                result = self._evaluate(expression)
+                if shareable:
+                    self.result_cache.set("expression", normalize_expression(expression), result, (EVALUATOR_VERSION,))
+        except Exception as e:
+            # A failing expression must never be answered from the index
+            self.memory.invalidate_cached_result(expression)
             
-            # Store in memory
+            # Store error in memory
+            self.memory.add_error_pattern(type(e).__name__, str(e), "Try simplifying the expression")
+            raise
+        
+        # Store in memory; a cached result went into the history when it was computed
+        if cached:
+            self.memory.cache_result(expression, result)
+        else:
             self.memory.add_calculation(expression, result)
+        return result, cached
+    
+    def _actual_value(self, expression: str) -> float:
+        """Reference value of an expression for verification, from the index or a fresh evaluation."""
+        cached = self.memory.get_cached_result(expression)
+        if cached is None:
+            cached = self._evaluate(expression)
+            self.memory.cache_result(expression, cached)
+        return float(cached)
+    
+    def calculate(self, expression: str) -> TextContent:
+        """Calculate the result of an expression."""
+        try:
+            result, cached = self._compute(expression)
+            if self.sink:
+                self.sink.emit("call", name="calculate", args={"expression": expression},
+                               result=result, cached=cached)
             
             return TextContent(
                 type="text",
                 text=str(result)
             )
         except Exception as e:
-            console.print(f"[red]Error:[/red] {str(e)}")
-            
-            # Store error in memory
-            self.memory.add_error_pattern(type(e).__name__, str(e), "Try simplifying the expression")
+            if self.sink:
+                self.sink.emit("call", name="calculate", args={"expression": expression}, error=str(e))
             
             return TextContent(
                 type="text",
@@ -51,123 +245,158 @@ class Action:
     
     def add(self, a: float, b: float) -> float:
         """Add two numbers."""
-        console.print("[blue]FUNCTION CALL:[/blue] add()")
         result = a + b
-        console.print(f"[green]Result:[/green] {result}")
+        if self.sink:
+            self.sink.emit("call", name="add", result=result)
         return result
     
     def subtract(self, a: float, b: float) -> float:
         """Subtract two numbers."""
-        console.print("[blue]FUNCTION CALL:[/blue] subtract()")
         result = a - b
-        console.print(f"[green]Result:[/green] {result}")
+        if self.sink:
+            self.sink.emit("call", name="subtract", result=result)
         return result
     
     def multiply(self, a: float, b: float) -> float:
         """Multiply two numbers."""
-        console.print("[blue]FUNCTION CALL:[/blue] multiply()")
         result = a * b
-        console.print(f"[green]Result:[/green] {result}")
+        if self.sink:
+            self.sink.emit("call", name="multiply", result=result)
         return result
     
     def divide(self, a: float, b: float) -> float:
         """Divide two numbers."""
-        console.print("[blue]FUNCTION CALL:[/blue] divide()")
         if b == 0:
             raise ValueError("Division by zero")
         result = a / b
-        console.print(f"[green]Result:[/green] {result}")
+        if self.sink:
+            self.sink.emit("call", name="divide", result=result)
         return result
     
-    def power(self, a: float, b: float) -> float:
-        """Power of two numbers."""
-        console.print("[blue]FUNCTION CALL:[/blue] power()")
-        result = math.pow(a, b)
-        console.print(f"[green]Result:[/green] {result}")
+    def power(self, a: Union[float, List[float]], b: Union[float, List[float]]) -> Union[float, List[float]]:
+        """Power of two numbers, elementwise when either is an array."""
+        if _is_array(a) or _is_array(b):
+            base, exponent = np.broadcast_arrays(_as_array(a), _as_array(b))
+            _check_domain((base < 0) & (exponent != np.floor(exponent)),
+                          "Cannot raise a negative number to a fractional power")
+            _check_domain((base == 0) & (exponent < 0), "Cannot raise zero to a negative power")
+            # Overflow raises like math.pow does for a single pair, instead of giving inf
+            with np.errstate(over='raise'):
+                try:
+                    result = np.power(base, exponent).tolist()
+                except FloatingPointError:
+                    raise OverflowError("math range error")
+        else:
+            if a < 0 and not float(b).is_integer():
+                raise ValueError("Cannot raise a negative number to a fractional power")
+            if a == 0 and b < 0:
+                raise ValueError("Cannot raise zero to a negative power")
+            result = math.pow(a, b)
+        if self.sink:
+            self.sink.emit("call", name="power", result=result)
         return result
     
-    def sqrt(self, a: float) -> float:
-        """Square root of a number."""
-        console.print("[blue]FUNCTION CALL:[/blue] sqrt()")
-        if a < 0:
-            raise ValueError("Cannot calculate square root of negative number")
-        result = math.sqrt(a)
-        console.print(f"[green]Result:[/green] {result}")
+    def sqrt(self, a: Union[float, List[float]]) -> Union[float, List[float]]:
+        """Square root of a number, or of each element of an array."""
+        if _is_array(a):
+            values = _as_array(a)
+            _check_domain(values < 0, "Cannot calculate square root of negative number")
+            result = np.sqrt(values).tolist()
+        else:
+            if a < 0:
+                raise ValueError("Cannot calculate square root of negative number")
+            result = math.sqrt(a)
+        if self.sink:
+            self.sink.emit("call", name="sqrt", result=result)
         return result
     
-    def cbrt(self, a: float) -> float:
-        """Cube root of a number."""
-        console.print("[blue]FUNCTION CALL:[/blue] cbrt()")
-        result = math.cbrt(a)
-        console.print(f"[green]Result:[/green] {result}")
+    def cbrt(self, a: Union[float, List[float]]) -> Union[float, List[float]]:
+        """Cube root of a number, or of each element of an array."""
+        result = np.cbrt(_as_array(a)).tolist() if _is_array(a) else math.cbrt(a)
+        if self.sink:
+            self.sink.emit("call", name="cbrt", result=result)
         return result
     
-    def factorial(self, a: int) -> int:
-        """Factorial of a number."""
-        console.print("[blue]FUNCTION CALL:[/blue] factorial()")
-        if a < 0:
-            raise ValueError("Cannot calculate factorial of negative number")
-        if not float(a).is_integer():
-            raise ValueError("Factorial is only defined for integers")
-        result = math.factorial(int(a))
-        console.print(f"[green]Result:[/green] {result}")
+    def factorial(self, a: Union[int, List[int]]) -> Union[int, List[int]]:
+        """Factorial of a number, or of each element of an array."""
+        if _is_array(a):
+            values = _as_array(a)
+            _check_domain(values < 0, "Cannot calculate factorial of negative number")
+            _check_domain(values != np.floor(values), "Factorial is only defined for integers")
+            # Results are arbitrary-precision ints, so there is no ufunc to hand off to
+            result = [number_theory.factorial(n) for n in values.astype(np.int64).tolist()]
+        else:
+            if a < 0:
+                raise ValueError("Cannot calculate factorial of negative number")
+            if not float(a).is_integer():
+                raise ValueError("Factorial is only defined for integers")
+            result = number_theory.factorial(int(a))
+        if self.sink:
+            self.sink.emit("call", name="factorial", result=result)
         return result
     
-    def log(self, a: float) -> float:
-        """Log of a number."""
-        console.print("[blue]FUNCTION CALL:[/blue] log()")
-        if a <= 0:
-            raise ValueError("Cannot calculate logarithm of non-positive number")
-        result = math.log(a)
-        console.print(f"[green]Result:[/green] {result}")
+    def log(self, a: Union[float, List[float]]) -> Union[float, List[float]]:
+        """Log of a number, or of each element of an array."""
+        if _is_array(a):
+            values = _as_array(a)
+            _check_domain(values <= 0, "Cannot calculate logarithm of non-positive number")
+            result = np.log(values).tolist()
+        else:
+            if a <= 0:
+                raise ValueError("Cannot calculate logarithm of non-positive number")
+            result = math.log(a)
+        if self.sink:
+            self.sink.emit("call", name="log", result=result)
         return result
     
-    def remainder(self, a: float, b: float) -> float:
-        """Remainder of two numbers division."""
-        console.print("[blue]FUNCTION CALL:[/blue] remainder()")
-        if b == 0:
-            raise ValueError("Division by zero")
-        result = a % b
-        console.print(f"[green]Result:[/green] {result}")
+    def remainder(self, a: Union[float, List[float]], b: Union[float, List[float]]) -> Union[float, List[float]]:
+        """Remainder of two numbers division, elementwise when either is an array."""
+        if _is_array(a) or _is_array(b):
+            dividend, divisor = np.broadcast_arrays(_as_array(a, dtype=None), _as_array(b, dtype=None))
+            _check_domain(divisor == 0, "Division by zero")
+            # np.mod follows Python's sign convention for %
+            result = np.mod(dividend, divisor).tolist()
+        else:
+            if b == 0:
+                raise ValueError("Division by zero")
+            result = a % b
+        if self.sink:
+            self.sink.emit("call", name="remainder", result=result)
         return result
     
-    def sin(self, a: float) -> float:
-        """Sin of a number."""
-        console.print("[blue]FUNCTION CALL:[/blue] sin()")
-        result = math.sin(a)
-        console.print(f"[green]Result:[/green] {result}")
+    def sin(self, a: Union[float, List[float]]) -> Union[float, List[float]]:
+        """Sin of a number, or of each element of an array."""
+        result = np.sin(_as_array(a)).tolist() if _is_array(a) else math.sin(a)
+        if self.sink:
+            self.sink.emit("call", name="sin", result=result)
         return result
     
-    def cos(self, a: float) -> float:
-        """Cos of a number."""
-        console.print("[blue]FUNCTION CALL:[/blue] cos()")
-        result = math.cos(a)
-        console.print(f"[green]Result:[/green] {result}")
+    def cos(self, a: Union[float, List[float]]) -> Union[float, List[float]]:
+        """Cos of a number, or of each element of an array."""
+        result = np.cos(_as_array(a)).tolist() if _is_array(a) else math.cos(a)
+        if self.sink:
+            self.sink.emit("call", name="cos", result=result)
         return result
     
-    def tan(self, a: float) -> float:
-        """Tan of a number."""
-        console.print("[blue]FUNCTION CALL:[/blue] tan()")
-        result = math.tan(a)
-        console.print(f"[green]Result:[/green] {result}")
+    def tan(self, a: Union[float, List[float]]) -> Union[float, List[float]]:
+        """Tan of a number, or of each element of an array."""
+        result = np.tan(_as_array(a)).tolist() if _is_array(a) else math.tan(a)
+        if self.sink:
+            self.sink.emit("call", name="tan", result=result)
         return result
     
     def mine(self, a: float, b: float) -> float:
         """Special mining tool."""
-        console.print("[blue]FUNCTION CALL:[/blue] mine()")
         result = min(a, b)
-        console.print(f"[green]Result:[/green] {result}")
+        if self.sink:
+            self.sink.emit("call", name="mine", result=result)
         return result
     
     def show_reasoning(self, steps: List[str]) -> TextContent:
         """Show the step-by-step reasoning process."""
-        console.print("[blue]FUNCTION CALL:[/blue] show_reasoning()")
-        for i, step in enumerate(steps, 1):
-            console.print(Panel(
-                f"{step}",
-                title=f"Step {i}",
-                border_style="cyan"
-            ))
+        if self.sink:
+            self.sink.emit("call", name="show_reasoning")
+            self.sink.emit("reasoning", steps=steps)
         return TextContent(
             type="text",
             text="Reasoning shown"
@@ -175,131 +404,182 @@ class Action:
     
     def verify(self, expression: str, expected: float) -> TextContent:
         """Verify if a calculation is correct."""
-        console.print("[blue]FUNCTION CALL:[/blue] verify()")
-        console.print(f"[blue]Verifying:[/blue] {expression} = {expected}")
+        if self.sink:
+            self.sink.emit("call", name="verify", args={"expression": expression, "expected": expected})
         try:
-            actual = float(eval(expression))
+            actual = self._actual_value(expression)
             is_correct = abs(actual - float(expected)) < 1e-10
             
-            if is_correct:
-                console.print(f"[green]✓ Correct! {expression} = {expected}[/green]")
-            else:
-                console.print(f"[red]✗ Incorrect! {expression} should be {actual}, got {expected}[/red]")
+            if self.sink:
+                self.sink.emit("verification", expression=expression, expected=expected,
+                               actual=actual, correct=is_correct)
                 
             return TextContent(
                 type="text",
                 text=str(is_correct)
             )
         except Exception as e:
-            console.print(f"[red]Error:[/red] {str(e)}")
+            if self.sink:
+                self.sink.emit("call", name="verify", error=str(e))
             return TextContent(
                 type="text",
                 text=f"Error: {str(e)}"
             )
     
+    def calculate_many(self, expressions: List[str]) -> List[Dict[str, Any]]:
+        """Calculate several independent expressions in one call.
+        
+        Returns one item per expression, in order, holding either its `result`
+        or the `error` it raised, so one bad expression does not fail the batch.
+        """
+        items = []
+        for expression in expressions:
+            try:
+                result, _ = self._compute(expression)
+                items.append({"expression": expression, "result": str(result)})
+            except Exception as e:
+                items.append({"expression": expression, "error": str(e)})
+        if self.sink:
+            self.sink.emit("call", name="calculate_many", args={"expressions": expressions},
+                           result=[item.get("result", item.get("error")) for item in items])
+        return items
+    
+    def _verification_item(self, expression: str, expected: float) -> Dict[str, Any]:
+        """Verify one calculation, returning its outcome as a batch item."""
+        try:
+            actual = self._actual_value(expression)
+            is_correct = abs(actual - float(expected)) < 1e-10
+        except Exception as e:
+            return {"expression": expression, "expected": expected, "error": str(e)}
+        if self.sink:
+            self.sink.emit("verification", expression=expression, expected=expected,
+                           actual=actual, correct=is_correct)
+        return {"expression": expression, "expected": expected, "actual": actual, "correct": is_correct}
+    
+    def verify_many(self, pairs: List[Any]) -> List[Dict[str, Any]]:
+        """Verify several calculations in one call.
+        
+        `pairs` holds (expression, expected) tuples, or dicts/models with those
+        fields. Returns one item per pair with the `actual` value and whether it
+        is `correct`, or the `error` raised while evaluating it.
+        """
+        if self.sink:
+            self.sink.emit("call", name="verify_many", args={"pairs": len(pairs)})
+        return [self._verification_item(*_as_pair(pair)) for pair in pairs]
+    
+    def calculate_and_verify(self, expression: str, expected: float) -> Dict[str, Any]:
+        """Calculate an expression and check it against the expected value in one call."""
+        if self.sink:
+            self.sink.emit("call", name="calculate_and_verify",
+                           args={"expression": expression, "expected": expected})
+        try:
+            self._compute(expression)
+        except Exception as e:
+            return {"expression": expression, "expected": expected, "error": str(e)}
+        # The computed result is now in the memory's index, so this does not evaluate again
+        return self._verification_item(expression, expected)
+    
+    def evaluation_stats(self) -> Dict[str, int]:
+        """Reuse counters of the current solve's evaluation context, empty outside a solve."""
+        context = current_context()
+        return dict(context.stats) if context else {}
+    
     def check_consistency(self, steps: List[str]) -> TextContent:
         """Check if calculation steps are consistent with each other."""
-        console.print("[blue]FUNCTION CALL:[/blue] check_consistency()")
-        
         # Store steps in memory for potential future use
         self.memory.store_steps(steps)
         
         # Use the decision component to check consistency
-        from decision import Decision
-        decision = Decision(self.memory)
-        report = decision.check_consistency(steps)
-        
-        # Display the report
-        console.print("\n[bold cyan]Consistency Analysis Report[/bold cyan]")
-        console.print(report["table"])
-        
-        if report["issues"]:
-            console.print(Panel(
-                "\n".join(f"[red]• {issue}[/red]" for issue in report["issues"]),
-                title="Critical Issues",
-                border_style="red"
-            ))
-        
-        if report["warnings"]:
-            console.print(Panel(
-                "\n".join(f"[yellow]• {warning}[/yellow]" for warning in report["warnings"]),
-                title="Warnings",
-                border_style="yellow"
-            ))
-        
-        if report["insights"]:
-            console.print(Panel(
-                "\n".join(f"[blue]• {insight}[/blue]" for insight in report["insights"]),
-                title="Analysis Insights",
-                border_style="blue"
-            ))
-        
-        # Calculate consistency score
-        total_checks = len(steps) * 5  # 5 types of checks per step
-        passed_checks = total_checks - (len(report["issues"]) * 2 + len(report["warnings"]))
-        consistency_score = (passed_checks / total_checks) * 100 if total_checks > 0 else 0
+        report = self.decision.check_consistency(steps)
         
-        console.print(Panel(
-            f"[bold]Consistency Score: {consistency_score:.1f}%[/bold]\n" +
-            f"Passed Checks: {passed_checks}/{total_checks}\n" +
-            f"Critical Issues: {len(report['issues'])}\n" +
-            f"Warnings: {len(report['warnings'])}\n" +
-            f"Insights: {len(report['insights'])}",
-            title="Summary",
-            border_style="green" if consistency_score > 80 else "yellow" if consistency_score > 60 else "red"
-        ))
+        if self.sink:
+            self.sink.emit("call", name="check_consistency")
+            self.sink.emit("consistency", report=report)
         
         return TextContent(
             type="text",
-            text=f"Consistency check completed. Score: {consistency_score:.1f}%"
+            text=f"Consistency check completed. Score: {report['score']:.1f}%"
         )
     
     def fallback_reasoning(self, step_description: str) -> TextContent:
         """Provide fallback reasoning when primary reasoning fails."""
-        console.print("[blue]FUNCTION CALL:[/blue] fallback_reasoning()")
-        console.print(f"[blue]Step Description:[/blue] {step_description}")
-        
-        # Create an error panel with the step description
-        console.print(Panel(
-            f"[yellow]Fallback triggered:[/yellow]\n{step_description}",
-            title="Fallback Reasoning",
-            border_style="red"
-        ))
+        if self.sink:
+            self.sink.emit("call", name="fallback_reasoning", args={"step_description": step_description})
+            self.sink.emit("fallback", step_description=step_description)
         
         # Use the decision component to generate fallback reasoning
-        from decision import Decision
-        decision = Decision(self.memory)
-        reasoning = decision.generate_fallback_reasoning(step_description)
+        reasoning = self.decision.generate_fallback_reasoning(step_description)
         
         return TextContent(
             type="text",
             text=reasoning
         )
     
-    def strings_to_chars_to_int(self, string: str) -> list:
-        """Return the ASCII values of the characters in a word."""
-        console.print("[blue]FUNCTION CALL:[/blue] strings_to_chars_to_int()")
-        result = [ord(char) for char in string]
-        console.print(f"[green]Result:[/green] {result}")
+    def strings_to_chars_to_int(self, string: Union[str, bytes], as_array: bool = False) -> list:
+        """Return the ASCII values of the characters in a word.
+        
+        Code points are read straight from the encoded buffer with NumPy: one byte
+        per character for ASCII text and bytes input, UTF-32 otherwise. With
+        `as_array` the NumPy array is returned instead of a list.
+        """
+        if np is None:
+            result = list(string) if isinstance(string, (bytes, bytearray)) else [ord(char) for char in string]
+        else:
+            if isinstance(string, (bytes, bytearray, memoryview)):
+                codes = np.frombuffer(string, dtype=np.uint8)
+            elif string.isascii():
+                codes = np.frombuffer(string.encode('ascii'), dtype=np.uint8)
+            else:
+                codes = np.frombuffer(string.encode('utf-32-le'), dtype=np.uint32)
+            result = codes if as_array else codes.tolist()
+        if self.sink:
+            self.sink.emit("call", name="strings_to_chars_to_int", result=result)
         return result
     
-    def int_list_to_exponential_sum(self, int_list: list) -> float:
-        """Return sum of exponentials of numbers in a list."""
-        console.print("[blue]FUNCTION CALL:[/blue] int_list_to_exponential_sum()")
-        result = sum(math.exp(x) for x in int_list)
-        console.print(f"[green]Result:[/green] {result}")
+    def int_list_to_exponential_sum(self, int_list: list, mode: str = "float") -> Union[float, Decimal]:
+        """Return sum of exponentials of numbers in a list.
+        
+        `mode` picks the representation: "float" (raises OverflowError past the
+        float range), "log" for the log of the sum, which never overflows, or
+        "exact" for a Decimal with EXACT_SUM_DIGITS significant digits. Input
+        is processed in chunks, so any iterable of any length is accepted.
+        """
+        if mode == "exact":
+            result = _exact_exp_sum(int_list)
+        elif mode == "log":
+            result = _log_sum_exp(int_list)
+        elif mode == "float":
+            result = _float_exp_sum(int_list)
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+        if self.sink:
+            self.sink.emit("call", name="int_list_to_exponential_sum", result=result)
         return result
     
     def fibonacci_numbers(self, n: int) -> list:
         """Return the first n Fibonacci Numbers."""
-        console.print("[blue]FUNCTION CALL:[/blue] fibonacci_numbers()")
         if n < 0:
             raise ValueError("Number of Fibonacci numbers must be non-negative")
-        result = [0, 1]
-        for _ in range(2, n):
-            result.append(result[-1] + result[-2])
-        self.memory.add_to_history(f"fibonacci({n})", result)
-        console.print(f"[green]Result:[/green] {result}")
+        # Whole sequences grow quadratically; stream number_theory.fibonacci_sequence for longer ones
+        digits = number_theory.fibonacci_sequence_digits(n)
+        if digits > number_theory.MAX_RESULT_DIGITS:
+            raise number_theory.ResultTooLargeError(
+                f"fibonacci_numbers({n}) would have about {digits} digits in total"
+            )
+        result = list(number_theory.fibonacci_sequence(n))
+        # The history keeps a summary; the whole sequence can run to megabytes
+        self.memory.add_calculation(f"fibonacci_numbers({n})", {
+            "count": n, "last_digit_count": number_theory.fibonacci_digits(n - 1) if n else 0
+        })
+        if self.sink:
+            self.sink.emit("call", name="fibonacci_numbers", result=result)
+        return result
+    
+    def fibonacci(self, n: int) -> int:
+        """Return the nth Fibonacci number."""
+        result = number_theory.fibonacci(n)
+        if self.sink:
+            self.sink.emit("call", name="fibonacci", result=result)
         return result
     
     # def create_thumbnail(self, image_path: str) -> PILImage.Image:
@@ -0,0 +1,591 @@
+# benchmarks.py
+#
+# Microbenchmarks for the hot paths of Perceive, Decision, Memory, Action, the result cache and response encoding:
+#   python benchmarks.py                              # run everything and print a table
+#   python benchmarks.py -k memory                    # only benchmarks whose name contains "memory"
+#   python benchmarks.py --save baseline.json         # store the results as a baseline
+#   python benchmarks.py --baseline baseline.json     # exit non-zero on a regression over --threshold
+#
+# benchmark_baseline.json is a full run (`--save benchmark_baseline.json`, no -k or --quick) on the
+# maintainers' machine, kept as a reference. Timings only compare on the same hardware, so regenerate
+# it with that command before comparing against it elsewhere.
+
+from typing import Any, Callable, Dict, Iterable, Optional
+import argparse
+import asyncio
+import atexit
+import io
+import json
+import math
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from rich.console import Console
+from rich.table import Table
+
+from perceive import Perceive
+from memory import Memory
+from decision import Decision
+from action import Action
+from expression_parser import _Parser, tokenize
+from output import CallbackSink, ConsoleSink
+from evaluation_context import EvaluationContext
+import response_encoding
+from result_cache import MemoryTier, ResultCache, SQLiteTier
+from problem_index import ProblemIndex, make_record
+from verification import EVALUATOR_VERSION, VerificationExecutor
+
+console = Console()
+
+# Benchmark name -> (factory, input sizes). A factory takes an input size and a scratch
+# directory, does its setup and returns the zero-argument callable to time, or None
+# when an optional dependency it needs is missing.
+BENCHMARKS: Dict[str, tuple] = {}
+
+# `name[size]` -> bytes produced, for benchmarks whose callable has a `payload_bytes` attribute
+PAYLOAD_BYTES: Dict[str, int] = {}
+
+# `name[size]` -> agent loop iterations per solve, for callables with an `iterations` attribute
+ITERATIONS: Dict[str, float] = {}
+
+def benchmark(name: str, sizes: Iterable[int] = (1,)):
+    """Register a benchmark factory under `name`, to be run once per input size."""
+    def register(factory: Callable[[int, str], Callable[[], Any]]):
+        BENCHMARKS[name] = (factory, tuple(sizes))
+        return factory
+    return register
+
+# Input generators, seeded so every run times the same inputs
+
+def make_expression(terms: int, seed: int = 0, operators: str = "+-*", separator: str = " ") -> str:
+    """An arithmetic expression with `terms` integer operands and mixed operators."""
+    rng = random.Random(seed)
+    parts = [str(rng.randint(1, 99))]
+    for _ in range(terms - 1):
+        parts.append(rng.choice(operators))
+        parts.append(str(rng.randint(1, 99)))
+    return separator.join(parts)
+
+def make_steps(count: int, seed: int = 0):
+    """Consistency-check steps where each step builds on the previous result."""
+    rng = random.Random(seed)
+    steps = []
+    value = rng.randint(1, 9)
+    for _ in range(count):
+        operand = rng.randint(1, 9)
+        expression = f"{value} + {operand}"
+        value += operand
+        steps.append(f"{expression} = {value}")
+    return steps
+
+def make_heavy_steps(count: int):
+    """Distinct steps that each take milliseconds of big-integer arithmetic to verify."""
+    steps = []
+    for i in range(count):
+        expression = f"7 ** {200000 + i} % 1000003"
+        steps.append(f"{expression} = {pow(7, 200000 + i, 1000003)}")
+    return steps
+
+def write_history(storage_path: str, records: int):
+    """Write a history file of `records` calculations next to a memory snapshot."""
+    history_path = os.path.splitext(storage_path)[0] + "_history.jsonl"
+    with open(history_path, "w") as f:
+        for i in range(records):
+            f.write(json.dumps({"timestamp": 0.0, "expression": f"{i} + 1", "result": i + 1, "steps": [],
+                                "evaluator": EVALUATOR_VERSION}) + "\n")
+
+def write_problem_index(path: str, records: int) -> str:
+    """Write a problem index file of `records` word problems with varying wordings; returns the last one."""
+    rng = random.Random(0)
+    nouns = ["apples", "pears", "books", "coins", "marbles", "stamps", "pens", "cards"]
+    verbs = ["has", "buys", "sells", "finds", "loses", "gets"]
+    with open(path, "w") as f:
+        for i in range(records):
+            first, second = rng.choice(nouns), rng.choice(nouns)
+            problem = (f"Sam {rng.choice(verbs)} {rng.randint(1, 99)} {first} and {rng.choice(verbs)} "
+                       f"{rng.randint(1, 99)} {second} on day {i % 100}. How many are left?")
+            f.write(json.dumps(make_record(problem, ["{n0} + {n1}"], 0, confirmed=True)) + "\n")
+    return problem
+
+def make_solve_result(turns: int, seed: int = 0) -> Dict[str, Any]:
+    """A /api/solve result with `turns` assistant/user exchanges, shaped like the real ones."""
+    rng = random.Random(seed)
+    conversation = []
+    for _ in range(turns):
+        expression = make_expression(rng.randint(3, 8), rng.randint(0, 1 << 30))
+        conversation.append({"role": "assistant", "content": "FUNCTION_CALL: " + json.dumps(
+            {"name": "calculate", "args": {"expression": expression}})})
+        conversation.append({"role": "user", "content": f"Result is {rng.randint(1, 10 ** 6)}. Let's verify this step."})
+    conversation.append({"role": "assistant", "content": "FINAL_ANSWER: [42]"})
+    return {
+        "success": True,
+        "conversation": conversation,
+        "final_answer": "42",
+        "iterations": turns + 1,
+        "stop_reason": "final_answer",
+        "budget": {"llm_calls": turns + 1, "input_tokens": 700 * (turns + 1), "output_tokens": 20 * (turns + 1)}
+    }
+
+def _with_payload(function: Callable[[], Any], body: bytes) -> Callable[[], Any]:
+    function.payload_bytes = len(body)
+    return function
+
+def _with_iterations(function: Callable[[], Any], iterations: float) -> Callable[[], Any]:
+    function.iterations = iterations
+    return function
+
+def start_tool_server(workdir: str) -> Optional[str]:
+    """Run `math_tools.py sse` in `workdir` until this process exits; returns its URL, or None if it fails."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "math_tools.py")
+    server = subprocess.Popen([sys.executable, script, "sse", "--port", str(port)], cwd=workdir,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    atexit.register(server.kill)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return f"http://127.0.0.1:{port}/sse"
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    return None
+
+def _action(workdir: str, sink: Any = None) -> Action:
+    return Action(Memory(os.path.join(workdir, "memory.json")), Perceive(), sink=sink)
+
+def _quiet_console() -> Console:
+    return Console(file=io.StringIO(), force_terminal=True, width=120)
+
+# Perceive
+
+@benchmark("perceive.parse_expression", sizes=(4, 32, 256))
+def bench_parse_expression(size, workdir):
+    perceive, expression = Perceive(), make_expression(size)
+    return lambda: perceive.parse_expression(expression)
+
+@benchmark("perceive.show_reasoning", sizes=(4, 16, 64))
+def bench_perceive_show_reasoning(size, workdir):
+    # Perceive.show_reasoning only terminates on compact input with non-negative
+    # intermediate results; with spaces or a '-' it loops forever
+    perceive, expression = Perceive(), make_expression(size, operators="+*", separator="")
+    return lambda: perceive.show_reasoning(expression)
+
+@benchmark("perceive.parse_command", sizes=(4, 32, 256))
+def bench_parse_command(size, workdir):
+    perceive, command = Perceive(), "calculate " + make_expression(size)
+    return lambda: perceive.parse_command(command)
+
+# Parser and Decision
+
+@benchmark("parser.parse_uncached", sizes=(4, 32, 256))
+def bench_parse_uncached(size, workdir):
+    expression = make_expression(size)
+    return lambda: _Parser(tokenize(expression)).parse()
+
+@benchmark("decision.decide_operation", sizes=(4, 32, 256))
+def bench_decide_operation(size, workdir):
+    decision, expression = Decision(Memory(os.path.join(workdir, "memory.json"))), make_expression(size)
+    return lambda: decision.decide_operation(expression)
+
+@benchmark("decision.check_consistency.cold", sizes=(8, 64, 512, 1000))
+def bench_check_consistency_cold(size, workdir):
+    memory, steps = Memory(os.path.join(workdir, "memory.json")), make_steps(size)
+    return lambda: Decision(memory).check_consistency(steps)
+
+@benchmark("decision.check_consistency.append", sizes=(8, 64, 512))
+def bench_check_consistency_append(size, workdir):
+    # One new step on top of an already checked prefix, as in a growing solve
+    decision, steps = Decision(Memory(os.path.join(workdir, "memory.json"))), make_steps(size + 1)
+    def run():
+        decision.check_consistency(steps[:-1])
+        decision.check_consistency(steps)
+    return run
+
+# The same expensive steps verified in this process and through a VerificationExecutor with
+# VERIFY_PROCESSES workers (default: one per core), as math_tools does with VERIFY_PROCESSES set
+
+@benchmark("decision.check_consistency.sequential", sizes=(8, 32))
+def bench_check_consistency_sequential(size, workdir):
+    memory, steps = Memory(os.path.join(workdir, "memory.json")), make_heavy_steps(size)
+    return lambda: Decision(memory).check_consistency(steps)
+
+@benchmark("decision.check_consistency.parallel", sizes=(8, 32))
+def bench_check_consistency_parallel(size, workdir):
+    memory, steps = Memory(os.path.join(workdir, "memory.json")), make_heavy_steps(size)
+    executor = VerificationExecutor(int(os.environ.get("VERIFY_PROCESSES", 0)) or None, step_timeout=30.0)
+    atexit.register(executor.close)
+    return lambda: Decision(memory, executor=executor).check_consistency(steps)
+
+@benchmark("context.evaluate.steps", sizes=(8, 64))
+def bench_context_steps(size, workdir):
+    # A solve's worth of steps, each building on the previous one, in a fresh context
+    steps, expression = [], make_expression(3)
+    for seed in range(size):
+        expression = f"({expression}) + {make_expression(2, seed)}"
+        steps.append(expression)
+    def run():
+        context = EvaluationContext()
+        for step in steps:
+            context.evaluate(step, eval)
+    return run
+
+# Memory
+
+@benchmark("memory.add_calculation", sizes=(1000, 100000))
+def bench_add_calculation(size, workdir):
+    storage_path = os.path.join(workdir, f"add_{size}.json")
+    write_history(storage_path, size)
+    memory = Memory(storage_path)
+    return lambda: memory.add_calculation("2 + 3", 5)
+
+# Cold start: only the history's tail is read, so this should stay flat up to a million records
+@benchmark("memory.load_memory", sizes=(1000, 10000, 100000, 1000000))
+def bench_load_memory(size, workdir):
+    storage_path = os.path.join(workdir, f"load_{size}.json")
+    write_history(storage_path, size)
+    return lambda: Memory(storage_path)
+
+@benchmark("memory.get_cached_result", sizes=(1,))
+def bench_get_cached_result(size, workdir):
+    memory = Memory(os.path.join(workdir, "memory.json"))
+    memory.cache_result("2 + 3", 5)
+    return lambda: memory.get_cached_result("2 + 3")
+
+# Result cache
+
+@benchmark("cache.get.memory", sizes=(1,))
+def bench_cache_get_memory(size, workdir):
+    cache = ResultCache([MemoryTier()])
+    cache.set("solve", "problem", make_solve_result(8))
+    return lambda: cache.get("solve", "problem")
+
+@benchmark("cache.get.sqlite", sizes=(1000, 100000))
+def bench_cache_get_sqlite(size, workdir):
+    # Shared tier only, as in a worker whose own tier has not seen the entry yet
+    cache = ResultCache([SQLiteTier(os.path.join(workdir, f"cache_{size}.sqlite"), max_entries=size)])
+    cache.set_many("expression", [(str(i), i) for i in range(size)])
+    key = str(size // 2)
+    return lambda: cache.get("expression", key)
+
+@benchmark("cache.set.sqlite", sizes=(1,))
+def bench_cache_set_sqlite(size, workdir):
+    cache = ResultCache([SQLiteTier(os.path.join(workdir, "cache_set.sqlite"))])
+    return lambda: cache.set("expression", "2+3", 5)
+
+# Problem index
+
+@benchmark("index.match", sizes=(1000, 100000))
+def bench_index_match(size, workdir):
+    path = os.path.join(workdir, f"problems_{size}.jsonl")
+    # The same wording as an indexed problem with other numbers, so the lookup replays its chain
+    problem = re.sub(r"\d+", "3", write_problem_index(path, size))
+    index = ProblemIndex(path, Perceive())
+    return lambda: index.match(problem)
+
+@benchmark("index.miss", sizes=(100000,))
+def bench_index_miss(size, workdir):
+    path = os.path.join(workdir, f"problems_{size}.jsonl")
+    if not os.path.exists(path):
+        write_problem_index(path, size)
+    index = ProblemIndex(path, Perceive())
+    return lambda: index.match("What is the boiling point of water in kelvin?")
+
+# Action
+
+@benchmark("action.calculate.cached", sizes=(4, 64))
+def bench_calculate(size, workdir):
+    action, expression = _action(workdir), make_expression(size)
+    action.calculate(expression)
+    return lambda: action.calculate(expression)
+
+@benchmark("action.calculate_many", sizes=(8, 64))
+def bench_calculate_many(size, workdir):
+    action = _action(workdir)
+    expressions = [make_expression(4, seed) for seed in range(size)]
+    return lambda: action.calculate_many(expressions)
+
+@benchmark("action.sqrt.scalar")
+def bench_sqrt_scalar(size, workdir):
+    action = _action(workdir)
+    return lambda: action.sqrt(2.0)
+
+@benchmark("action.sqrt.list", sizes=(10, 1000, 100000))
+def bench_sqrt_list(size, workdir):
+    action, values = _action(workdir), [float(i) for i in range(size)]
+    return lambda: action.sqrt(values)
+
+@benchmark("action.factorial", sizes=(10, 100, 1000))
+def bench_factorial(size, workdir):
+    action = _action(workdir)
+    return lambda: action.factorial(size)
+
+@benchmark("action.fibonacci", sizes=(10, 1000, 100000))
+def bench_fibonacci(size, workdir):
+    action = _action(workdir)
+    return lambda: action.fibonacci(size)
+
+@benchmark("action.strings_to_chars_to_int", sizes=(16, 4096, 1000000))
+def bench_strings_to_chars(size, workdir):
+    action, text = _action(workdir), "abcdefgh" * (size // 8)
+    return lambda: action.strings_to_chars_to_int(text)
+
+# The *.loop benchmarks time the plain Python versions the NumPy ones replaced, for comparison
+
+@benchmark("action.strings_to_chars_to_int.loop", sizes=(16, 4096, 1000000))
+def bench_strings_to_chars_loop(size, workdir):
+    text = "abcdefgh" * (size // 8)
+    return lambda: [ord(char) for char in text]
+
+@benchmark("action.exp_sum.float", sizes=(10, 1000, 100000, 1000000))
+def bench_exp_sum_float(size, workdir):
+    action, values = _action(workdir), [i % 50 for i in range(size)]
+    return lambda: action.int_list_to_exponential_sum(values)
+
+@benchmark("action.exp_sum.loop", sizes=(10, 1000, 100000, 1000000))
+def bench_exp_sum_loop(size, workdir):
+    values = [i % 50 for i in range(size)]
+    return lambda: sum(math.exp(x) for x in values)
+
+@benchmark("action.exp_sum.log", sizes=(10, 1000, 100000, 1000000))
+def bench_exp_sum_log(size, workdir):
+    # Values past 709 overflow a float sum; log mode handles them at the same speed
+    action, values = _action(workdir), [i % 1000 for i in range(size)]
+    return lambda: action.int_list_to_exponential_sum(values, mode="log")
+
+@benchmark("action.exp_sum.exact", sizes=(10, 1000))
+def bench_exp_sum_exact(size, workdir):
+    action, values = _action(workdir), [i % 50 for i in range(size)]
+    return lambda: action.int_list_to_exponential_sum(values, mode="exact")
+
+# Agent loop: whole solves against the scripted model and a shared tool server. The
+# Iterations column is the mean number of model turns per solve for each script.
+
+def _scripted_solves(size: int, workdir: str, script: str):
+    if "flask_server" not in sys.modules:
+        url = start_tool_server(workdir)
+        if url is None:
+            return None
+        # Read when flask_server is imported
+        os.environ["LLM_BACKEND"] = "scripted"
+        os.environ["MATH_TOOLS_URL"] = url
+    try:
+        import flask_server
+    except ImportError:
+        return None
+    problems = [make_expression(4, seed) for seed in range(size)]
+    def run():
+        os.environ["SCRIPTED_LLM_SCRIPT"] = script
+        iterations = 0
+        for problem in problems:
+            result = asyncio.run(flask_server.process_math_problem("benchmark", problem))
+            if not result["success"]:
+                raise RuntimeError(result["error"])
+            iterations += result["iterations"]
+        return iterations / len(problems)
+    return _with_iterations(run, run())
+
+@benchmark("agent.solve.sequential", sizes=(8,))
+def bench_solve_sequential(size, workdir):
+    return _scripted_solves(size, workdir, "sequential")
+
+@benchmark("agent.solve.batched", sizes=(8,))
+def bench_solve_batched(size, workdir):
+    return _scripted_solves(size, workdir, "batched")
+
+# Output sinks: what emitting and rendering tool events costs
+
+@benchmark("sink.calculate.none")
+def bench_sink_none(size, workdir):
+    action = _action(workdir, sink=None)
+    action.calculate("2 + 3")
+    return lambda: action.calculate("2 + 3")
+
+@benchmark("sink.calculate.callback")
+def bench_sink_callback(size, workdir):
+    events = []
+    action = _action(workdir, sink=CallbackSink(events.append))
+    action.calculate("2 + 3")
+    return lambda: (action.calculate("2 + 3"), events.clear())
+
+@benchmark("sink.calculate.console")
+def bench_sink_console(size, workdir):
+    action = _action(workdir, sink=ConsoleSink(_quiet_console()))
+    action.calculate("2 + 3")
+    return lambda: action.calculate("2 + 3")
+
+@benchmark("sink.check_consistency.render_off", sizes=(16, 1000))
+def bench_consistency_render_off(size, workdir):
+    action, steps = _action(workdir, sink=ConsoleSink(_quiet_console(), render_reports=False)), make_steps(size)
+    return lambda: action.check_consistency(steps)
+
+@benchmark("sink.check_consistency.render_on", sizes=(16, 1000))
+def bench_consistency_render_on(size, workdir):
+    action, steps = _action(workdir, sink=ConsoleSink(_quiet_console(), render_reports=True)), make_steps(size)
+    return lambda: action.check_consistency(steps)
+
+# Response encoding: serialization time and payload size of solve results
+
+RESPONSE_SIZES = (4, 30, 300)
+
+@benchmark("response.json.stdlib", sizes=RESPONSE_SIZES)
+def bench_response_json_stdlib(size, workdir):
+    result = make_solve_result(size)
+    function = lambda: json.dumps(result, separators=(",", ":")).encode()
+    return _with_payload(function, function())
+
+@benchmark("response.json", sizes=RESPONSE_SIZES)
+def bench_response_json(size, workdir):
+    # orjson when installed, as served by /api/solve
+    result = make_solve_result(size)
+    function = lambda: response_encoding.dumps_json(result)
+    return _with_payload(function, function())
+
+@benchmark("response.json.summary", sizes=RESPONSE_SIZES)
+def bench_response_json_summary(size, workdir):
+    result = make_solve_result(size)
+    function = lambda: response_encoding.encode(response_encoding.apply_detail(result, "summary"))[0]
+    return _with_payload(function, function())
+
+@benchmark("response.json.gzip", sizes=RESPONSE_SIZES)
+def bench_response_gzip(size, workdir):
+    result = make_solve_result(size)
+    function = lambda: response_encoding.encode(result, encoding="gzip")[0]
+    return _with_payload(function, function())
+
+@benchmark("response.json.br", sizes=RESPONSE_SIZES)
+def bench_response_brotli(size, workdir):
+    if response_encoding.brotli is None:
+        return None
+    result = make_solve_result(size)
+    function = lambda: response_encoding.encode(result, encoding="br")[0]
+    return _with_payload(function, function())
+
+@benchmark("response.msgpack", sizes=RESPONSE_SIZES)
+def bench_response_msgpack(size, workdir):
+    if response_encoding.msgpack is None:
+        return None
+    result = make_solve_result(size)
+    function = lambda: response_encoding.encode(result, "application/msgpack")[0]
+    return _with_payload(function, function())
+
+def time_call(function: Callable[[], Any], repeat: int = 5, min_time: float = 0.2) -> float:
+    """Best seconds per call over `repeat` rounds of at least `min_time` seconds each."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def run_benchmarks(pattern: Optional[str] = None, quick: bool = False) -> Dict[str, float]:
+    """Run the selected benchmarks, returning seconds per call keyed by `name[size]`."""
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        cwd = os.getcwd()
+        # Perceive logs to a file in the working directory; keep that out of the repo
+        os.chdir(scratch)
+        try:
+            for name, (factory, sizes) in BENCHMARKS.items():
+                if pattern and pattern not in name:
+                    continue
+                for size in sizes[:2] if quick else sizes:
+                    workdir = tempfile.mkdtemp(dir=scratch)
+                    function = factory(size, workdir)
+                    if function is None:
+                        continue
+                    key = f"{name}[{size}]"
+                    results[key] = time_call(function, repeat=3 if quick else 5, min_time=0.05 if quick else 0.2)
+                    if hasattr(function, "payload_bytes"):
+                        PAYLOAD_BYTES[key] = function.payload_bytes
+                    if hasattr(function, "iterations"):
+                        ITERATIONS[key] = function.iterations
+        finally:
+            os.chdir(cwd)
+    return results
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> Dict[str, float]:
+    """Benchmarks slower than baseline by more than `threshold` (0.25 = 25%), with their ratios."""
+    return {
+        key: results[key] / baseline[key]
+        for key in results
+        if key in baseline and results[key] > baseline[key] * (1 + threshold)
+    }
+
+def print_results(results: Dict[str, float], baseline: Optional[Dict[str, float]], regressions: Dict[str, float]):
+    table = Table(title="Benchmarks", header_style="bold cyan")
+    table.add_column("Benchmark", style="blue")
+    table.add_column("Time per call", justify="right", style="green")
+    if PAYLOAD_BYTES:
+        table.add_column("Payload", justify="right")
+    if ITERATIONS:
+        table.add_column("Iterations", justify="right")
+    if baseline is not None:
+        table.add_column("Baseline", justify="right")
+        table.add_column("Change", justify="right")
+    for key, seconds in results.items():
+        row = [key, _format_time(seconds)]
+        if PAYLOAD_BYTES:
+            row.append(f"{PAYLOAD_BYTES[key]:,} B" if key in PAYLOAD_BYTES else "")
+        if ITERATIONS:
+            row.append(f"{ITERATIONS[key]:.2f}" if key in ITERATIONS else "")
+        if baseline is not None:
+            if key in baseline:
+                change = f"{(seconds / baseline[key] - 1) * 100:+.1f}%"
+                row += [_format_time(baseline[key]), f"[red]{change}[/red]" if key in regressions else change]
+            else:
+                row += ["-", "new"]
+        table.add_row(*row)
+    console.print(table)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks with regression gates.")
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="fewer sizes and shorter rounds")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline before failing (default 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.pattern, args.quick)
+
+    baseline = None
+    regressions = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+    print_results(results, baseline, regressions)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "results": results,
+                "payload_bytes": PAYLOAD_BYTES,
+                "iterations": ITERATIONS
+            }, f, indent=2)
+
+    if regressions:
+        for key, ratio in regressions.items():
+            console.print(f"[red]✗ Regression: {key} is {ratio:.2f}x its baseline[/red]")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
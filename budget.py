@@ -0,0 +1,188 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import Counter
+import json
+import math
+import os
+import re
+import time
+
+# Rough size of a token when the model response does not report usage
+CHARS_PER_TOKEN = 4
+
+# A FINAL_ANSWER line anywhere in a response, not only as its first line
+FINAL_ANSWER_LINE = re.compile(r"^\s*FINAL_ANSWER:\s*\[([^\]\n]*)\]", re.MULTILINE)
+
+# A response that ends by stating its answer, e.g. "... so the answer is 7." or "Final answer: **7**"
+STATED_ANSWER = re.compile(r"\banswer\s*(?:is|:|=)\s*[*_]*(-?\d[\d,]*(?:\.\d+)?)[\s*_.!\])]*$", re.IGNORECASE)
+
+# Wording that says the work is not done yet, e.g. "next, multiply the result by 3"
+MORE_STEPS = re.compile(r"\b(?:next|then|step|steps|continue|still|remaining|further|after|before|"
+                        r"need|needs|should|must|will|let's|let us)\b", re.IGNORECASE)
+
+def _as_number(text: str) -> Optional[float]:
+    try:
+        return float(text.strip().replace(",", ""))
+    except ValueError:
+        return None
+
+def _same(number: Optional[float], value: float) -> bool:
+    return number is not None and math.isclose(number, value, rel_tol=1e-9, abs_tol=1e-12)
+
+class AgentBudget:
+    """Limits on one agent run. None means unlimited."""
+
+    LIMITS = ("max_llm_calls", "max_input_tokens", "max_output_tokens", "deadline_s", "stall_turns", "max_repeats")
+
+    def __init__(self, max_llm_calls: Optional[int] = 30, max_input_tokens: Optional[int] = None,
+                 max_output_tokens: Optional[int] = None, deadline_s: Optional[float] = None,
+                 stall_turns: Optional[int] = 6, max_repeats: Optional[int] = 3):
+        """
+        max_llm_calls: model calls per run.
+        max_input_tokens / max_output_tokens: tokens summed over all model calls.
+        deadline_s: wall-clock seconds for the whole run.
+        stall_turns: turns in a row without a newly verified result.
+        max_repeats: times the same function call (name and arguments) may be made.
+        """
+        self.max_llm_calls = max_llm_calls
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.deadline_s = deadline_s
+        self.stall_turns = stall_turns
+        self.max_repeats = max_repeats
+
+    @classmethod
+    def from_env(cls) -> "AgentBudget":
+        """Server-wide limits from AGENT_MAX_LLM_CALLS, AGENT_DEADLINE_S, ...; 0 disables a limit."""
+        budget = cls()
+        for limit in cls.LIMITS:
+            value = os.environ.get(f"AGENT_{limit.upper()}")
+            if value is not None:
+                number = float(value) if limit == "deadline_s" else int(value)
+                setattr(budget, limit, number or None)
+        return budget
+
+    def tightened(self, overrides: Optional[Dict[str, Any]]) -> "AgentBudget":
+        """A copy with per-request limits applied; requests can lower limits but not raise them."""
+        if overrides is not None and not isinstance(overrides, dict):
+            raise ValueError("Budget must be an object of limits")
+        budget = AgentBudget(**self.to_dict())
+        for limit, value in (overrides or {}).items():
+            if limit not in self.LIMITS:
+                raise ValueError(f"Unknown budget limit: {limit}")
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"Budget limit {limit} must be a positive number")
+            current = getattr(budget, limit)
+            setattr(budget, limit, value if current is None else min(current, value))
+        return budget
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {limit: getattr(self, limit) for limit in self.LIMITS}
+
+class BudgetTracker:
+    """Tracks one run against its budget and decides when the agent loop should stop.
+
+    The loop reports each model call, the function calls of each turn and the
+    results those calls produced. `check` and `record_calls` return a stop reason
+    once a limit is hit, and `verified_final_answer` picks up a verified answer the
+    model gave without putting FINAL_ANSWER on a line of its own.
+    """
+
+    def __init__(self, budget: AgentBudget, clock=time.monotonic):
+        self.budget = budget
+        self.clock = clock
+        self.started = clock()
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.turns_without_progress = 0
+        self.call_counts = Counter()
+        self.verified = {}
+        # The most recently verified value, which a plain-text answer may restate
+        self.last_verified = None
+
+    def remaining_time(self) -> Optional[float]:
+        if self.budget.deadline_s is None:
+            return None
+        return max(0.0, self.budget.deadline_s - (self.clock() - self.started))
+
+    def check(self, next_prompt: str = "") -> Optional[str]:
+        """Stop reason before sending `next_prompt` to the model, or None to go on."""
+        budget = self.budget
+        if budget.max_llm_calls is not None and self.llm_calls >= budget.max_llm_calls:
+            return "max_llm_calls"
+        if (budget.max_input_tokens is not None
+                and self.input_tokens + math.ceil(len(next_prompt) / CHARS_PER_TOKEN) > budget.max_input_tokens):
+            return "max_input_tokens"
+        if budget.max_output_tokens is not None and self.output_tokens >= budget.max_output_tokens:
+            return "max_output_tokens"
+        if self.remaining_time() == 0:
+            return "deadline"
+        if budget.stall_turns is not None and self.turns_without_progress >= budget.stall_turns:
+            return "stalled"
+        return None
+
+    def record_llm_call(self, prompt: str, response) -> Tuple[int, int]:
+        """Count a model call's tokens, as reported by the model or estimated from the text."""
+        usage = getattr(response, "usage_metadata", None)
+        input_tokens = getattr(usage, "prompt_token_count", None)
+        output_tokens = getattr(usage, "candidates_token_count", None)
+        if input_tokens is None:
+            input_tokens = math.ceil(len(prompt) / CHARS_PER_TOKEN)
+        if output_tokens is None:
+            output_tokens = math.ceil(len(response.text or "") / CHARS_PER_TOKEN)
+        self.llm_calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        return input_tokens, output_tokens
+
+    def record_calls(self, calls) -> Optional[str]:
+        """Count a turn's parsed function calls; "repeated_call" once one is made too often."""
+        for is_valid, call, _ in calls:
+            if not is_valid:
+                continue
+            self.call_counts[json.dumps(call, sort_keys=True, default=str)] += 1
+        if self.budget.max_repeats is not None and any(
+            count > self.budget.max_repeats for count in self.call_counts.values()
+        ):
+            return "repeated_call"
+        return None
+
+    def record_results(self, entries: List[Tuple[str, float, bool]]):
+        """Note a turn's (expression, value, verified) results; a turn without a new verified one is a stall."""
+        progress = False
+        for expression, value, verified in entries:
+            if verified and self.verified.get(expression) != value:
+                self.verified[expression] = value
+                self.last_verified = value
+                progress = True
+        self.turns_without_progress = 0 if progress else self.turns_without_progress + 1
+
+    def verified_final_answer(self, text: str) -> Optional[str]:
+        """The answer a response gives, when it equals a verified result.
+
+        The prompt asks for FINAL_ANSWER alone in its response. A model that adds it
+        after function calls or remarks has still answered, so the run can stop
+        there. So has a model that, without calling anything, ends its response
+        by stating the value it verified last as the answer, e.g. "All checks
+        pass, so the answer is 7.", and says nothing about more steps. Any other
+        mention of a number goes on as usual, and the turn counts as a stall.
+        """
+        for answer in FINAL_ANSWER_LINE.findall(text):
+            number = _as_number(answer)
+            if number is not None and any(_same(number, value) for value in self.verified.values()):
+                return answer.strip()
+        if self.last_verified is None or "FUNCTION_CALL:" in text:
+            return None
+        stated = STATED_ANSWER.search(text.strip())
+        if stated and not MORE_STEPS.search(text) and _same(_as_number(stated.group(1)), self.last_verified):
+            return stated.group(1)
+        return None
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.llm_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "elapsed_s": round(self.clock() - self.started, 3),
+            "limits": self.budget.to_dict()
+        }
@@ -1,82 +1,79 @@
 from mcp.types import TextContent
 from typing import List, Dict, Any, Tuple, Optional
+from collections import OrderedDict
 import math
 import re
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
-from rich import box
+from expression_parser import Node, parse_cached
+from verification import STEP_TIMEOUT, evaluate_expression, evaluate_step
+from evaluation_context import current_context
 
-console = Console()
+# Per-step statuses in a consistency report
+STATUS_OK = "ok"
+STATUS_WARNING = "warning"
+STATUS_ERROR = "error"
+STATUS_INVALID = "invalid"
+
+# Numeric literals in a step expression, matched against earlier step results
+NUMBER_PATTERN = re.compile(r'(?<![\w.])(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+
+def _value_key(value: Any) -> Optional[float]:
+    """Round a value to 10 significant digits so nearly equal numbers match."""
+    try:
+        return float(f"{float(value):.10g}")
+    except (TypeError, ValueError, OverflowError):
+        return None
 
 class Decision:
     """Component responsible for evaluating options and determining actions."""
     
-    def __init__(self, memory):
+    def __init__(self, memory, verification_cache_size: int = 4096, executor=None):
         self.memory = memory
+        # Optional VerificationExecutor; without one, steps are verified in this thread
+        self.executor = executor
+        # Check codes computed by the executor and not yet consumed by the analysis
+        self._prefetched = {}
+        self.verification_cache_size = verification_cache_size
+        # (expression, result) -> verification check code
+        self._verification_cache = OrderedDict()
+        # Steps and per-step reports from the last consistency check, reused incrementally
+        self._checked_steps = []
+        self._step_reports = []
+        self._last_step_state = (None, {})
+        self.consistency_stats = {"evaluated": 0, "reused": 0}
     
     def decide_operation(self, expression: str) -> Tuple[str, List[Any]]:
-        """Decide which mathematical operation to perform based on the expression."""
-        # Check if it's a basic operation
-        if '+' in expression:
-            parts = expression.split('+')
-            return 'add', [int(p.strip()) for p in parts]
-        elif '-' in expression:
-            parts = expression.split('-')
-            return 'subtract', [int(p.strip()) for p in parts]
-        elif '*' in expression:
-            parts = expression.split('*')
-            return 'multiply', [int(p.strip()) for p in parts]
-        elif '/' in expression:
-            parts = expression.split('/')
-            return 'divide', [int(p.strip()) for p in parts]
-        elif '^' in expression:
-            parts = expression.split('^')
-            return 'power', [int(p.strip()) for p in parts]
-        else:
-            # Check for more complex operations
-            if 'sqrt' in expression:
-                num = re.search(r'sqrt\((\d+)\)', expression)
-                if num:
-                    return 'sqrt', [int(num.group(1))]
-            
-            if 'cbrt' in expression:
-                num = re.search(r'cbrt\((\d+)\)', expression)
-                if num:
-                    return 'cbrt', [int(num.group(1))]
-            
-            if 'factorial' in expression or '!' in expression:
-                num = re.search(r'factorial\((\d+)\)|(\d+)!', expression)
-                if num:
-                    return 'factorial', [int(num.group(1) or num.group(2))]
-            
-            if 'log' in expression:
-                num = re.search(r'log\((\d+)\)', expression)
-                if num:
-                    return 'log', [int(num.group(1))]
-            
-            if 'sin' in expression:
-                num = re.search(r'sin\((\d+)\)', expression)
-                if num:
-                    return 'sin', [int(num.group(1))]
-            
-            if 'cos' in expression:
-                num = re.search(r'cos\((\d+)\)', expression)
-                if num:
-                    return 'cos', [int(num.group(1))]
-            
-            if 'tan' in expression:
-                num = re.search(r'tan\((\d+)\)', expression)
-                if num:
-                    return 'tan', [int(num.group(1))]
-            
-            # Default to calculate for complex expressions
+        """Decide which mathematical operation to perform based on the expression.
+        
+        The expression is parsed once into an operation tree. Returns the root
+        operation and its arguments: plain numbers for literal operands, or
+        `Node` subtrees for compound ones. Anything the parser does not support
+        falls back to `calculate`.
+        """
+        tree = parse_cached(expression)
+        if tree is None:
             return 'calculate', [expression]
+        if tree.is_number:
+            return 'calculate', [expression]
+        return tree.op, [arg.args[0] if arg.is_number else arg for arg in tree.args]
+    
+    def evaluate_tree(self, node: Node, action) -> Any:
+        """Evaluate an operation tree bottom-up through the Action methods its nodes are named after."""
+        if node.is_number:
+            return node.args[0]
+        method = getattr(action, node.op)
+        return method(*(self.evaluate_tree(arg, action) for arg in node.args))
+    
+    def execute_operation(self, expression: str, action) -> Any:
+        """Route an expression to native Action operations, or to `calculate` when it cannot be parsed."""
+        tree = parse_cached(expression)
+        if tree is None:
+            return action.calculate(expression)
+        return self.evaluate_tree(tree, action)
     
     def verify_calculation(self, expression: str, expected: float) -> Tuple[bool, str]:
         """Verify if a calculation is correct."""
         try:
-            actual = float(eval(expression))
+            actual = float(evaluate_expression(expression))
             is_correct = abs(actual - float(expected)) < 1e-10
             
             if is_correct:
@@ -86,118 +83,211 @@ class Decision:
         except Exception as e:
             return False, f"Error: {str(e)}"
     
-    def check_consistency(self, steps: List[str]) -> Dict[str, Any]:
-        """Check if calculation steps are consistent with each other."""
-        issues = []
-        warnings = []
-        insights = []
-        
-        # Create a table for step analysis
-        table = Table(
-            title="Step-by-Step Consistency Analysis",
-            box=box.ROUNDED,
-            show_header=True,
-            header_style="bold cyan"
-        )
-        table.add_column("Step", style="cyan")
-        table.add_column("Expression", style="blue")
-        table.add_column("Result", style="green")
-        table.add_column("Checks", style="yellow")
-        
-        previous = None
-        
-        for i, step in enumerate(steps, 1):
-            # Parse the step to get expression and result
+    def _verify_step(self, expression: str, result: str) -> str:
+        """Evaluate one step and return its verification check code, cached by step."""
+        key = (expression, result)
+        if key in self._prefetched:
+            check = self._prefetched.pop(key)
+            # A timeout says nothing about the step, so the next check tries it again
+            if check != STEP_TIMEOUT:
+                self._cache_verification(key, check)
+            return check
+        if key in self._verification_cache:
+            self._verification_cache.move_to_end(key)
+            self.consistency_stats["reused"] += 1
+            return self._verification_cache[key]
+        
+        self.consistency_stats["evaluated"] += 1
+        context = current_context()
+        if context is not None:
+            # Within a solve, reuse what its earlier steps already computed
+            check = evaluate_step(expression, result, lambda e: context.evaluate(e, evaluate_expression))
+        else:
+            check = evaluate_step(expression, result)
+        self._cache_verification(key, check)
+        return check
+    
+    def _cache_verification(self, key: Tuple[str, str], check: str):
+        """Remember a step's verification check code, evicting the oldest entries when full."""
+        self._verification_cache[key] = check
+        while len(self._verification_cache) > self.verification_cache_size:
+            self._verification_cache.popitem(last=False)
+    
+    def _verify_steps_in_parallel(self, steps: List[str]):
+        """Verify uncached steps through the executor so the analysis below only hits the cache."""
+        pending = {}
+        for step in steps:
             parts = step.split('=')
             if len(parts) != 2:
-                issues.append(f"Step {i}: Invalid format")
-                continue
-                
-            expression, result = parts[0].strip(), parts[1].strip()
-            checks = []
-            
-            # Skip empty results
-            if not result:
-                issues.append(f"Step {i}: Empty result")
-                checks.append("[red]✗ Empty result[/red]")
-                table.add_row(
-                    str(i),
-                    expression,
-                    result,
-                    ", ".join(checks)
-                )
                 continue
-            
-            # 1. Basic Calculation Verification
-            try:
-                expected = eval(expression)
-                if abs(float(expected) - float(result)) < 1e-10:
-                    checks.append("[green]✓ Calculation verified[/green]")
-                else:
-                    issues.append(f"Step {i}: Calculation mismatch")
-                    checks.append("[red]✗ Calculation error[/red]")
-            except:
-                warnings.append(f"Step {i}: Couldn't verify calculation")
-                checks.append("[yellow]! Verification failed[/yellow]")
-            
-            # 2. Dependency Analysis
-            if previous:
-                prev_expr, prev_result = previous
-                if str(prev_result) in expression:
-                    checks.append("[green]✓ Uses previous result[/green]")
-                    insights.append(f"Step {i} builds on step {i-1}")
-                else:
-                    checks.append("[blue]○ Independent step[/blue]")
-            
-            # 3. Magnitude Check
-            if previous and result != 0 and previous[1] != 0:
-                try:
-                    ratio = abs(float(result) / float(previous[1]))
-                    if ratio > 1000:
-                        warnings.append(f"Step {i}: Large increase ({ratio:.2f}x)")
-                        checks.append("[yellow]! Large magnitude increase[/yellow]")
-                    elif ratio < 0.001:
-                        warnings.append(f"Step {i}: Large decrease ({1/ratio:.2f}x)")
-                        checks.append("[yellow]! Large magnitude decrease[/yellow]")
-                except (ValueError, ZeroDivisionError):
-                    warnings.append(f"Step {i}: Couldn't compare magnitudes")
-                    checks.append("[yellow]! Magnitude comparison failed[/yellow]")
-            
-            # 4. Pattern Analysis
-            operators = re.findall(r'[\+\-\*\/\(\)]', expression)
-            if '(' in operators and ')' not in operators:
-                warnings.append(f"Step {i}: Mismatched parentheses")
-                checks.append("[red]✗ Invalid parentheses[/red]")
-            
-            # 5. Result Range Check
+            key = (parts[0].strip(), parts[1].strip())
+            if key[1] and key not in self._verification_cache:
+                pending[key] = None
+        if not pending:
+            return
+        pairs = list(pending)
+        self.consistency_stats["evaluated"] += len(pairs)
+        self._prefetched = dict(zip(pairs, self.executor.verify_many(pairs)))
+    
+    def _analyze_step(self, i: int, step: str, previous: Optional[Tuple[str, str]],
+                      value_index: Dict[float, int]) -> Dict[str, Any]:
+        """Run all checks for one step against the steps before it."""
+        report = {"step": i, "expression": step, "result": None, "status": STATUS_INVALID,
+                  "checks": [], "depends_on": [], "issues": [], "warnings": [], "insights": []}
+        checks, issues, warnings = report["checks"], report["issues"], report["warnings"]
+        
+        # Parse the step to get expression and result
+        parts = step.split('=')
+        if len(parts) != 2:
+            issues.append(f"Step {i}: Invalid format")
+            return report
+        
+        expression, result = parts[0].strip(), parts[1].strip()
+        report["expression"], report["result"] = expression, result
+        
+        # Skip empty results
+        if not result:
+            issues.append(f"Step {i}: Empty result")
+            checks.append("empty_result")
+            report["status"] = STATUS_ERROR
+            return report
+        
+        # 1. Basic Calculation Verification
+        check = self._verify_step(expression, result)
+        checks.append(check)
+        if check == "calculation_error":
+            issues.append(f"Step {i}: Calculation mismatch")
+        elif check == "verification_failed":
+            warnings.append(f"Step {i}: Couldn't verify calculation")
+        elif check == STEP_TIMEOUT:
+            warnings.append(f"Step {i}: Verification timed out")
+        
+        # 2. Dependency Analysis: numbers matching the result of any earlier step
+        if previous:
+            depends_on = set()
+            for number in NUMBER_PATTERN.findall(expression):
+                source = value_index.get(_value_key(number))
+                if source is not None:
+                    depends_on.add(source)
+            report["depends_on"] = sorted(depends_on)
+            if depends_on:
+                checks.append("uses_previous")
+                report["insights"] = [f"Step {i} builds on step {source}" for source in report["depends_on"]]
+            else:
+                checks.append("independent")
+        
+        # 3. Magnitude Check
+        if previous and result != 0 and previous[1] != 0:
             try:
-                if abs(float(result)) > 1e6:
-                    warnings.append(f"Step {i}: Very large result")
-                    checks.append("[yellow]! Large result[/yellow]")
-                elif abs(float(result)) < 1e-6 and float(result) != 0:
-                    warnings.append(f"Step {i}: Very small result")
-                    checks.append("[yellow]! Small result[/yellow]")
-            except ValueError:
-                warnings.append(f"Step {i}: Couldn't check result range")
-                checks.append("[yellow]! Range check failed[/yellow]")
-            
-            # Add row to table
-            table.add_row(
-                str(i),
-                expression,
-                result,
-                ", ".join(checks)
-            )
-            
-            # Store for next iteration
-            previous = (expression, result)
+                ratio = abs(float(result) / float(previous[1]))
+                if ratio > 1000:
+                    warnings.append(f"Step {i}: Large increase ({ratio:.2f}x)")
+                    checks.append("large_increase")
+                elif ratio < 0.001:
+                    warnings.append(f"Step {i}: Large decrease ({1/ratio:.2f}x)")
+                    checks.append("large_decrease")
+            except (ValueError, ZeroDivisionError):
+                warnings.append(f"Step {i}: Couldn't compare magnitudes")
+                checks.append("magnitude_failed")
+        
+        # 4. Pattern Analysis
+        operators = re.findall(r'[\+\-\*\/\(\)]', expression)
+        if '(' in operators and ')' not in operators:
+            warnings.append(f"Step {i}: Mismatched parentheses")
+            checks.append("invalid_parentheses")
+        
+        # 5. Result Range Check
+        try:
+            if abs(float(result)) > 1e6:
+                warnings.append(f"Step {i}: Very large result")
+                checks.append("large_result")
+            elif abs(float(result)) < 1e-6 and float(result) != 0:
+                warnings.append(f"Step {i}: Very small result")
+                checks.append("small_result")
+        except ValueError:
+            warnings.append(f"Step {i}: Couldn't check result range")
+            checks.append("range_failed")
+        
+        if issues:
+            report["status"] = STATUS_ERROR
+        elif warnings:
+            report["status"] = STATUS_WARNING
+        else:
+            report["status"] = STATUS_OK
+        return report
+    
+    @staticmethod
+    def _register_step(report: Dict[str, Any], previous: Optional[Tuple[str, str]],
+                       value_index: Dict[float, int]) -> Optional[Tuple[str, str]]:
+        """Make a checked step visible to later steps, returning the new previous step."""
+        if report["status"] == STATUS_INVALID or not report["result"]:
+            return previous
+        key = _value_key(report["result"])
+        if key is not None:
+            value_index[key] = report["step"]
+        return (report["expression"], report["result"])
+    
+    def check_consistency(self, steps: List[str]) -> Dict[str, Any]:
+        """Check if calculation steps are consistent with each other.
+        
+        Returns a plain report with a status and check codes per step, the issues,
+        warnings and insights found, dependency edges between steps and an overall
+        score. Nothing is rendered here; see `output.ConsoleSink`.
+        
+        Checks are incremental across calls: steps shared with the previous call's
+        prefix are reused as is, and each step is only evaluated once. Steps whose
+        verification timed out are checked again.
+        """
+        steps = list(steps)
+        prefix = 0
+        limit = min(len(steps), len(self._checked_steps))
+        while (prefix < limit and steps[prefix] == self._checked_steps[prefix]
+               and STEP_TIMEOUT not in self._step_reports[prefix]["checks"]):
+            prefix += 1
+        
+        step_reports = self._step_reports[:prefix]
+        if prefix == len(self._checked_steps):
+            previous, value_index = self._last_step_state
+        else:
+            # An earlier step changed: replay the unchanged prefix to rebuild the state
+            previous, value_index = None, {}
+            for report in step_reports:
+                previous = self._register_step(report, previous, value_index)
+        
+        if self.executor is not None:
+            self._verify_steps_in_parallel(steps[prefix:])
+        
+        for i in range(prefix, len(steps)):
+            report = self._analyze_step(i + 1, steps[i], previous, value_index)
+            previous = self._register_step(report, previous, value_index)
+            step_reports.append(report)
+        
+        self._prefetched = {}
+        self._checked_steps = steps
+        self._step_reports = step_reports
+        self._last_step_state = (previous, value_index)
+        
+        issues = [issue for report in step_reports for issue in report["issues"]]
+        warnings = [warning for report in step_reports for warning in report["warnings"]]
+        insights = [insight for report in step_reports for insight in report["insights"]]
+        dependencies = [(source, report["step"]) for report in step_reports for source in report["depends_on"]]
+        
+        # Consistency score
+        total_checks = len(steps) * 5  # 5 types of checks per step
+        passed_checks = total_checks - (len(issues) * 2 + len(warnings))
+        score = (passed_checks / total_checks) * 100 if total_checks > 0 else 0
         
         # Generate report
         report = {
+            "steps": step_reports,
             "issues": issues,
             "warnings": warnings,
             "insights": insights,
-            "table": table
+            "dependencies": dependencies,
+            "total_checks": total_checks,
+            "passed_checks": passed_checks,
+            "score": score,
+            "rechecked_steps": len(steps) - prefix
         }
         
         return report
@@ -0,0 +1,211 @@
+from typing import Any, Callable, Optional, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import math
+import operator
+import re
+import weakref
+from expression_parser import Node, parse_cached
+import number_theory
+
+# Operation tree node -> function computing it exactly as Python's eval would
+OPERATIONS = {
+    'add': operator.add,
+    'subtract': operator.sub,
+    'multiply': operator.mul,
+    'divide': operator.truediv,
+    'remainder': operator.mod,
+    'power': operator.pow,
+    'sqrt': math.sqrt,
+    'cbrt': getattr(math, 'cbrt', None),
+    # Refuses results past number_theory's size limit instead of building them
+    'factorial': number_theory.factorial,
+    'log': math.log,
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+}
+
+# Operations whose operands can be swapped without changing the result
+COMMUTATIVE = {'add', 'multiply'}
+
+# Where the parser and eval disagree, the fallback decides: '^' and '!' (power and
+# factorial vs. XOR and a syntax error), bare names, integers with leading zeros and
+# line breaks, which eval rejects. Non-ASCII digits are checked for separately.
+EVAL_MISMATCH = re.compile(r"[\^!]|[^\S \t]|(?<![\w.])0\d|(?<![\w.])(?!math\.)[A-Za-z_][\w.]*")
+
+class _Ambiguous(Exception):
+    """The tree cannot tell which of two eval results is right."""
+
+_current_context: ContextVar[Optional["EvaluationContext"]] = ContextVar("evaluation_context", default=None)
+
+# MCP session -> its solve's context, dropped with the session
+_session_contexts = weakref.WeakKeyDictionary()
+
+def _value_key(value: Any) -> Tuple[str, Any]:
+    """Memo key of an operand: its type and exact value, telling 2 from 2.0 and 0.0 from -0.0."""
+    if isinstance(value, int):
+        return ('int', value)
+    return (type(value).__name__, repr(value))
+
+class EvaluationContext:
+    """Memo of everything evaluated during one solve, shared by its tool calls.
+
+    Expressions are parsed into operation trees and folded bottom-up. Each node
+    is keyed by its operation and the exact values of its operands, with the
+    operands of + and * sorted, so a subtree computed by an earlier step is
+    reused wherever the same computation comes up again, whether it is written
+    as a subexpression or as the number an earlier step returned.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._expressions = OrderedDict()
+        # Whole subtrees already folded, so a step built on an earlier one skips re-walking it
+        self._subtrees = OrderedDict()
+        self._nodes = OrderedDict()
+        self._results = OrderedDict()
+        self.stats = {
+            "expressions": 0,
+            "expression_hits": 0,
+            "nodes_evaluated": 0,
+            "nodes_reused": 0,
+            "linked_literals": 0,
+            "fallbacks": 0,
+        }
+
+    def _remember(self, cache: OrderedDict, key: Any, value: Any):
+        cache[key] = value
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def _fold(self, tree: Node) -> Any:
+        """Evaluate a tree bottom-up, reusing memoized nodes; iterative, so deep trees are fine."""
+        subtree_keys = _subtree_keys(tree)
+        values = []
+        stack = [(tree, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node.is_number:
+                value = node.args[0]
+                if _value_key(value) in self._results:
+                    self.stats["linked_literals"] += 1
+                values.append(value)
+            elif not expanded:
+                subtree_key = subtree_keys[id(node)]
+                if subtree_key in self._subtrees:
+                    self._subtrees.move_to_end(subtree_key)
+                    self.stats["nodes_reused"] += 1
+                    values.append(self._subtrees[subtree_key])
+                    continue
+                stack.append((node, True))
+                stack.extend((arg, False) for arg in reversed(node.args))
+            else:
+                operands = values[-len(node.args):]
+                del values[-len(node.args):]
+                keys = [_value_key(operand) for operand in operands]
+                if node.op in COMMUTATIVE:
+                    keys.sort()
+                key = (node.op, *keys)
+                if key in self._nodes:
+                    self._nodes.move_to_end(key)
+                    self.stats["nodes_reused"] += 1
+                    value = self._nodes[key]
+                else:
+                    self.stats["nodes_evaluated"] += 1
+                    value = OPERATIONS[node.op](*operands)
+                    self._remember(self._nodes, key, value)
+                if key[:2] == ('subtract', ('int', 0)) and value == 0 and not isinstance(value, int):
+                    # The parser writes -x as 0 - x, which differ in the sign of a zero result
+                    raise _Ambiguous()
+                self._remember(self._subtrees, subtree_keys[id(node)], value)
+                self._remember(self._results, _value_key(value), True)
+                values.append(value)
+        return values[0]
+
+    def evaluate(self, expression: str, fallback: Callable[[str], Any], fold: bool = True) -> Any:
+        """Value of an expression, reusing this solve's earlier work where possible.
+
+        Expressions the tree cannot evaluate exactly like eval are handed to
+        `fallback`, and so is every expression when `fold` is False, e.g. when
+        `fallback` enforces a time limit that folding here would escape; whole
+        expressions are still reused then. Errors are raised, not memoized.
+        """
+        self.stats["expressions"] += 1
+        if expression in self._expressions:
+            self._expressions.move_to_end(expression)
+            self.stats["expression_hits"] += 1
+            return self._expressions[expression]
+
+        tree = _evaluable_tree(expression) if fold else None
+        if tree is not None:
+            try:
+                value = self._fold(tree)
+            except _Ambiguous:
+                tree = None
+        if tree is None:
+            self.stats["fallbacks"] += 1
+            value = fallback(expression)
+
+        self.record(expression, value)
+        return value
+
+    def record(self, expression: str, value: Any):
+        """Remember a result computed elsewhere, e.g. served from the memory's index."""
+        self._remember(self._expressions, expression, value)
+        if isinstance(value, (int, float, complex)):
+            self._remember(self._results, _value_key(value), True)
+
+def _subtree_keys(tree: Node) -> dict:
+    """Memo key of every operation node in a tree, by id; unlike the nodes themselves,
+    the keys tell 2 from 2.0 and 0.0 from -0.0 in the literals."""
+    keys = {}
+    stack = [(tree, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node.is_number:
+            keys[id(node)] = _value_key(node.args[0])
+        elif not expanded:
+            stack.append((node, True))
+            stack.extend((arg, False) for arg in node.args)
+        else:
+            keys[id(node)] = (node.op, *(keys[id(arg)] for arg in node.args))
+    return keys
+
+def _evaluable_tree(expression: str) -> Optional[Node]:
+    """The expression's operation tree when folding it gives exactly what eval would, else None."""
+    if not expression.isascii() or EVAL_MISMATCH.search(expression):
+        return None
+    try:
+        tree = parse_cached(expression)
+    except RecursionError:
+        return None
+    stack = [tree] if tree is not None else []
+    while stack:
+        node = stack.pop()
+        if not node.is_number:
+            if OPERATIONS.get(node.op) is None:
+                return None
+            stack.extend(node.args)
+    return tree
+
+def context_for(session: Any) -> EvaluationContext:
+    """The evaluation context of an MCP session, created on first use."""
+    context = _session_contexts.get(session)
+    if context is None:
+        context = _session_contexts[session] = EvaluationContext()
+    return context
+
+def current_context() -> Optional[EvaluationContext]:
+    """The context of the solve whose tool call is running, if any."""
+    return _current_context.get()
+
+@contextmanager
+def using(context: Optional[EvaluationContext]):
+    """Make `context` current for the duration of a tool call."""
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
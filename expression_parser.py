@@ -0,0 +1,178 @@
+from typing import Any, List, NamedTuple, Optional, Tuple, Union
+from functools import lru_cache
+import re
+
+# One compiled pattern tokenizes a whole expression in a single pass
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<operator>\*\*|[-+*/%^()!])
+      | (?P<name>[A-Za-z_][\w.]*)
+    )""", re.VERBOSE)
+
+# Binary operators and the Action method each one maps to
+BINARY_OPERATORS = {
+    '+': 'add',
+    '-': 'subtract',
+    '*': 'multiply',
+    '/': 'divide',
+    '%': 'remainder',
+    '^': 'power',
+    '**': 'power',
+}
+
+# Single-argument functions and the Action method each one maps to
+FUNCTIONS = {
+    'sqrt': 'sqrt',
+    'cbrt': 'cbrt',
+    'factorial': 'factorial',
+    'log': 'log',
+    'sin': 'sin',
+    'cos': 'cos',
+    'tan': 'tan',
+}
+
+class ParseError(ValueError):
+    """Raised when an expression cannot be parsed into an operation tree."""
+
+class Node(NamedTuple):
+    """A node of an operation tree.
+
+    `op` is 'number' for literals, whose single arg is the value, or the name of
+    the Action method that computes the node from its child nodes.
+    """
+    op: str
+    args: Tuple[Any, ...]
+
+    @property
+    def is_number(self) -> bool:
+        return self.op == 'number'
+
+def tokenize(expression: str) -> List[Tuple[str, Union[str, int, float]]]:
+    """Split an expression into (kind, value) tokens."""
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if not match:
+            raise ParseError(f"Unexpected character {expression[position]!r} at position {position}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'number':
+            value = float(text) if any(c in text for c in '.eE') else int(text)
+            tokens.append(('number', value))
+        elif kind == 'name':
+            name = text[5:] if text.startswith('math.') else text
+            if name not in FUNCTIONS:
+                raise ParseError(f"Unknown function: {text}")
+            tokens.append(('name', name))
+        else:
+            tokens.append(('operator', text))
+        position = match.end()
+    return tokens
+
+class _Parser:
+    """Recursive-descent parser over a token list, following Python precedence."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[Tuple[str, Any]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def accept(self, *operators: str) -> Optional[str]:
+        token = self.peek()
+        if token and token[0] == 'operator' and token[1] in operators:
+            self.position += 1
+            return token[1]
+        return None
+
+    def expect(self, operator: str):
+        if not self.accept(operator):
+            raise ParseError(f"Expected '{operator}'")
+
+    def parse(self) -> Node:
+        node = self.expression()
+        if self.peek() is not None:
+            raise ParseError(f"Unexpected token: {self.peek()[1]}")
+        return node
+
+    def expression(self) -> Node:
+        node = self.term()
+        while True:
+            operator = self.accept('+', '-')
+            if not operator:
+                return node
+            node = Node(BINARY_OPERATORS[operator], (node, self.term()))
+
+    def term(self) -> Node:
+        node = self.unary()
+        while True:
+            operator = self.accept('*', '/', '%')
+            if not operator:
+                return node
+            node = Node(BINARY_OPERATORS[operator], (node, self.unary()))
+
+    def unary(self) -> Node:
+        if self.accept('+'):
+            return self.unary()
+        if self.accept('-'):
+            operand = self.unary()
+            if operand.is_number:
+                return Node('number', (-operand.args[0],))
+            return Node('subtract', (Node('number', (0,)), operand))
+        return self.power()
+
+    def power(self) -> Node:
+        base = self.postfix()
+        operator = self.accept('^', '**')
+        if operator:
+            # Right-associative, and binds tighter than a unary minus on its left
+            return Node('power', (base, self.unary()))
+        return base
+
+    def postfix(self) -> Node:
+        node = self.primary()
+        while self.accept('!'):
+            node = Node('factorial', (node,))
+        return node
+
+    def primary(self) -> Node:
+        token = self.peek()
+        if token is None:
+            raise ParseError("Unexpected end of expression")
+        kind, value = token
+        if kind == 'number':
+            self.position += 1
+            return Node('number', (value,))
+        if kind == 'name':
+            self.position += 1
+            self.expect('(')
+            argument = self.expression()
+            self.expect(')')
+            return Node(FUNCTIONS[value], (argument,))
+        if self.accept('('):
+            node = self.expression()
+            self.expect(')')
+            return node
+        raise ParseError(f"Unexpected token: {value}")
+
+def parse(expression: str) -> Node:
+    """Parse an expression into an operation tree, raising ParseError when it is not supported."""
+    tree = parse_cached(expression)
+    if tree is None:
+        raise ParseError(f"Unsupported expression: {expression}")
+    return tree
+
+@lru_cache(maxsize=1024)
+def parse_cached(expression: str) -> Optional[Node]:
+    """Parse an expression into an operation tree, caching results by expression.
+
+    Returns None for expressions that cannot be parsed, so failures are cached too.
+    """
+    try:
+        return _Parser(tokenize(expression)).parse()
+    except ParseError:
+        return None
@@ -1,17 +1,33 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 import asyncio
 import os
 import tempfile
 import json
+import hashlib
 from dotenv import load_dotenv
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.client.sse import sse_client
 from google import genai
 from rich.console import Console
 import sys
 import threading
+import itertools
+import math
 import time
+from typing import List, Optional, Tuple
+from tool_registry import describe_tools, validate_arguments
+from budget import AgentBudget, BudgetTracker
+import profiling
+import problem_index
+import response_encoding
+import result_cache
+import scheduler
+import number_theory
+
+# Tool results may hold ints past Python's default 4300-digit conversion limit
+number_theory.allow_result_digits()
 
 # Create Flask app
 app = Flask(__name__)
@@ -19,128 +35,308 @@ CORS(app)  # Enable CORS for Chrome extension
 
 console = Console()
 
-async def process_math_problem(gemini_api_key, problem):
-    """Process a math problem using the MathAgent framework"""
+# Shared tool servers started with `python math_tools.py sse`, as comma-separated SSE URLs.
+# When none are configured, every request spawns its own math_tools.py over stdio.
+MATH_TOOLS_URLS = [url.strip() for url in os.environ.get("MATH_TOOLS_URL", "").split(",") if url.strip()]
+_tool_server_urls = itertools.cycle(MATH_TOOLS_URLS) if MATH_TOOLS_URLS else None
+
+def tool_server_transport():
+    """Connect to the next shared tool server, or spawn a private stdio one when none is configured."""
+    if _tool_server_urls:
+        return sse_client(next(_tool_server_urls))
+    return stdio_client(StdioServerParameters(
+        command="python",
+        args=["math_tools.py"]
+    ))
+
+# Opt-in profiling of single requests (X-Profile: 1 header or ?profile=1), rate-limited
+PROFILE_LIMITER = profiling.ProfileRateLimiter(
+    max_profiles=int(os.environ.get("PROFILE_MAX_PER_MINUTE", "5")),
+    window=60.0
+)
+
+# Most profiles GET /api/profiles returns, whatever ?limit= asks for
+MAX_PROFILES_LISTED = 200
+
+class TracedSession:
+    """Session wrapper that passes the request's trace id with every tool call,
+    so the tool server profiles the calls into the same trace."""
+
+    def __init__(self, session, trace_id: str):
+        self.session = session
+        self.trace_id = trace_id
+
+    async def call_tool(self, name, arguments=None):
+        return await self.session.call_tool(name, arguments={**(arguments or {}), "trace_id": self.trace_id})
+
+# LLM_BACKEND=scripted swaps Gemini for a local scripted model, for load tests without network
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini")
+
+def make_llm_client(api_key):
+    if LLM_BACKEND == "scripted":
+        from scripted_llm import ScriptedClient
+        return ScriptedClient(api_key)
+    return genai.Client(api_key=api_key)
+
+# Admission of solves: fair between API keys, interactive before batch (SOLVE_CONCURRENCY, SCHEDULER_*)
+SCHEDULER = scheduler.FairScheduler.from_env()
+
+# Server-wide limits per request (AGENT_MAX_LLM_CALLS, AGENT_DEADLINE_S, ...); requests may lower them
+AGENT_BUDGET = AgentBudget.from_env()
+
+# Tools offered to the model in the system prompt
+PROMPT_TOOLS = [
+    "show_reasoning", "calculate", "verify", "fallback_reasoning",
+    "calculate_many", "verify_many", "calculate_and_verify",
+]
+
+SYSTEM_PROMPT = """You are a mathematical reasoning agent that solves problems step by step, tags the reasoning type, performs internal self-checks, and uses tools when appropriate.
+                You have access to these tools:
+                """ + describe_tools(PROMPT_TOOLS) + """
+                Each show_reasoning step must include a label for the type of reasoning (e.g., arithmetic, logic, pattern).
+
+                Instructions:
+                1. Always start with reasoning. Use show_reasoning to break down the problem with labeled steps. This is mandatory for all the prompt you might get.
+                2. Tag each step with the type of reasoning used: Eg: ""Arithmetic", "Logical" and "Entity Lookup". This is mandatory for all step.
+                3. Then calculate using calculate(). Put independent calculations in a single calculate_many() call.
+                4. After each calculation, verify using verify(), or verify several results at once with verify_many(). When you already expect a value, calculate_and_verify() does both in one call.
+                5. If you are unsure, or a tool result is inconsistent, call fallback_reasoning() with an explanation.
+                6. Before giving the final answer, re-check the logic and calculations, and state explicitly if they pass self-checks.
+                7. Respond in one of the following formats:
+                        FUNCTION_CALL: {"name": "function_name", "args": {"arg1": "value1", "arg2": "value2", ...}}
+                        FINAL_ANSWER: [answer]
+                   You may put several FUNCTION_CALL lines in one response, or a JSON array of calls after a single FUNCTION_CALL:, but only for calls that do not depend on each other's results. They run at the same time and you get all their results in the next message. A FINAL_ANSWER must be the only line of its response."""
+
+# Cached solves are keyed by this as well, so a new model or prompt never serves old answers
+LLM_MODEL = "gemini-2.0-flash"
+SOLVE_VERSION = (LLM_BACKEND, LLM_MODEL, hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:12])
+
+# Final answers of earlier solves, shared between workers when RESULT_CACHE_PATH is set
+RESULT_CACHE = result_cache.ResultCache.from_env()
+# Start with the solves other workers answered most recently instead of an empty memory tier
+RESULT_CACHE.warm_from_shared("solve", int(os.environ.get("RESULT_CACHE_MEMORY_ENTRIES", "1024")))
+SOLVE_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL_S", "86400")) or None
+
+# Only runs the model ended with a FINAL_ANSWER of its own are served again or indexed
+CACHEABLE_STOP_REASONS = ("final_answer",)
+
+# Solved problems whose calculate chain answers the same problem with other numbers; off unless set
+PROBLEM_INDEX_PATH = os.environ.get("PROBLEM_INDEX_PATH", "")
+PROBLEM_INDEX = problem_index.ProblemIndex(PROBLEM_INDEX_PATH) if PROBLEM_INDEX_PATH else None
+
+def index_solved_problem(problem, conversation_history, final_answer):
+    """Add a solve's calculations, each expression once in the order computed, to the problem index."""
+    calculations, seen = [], set()
+    for expression, value, _ in conversation_history:
+        if expression not in seen:
+            seen.add(expression)
+            calculations.append((expression, value))
+    try:
+        PROBLEM_INDEX.add(problem, calculations, final_answer)
+    except Exception as e:
+        console.print(f"Error: {e}")
+
+def template_result(match):
+    """Solve response for a problem answered by replaying a similar solved problem's calculations."""
+    conversation = []
+    for expression, value in match["steps"]:
+        call = {"name": "calculate", "args": {"expression": expression}}
+        conversation.append({"role": "assistant", "content": f"FUNCTION_CALL: {json.dumps(call)}"})
+        conversation.append({"role": "user", "content": f"Result is {value}."})
+    conversation.append({"role": "assistant", "content": f"FINAL_ANSWER: [{match['final_answer']}]"})
+    return {
+        "success": True,
+        "conversation": conversation,
+        "final_answer": match["final_answer"],
+        "iterations": 0,
+        "stop_reason": "template_match",
+        "template": {"source": match["source"], "similarity": match["similarity"]}
+    }
+
+def _tool_value(text):
+    """A numeric tool result for the conversation history, exact when it is an integer.
+
+    float() would turn an integer result past the float range into inf.
+    """
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+async def handle_show_reasoning(session, name, arguments, conversation_history):
+    await session.call_tool(name, arguments=arguments)
+    return "Next step?"
+
+async def handle_calculate(session, name, arguments, conversation_history):
+    calc_result = await session.call_tool(name, arguments=arguments)
+    if not calc_result.content or calc_result.content[0].text.startswith("Error"):
+        return "Error occurred. Fallback triggered. Please reconsider this step or try an alternative approach."
+    value = calc_result.content[0].text
+    conversation_history.append((arguments["expression"], _tool_value(value), False))
+    return f"Result is {value}. Let's verify this step."
+
+async def handle_verify(session, name, arguments, conversation_history):
+    verify_result = await session.call_tool(name, arguments=arguments)
+    if verify_result.content and verify_result.content[0].text == "True":
+        conversation_history.append((arguments["expression"], float(arguments["expected"]), True))
+    return "Verification completed. Next step?"
+
+async def handle_fallback_reasoning(session, name, arguments, conversation_history):
+    await session.call_tool(name, arguments=arguments)
+    return "Fallback processed. Please proceed with an alternative approach."
+
+def _items(tool_result):
+    """Per-item results of a batch tool, or None when the call failed."""
+    if not tool_result.content or tool_result.content[0].text.startswith("Error"):
+        return None
+    return json.loads(tool_result.content[0].text)["result"]
+
+async def handle_calculate_many(session, name, arguments, conversation_history):
+    items = _items(await session.call_tool(name, arguments=arguments))
+    if items is None:
+        return "Error occurred. Fallback triggered. Please reconsider these steps or try an alternative approach."
+    for item in items:
+        if "result" in item:
+            conversation_history.append((item["expression"], _tool_value(item["result"]), False))
+    return f"Results are {json.dumps(items)}. Let's verify these steps, e.g. with verify_many()."
+
+async def handle_verification_batch(session, name, arguments, conversation_history):
+    items = _items(await session.call_tool(name, arguments=arguments))
+    if items is None:
+        return "Error occurred. Fallback triggered. Please reconsider these steps or try an alternative approach."
+    if isinstance(items, dict):
+        items = [items]
+    for item in items:
+        if item.get("correct"):
+            conversation_history.append((item["expression"], item["actual"], True))
+    return f"Verification results are {json.dumps(items)}. Next step?"
+
+async def handle_tool(session, name, arguments, conversation_history):
+    """Default handler for registry tools without special follow-up wording."""
+    tool_result = await session.call_tool(name, arguments=arguments)
+    if not tool_result.content:
+        return "Error occurred. No result returned. Please try an alternative approach."
+    return f"Result is {tool_result.content[0].text}. Next step?"
+
+async def fetch_evaluation_stats(session):
+    """Reuse counters of the solve's evaluation context on the tool server, or None."""
+    try:
+        return _items(await session.call_tool("evaluation_stats", arguments={}))
+    except Exception as e:
+        console.print(f"Error: {e}")
+        return None
+
+# Tool name -> coroutine that calls it and returns the follow-up message for the model
+TOOL_HANDLERS = {
+    "show_reasoning": handle_show_reasoning,
+    "calculate": handle_calculate,
+    "verify": handle_verify,
+    "fallback_reasoning": handle_fallback_reasoning,
+    "calculate_many": handle_calculate_many,
+    "verify_many": handle_verification_batch,
+    "calculate_and_verify": handle_verification_batch,
+}
+
+async def process_math_problem(gemini_api_key, problem, trace_id=None, budget=None):
+    """Process a math problem using the MathAgent framework
+    
+    With a trace id, tool calls are profiled by the tool server under that id.
+    The run stops early when it exhausts `budget` (default AGENT_BUDGET), loops,
+    or gives a verified FINAL_ANSWER alongside other output or restates the last verified
+    value; `stop_reason` says which.
+    """
+    tracker = BudgetTracker(budget or AGENT_BUDGET)
     try:
         # Configure Gemini with the provided API key
         os.environ["GEMINI_API_KEY"] = gemini_api_key
-        client = genai.Client(api_key=gemini_api_key)
+        client = make_llm_client(gemini_api_key)
         
         # Create a temporary .env file with the API key
         with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.env') as temp_env:
             temp_env.write(f"GEMINI_API_KEY={gemini_api_key}\n")
             temp_env_path = temp_env.name
         
-        # Set up server parameters to run the math tools
-        server_params = StdioServerParameters(
-            command="python",
-            args=["math_tools.py"]
-        )
-        
         # Store results from the calculation
         calculation_results = []
         final_answer = None
         
-        async with stdio_client(server_params) as (read, write):
+        async with tool_server_transport() as (read, write):
             async with ClientSession(read, write) as session:
                 await session.initialize()
+                if trace_id:
+                    session = TracedSession(session, trace_id)
 
-                system_prompt = """You are a mathematical reasoning agent that solves problems step by step, tags the reasoning type, performs internal self-checks, and uses tools when appropriate.
-                You have access to these tools:
-                show_reasoning(steps: list) - Display your reasoning steps. Each step must include a label for the type of reasoning (e.g., arithmetic, logic, pattern).
-                calculate(expression: str)- Calculate the result of an expression.
-                verify(expression: str, expected: float) - Check if a calculation is correct.
-                fallback(reason: str) - Use this if a tool fails or you are uncertain how to proceed.
-
-                Instructions:
-                1. Always start with reasoning. Use show_reasoning to break down the problem with labeled steps. This is mandatory for all the prompt you might get.
-                2. Tag each step with the type of reasoning used: Eg: ""Arithmetic", "Logical" and "Entity Lookup". This is mandatory for all step.
-                3. Then calculate using calculate().
-                4. After each calculation, verify using verify().
-                5. If you are unsure, or a tool result is inconsistent, call fallback() with an explanation.
-                6. Before giving the final answer, re-check the logic and calculations, and state explicitly if they pass self-checks.
-                7. Respond with exactly ONE line in one of the following formats:
-                        FUNCTION_CALL: {"name": "function_name", "args": {"arg1": "value1", "arg2": "value2", ...}}
-                        FINAL_ANSWER: [answer]"""
-
-                prompt = f"{system_prompt}\n\nSolve this problem step by step: {problem}"
+                prompt = f"{SYSTEM_PROMPT}\n\nSolve this problem step by step: {problem}"
                 conversation_history = []
-                
-                # Maximum iterations to prevent infinite loops
-                max_iterations = 30
                 iterations = 0
+                stop_reason = None
                 
-                while iterations < max_iterations:
+                while True:
+                    stop_reason = tracker.check(prompt)
+                    if stop_reason:
+                        break
                     iterations += 1
                     
-                    response = await generate_with_timeout(client, prompt)
+                    remaining = tracker.remaining_time()
+                    response = await generate_with_timeout(client, prompt, 10 if remaining is None else min(10, remaining))
                     if not response or not response.text:
+                        stop_reason = "deadline" if tracker.remaining_time() == 0 else "no_response"
                         break
+                    tracker.record_llm_call(prompt, response)
 
                     result = response.text.strip()
                     calculation_results.append({"role": "assistant", "content": result})
                     
                     if result.startswith("FUNCTION_CALL:"):
-                        # Extract and process function calls
+                        # Run every call in the turn concurrently and answer them in one user turn
+                        calls = parse_function_calls(result)
+                        final_answer = tracker.verified_final_answer(result)
+                        if final_answer:
+                            stop_reason = "verified_answer"
+                            break
+                        stop_reason = tracker.record_calls(calls)
+                        if stop_reason:
+                            break
+                        seen = len(conversation_history)
                         try:
-                            is_valid, parsed_json, validation_message = validate_json(result)
-                            
-                            if parsed_json:
-                                func_name = parsed_json["name"]
-                                args = parsed_json["args"]
-                                
-                                if func_name == "show_reasoning":
-                                    steps = args.get("steps", [])
-                                    await session.call_tool("show_reasoning", arguments={"steps": steps})
-                                    prompt += f"\nUser: Next step?"
-                                    calculation_results.append({"role": "user", "content": "Next step?"})
-                                    
-                                elif func_name == "calculate":
-                                    expression = args.get("expression", "")
-                                    calc_result = await session.call_tool("calculate", arguments={"expression": expression})
-                                    
-                                    if calc_result.content:
-                                        value = calc_result.content[0].text
-                                        prompt += f"\nUser: Result is {value}. Let's verify this step."
-                                        calculation_results.append({"role": "user", "content": f"Result is {value}. Let's verify this step."})
-                                        conversation_history.append((expression, float(value)))
-                                    else:
-                                        error_msg = "No calculation result returned"
-                                        prompt += f"\nUser: Error occurred. Fallback triggered. Please reconsider this step or try an alternative approach."
-                                        calculation_results.append({"role": "user", "content": f"Error: {error_msg}"})
-                                        
-                                elif func_name == "verify":
-                                    expression = args.get("expression", "")
-                                    expected = float(args.get("expected", 0))
-                                    await session.call_tool("verify", arguments={
-                                        "expression": expression,
-                                        "expected": expected
-                                    })
-                                    
-                                    prompt += f"\nUser: Verification completed. Next step?"
-                                    calculation_results.append({"role": "user", "content": "Verification completed. Next step?"})
-                                    
-                                elif func_name == "fallback_reasoning":
-                                    step_description = args.get("step_description", "")
-                                    await session.call_tool("fallback_reasoning", arguments={
-                                        "step_description": step_description
-                                    })
-                                    prompt += "\nUser: Fallback processed. Please proceed with an alternative approach."
-                                    calculation_results.append({"role": "user", "content": "Fallback processed. Please proceed with an alternative approach."})
-                            
-                        except Exception as e:
-                            error_msg = str(e)
-                            prompt += f"\nUser: Error occurred: {error_msg}. Please try an alternative approach."
-                            calculation_results.append({"role": "user", "content": f"Error: {error_msg}"})
+                            messages = await asyncio.wait_for(asyncio.gather(*(
+                                run_function_call(session, call, conversation_history) for call in calls
+                            )), tracker.remaining_time())
+                        except asyncio.TimeoutError:
+                            stop_reason = "deadline"
+                            break
+                        tracker.record_results(conversation_history[seen:])
+                        if len(messages) == 1:
+                            message = messages[0]
+                        else:
+                            message = "\n".join(
+                                f"{i}. {call[1]['name'] if call[1] else 'invalid call'}: {text}"
+                                for i, (call, text) in enumerate(zip(calls, messages), 1)
+                            )
+                        prompt += f"\nUser: {message}"
+                        calculation_results.append({"role": "user", "content": message})
 
                     elif result.startswith("FINAL_ANSWER:"):
                         try:
                             final_answer = result.split("[")[1].split("]")[0]
                         except:
                             final_answer = "Could not extract final answer"
+                        stop_reason = "final_answer"
                         break
+
+                    else:
+                        final_answer = tracker.verified_final_answer(result)
+                        if final_answer:
+                            stop_reason = "verified_answer"
+                            break
+                        tracker.record_results([])
                     
                     prompt += f"\nAssistant: {result}"
+
+                evaluation = await fetch_evaluation_stats(session)
+
+        if PROBLEM_INDEX is not None and stop_reason in CACHEABLE_STOP_REASONS:
+            index_solved_problem(problem, conversation_history, final_answer)
                 
         # Clean up temporary env file
         if os.path.exists(temp_env_path):
@@ -149,7 +345,11 @@ async def process_math_problem(gemini_api_key, problem):
         return {
             "success": True,
             "conversation": calculation_results,
-            "final_answer": final_answer
+            "final_answer": final_answer,
+            "iterations": iterations,
+            "stop_reason": stop_reason,
+            "budget": tracker.usage(),
+            "timings": {"evaluation": evaluation}
         }
             
     except Exception as e:
@@ -167,7 +367,7 @@ async def generate_with_timeout(client, prompt, timeout=10):
             loop.run_in_executor(
                 None, 
                 lambda: client.models.generate_content(
-                    model="gemini-2.0-flash",
+                    model=LLM_MODEL,
                     contents=prompt
                 )
             ),
@@ -178,42 +378,77 @@ async def generate_with_timeout(client, prompt, timeout=10):
         console.print(f"Error: {e}")
         return None
 
-def validate_json(function_call: str):
-    """
-    Validates the JSON structure in a function call string.
-    """
-    try:
-        # Extract JSON part after FUNCTION_CALL:
-        if not function_call.startswith("FUNCTION_CALL: "):
-            return False, None, "Invalid format: Must start with 'FUNCTION_CALL: '"
-            
-        json_str = function_call.replace("FUNCTION_CALL: ", "", 1)
+def _check_call(parsed_json) -> Tuple[bool, str]:
+    """Validate the structure of one parsed function call."""
+    if not isinstance(parsed_json, dict):
+        return False, "Invalid JSON: Must be an object"
         
-        # Parse JSON
-        parsed_json = json.loads(json_str)
+    if "name" not in parsed_json:
+        return False, "Missing required field: 'name'"
         
-        # Validate required fields
-        if not isinstance(parsed_json, dict):
-            return False, None, "Invalid JSON: Must be an object"
-            
-        if "name" not in parsed_json:
-            return False, None, "Missing required field: 'name'"
-            
-        if not isinstance(parsed_json["name"], str):
-            return False, None, "Invalid field: 'name' must be a string"
-            
-        if "args" not in parsed_json:
-            return False, None, "Missing required field: 'args'"
-            
-        if not isinstance(parsed_json["args"], dict):
-            return False, None, "Invalid field: 'args' must be an object"
-            
-        return True, parsed_json, "Validation successful"
+    if not isinstance(parsed_json["name"], str):
+        return False, "Invalid field: 'name' must be a string"
+        
+    if "args" not in parsed_json:
+        return False, "Missing required field: 'args'"
         
-    except json.JSONDecodeError as e:
-        return False, None, f"Invalid JSON format: {str(e)}"
+    if not isinstance(parsed_json["args"], dict):
+        return False, "Invalid field: 'args' must be an object"
+        
+    return True, "Validation successful"
+
+def parse_function_calls(response_text: str) -> List[Tuple[bool, Optional[dict], str]]:
+    """
+    Extracts every function call from a model turn.
+    
+    A turn may hold several FUNCTION_CALL lines, and each one may carry a single
+    call object or a JSON array of them (which may span lines). Returns one
+    (is_valid, parsed_call, message) tuple per call, in order.
+    """
+    calls = []
+    decoder = json.JSONDecoder()
+    position = response_text.find("FUNCTION_CALL:")
+    while position != -1:
+        start = position + len("FUNCTION_CALL:")
+        while start < len(response_text) and response_text[start].isspace():
+            start += 1
+        try:
+            parsed_json, end = decoder.raw_decode(response_text, start)
+        except json.JSONDecodeError as e:
+            calls.append((False, None, f"Invalid JSON format: {str(e)}"))
+            end = start
+        else:
+            for call in parsed_json if isinstance(parsed_json, list) else [parsed_json]:
+                is_valid, message = _check_call(call)
+                calls.append((is_valid, call if is_valid else None, message))
+        position = response_text.find("FUNCTION_CALL:", end)
+    return calls
+
+async def run_function_call(session, parsed_call, conversation_history) -> str:
+    """Execute one parsed function call and return the follow-up message for the model."""
+    is_valid, call, validation_message = parsed_call
+    if not is_valid:
+        return f"Error occurred: {validation_message}. Please try an alternative approach."
+    try:
+        arguments = validate_arguments(call["name"], call["args"])
+        handler = TOOL_HANDLERS.get(call["name"], handle_tool)
+        return await handler(session, call["name"], arguments, conversation_history)
     except Exception as e:
-        return False, None, f"Validation error: {str(e)}"
+        return f"Error occurred: {str(e)}. Please try an alternative approach."
+
+def encoded_response(payload, status=200):
+    """Send a payload as JSON or MessagePack, gzip/br compressed when the client accepts it."""
+    media_type = response_encoding.negotiate_media_type(request.headers.get('Accept'))
+    encoding = response_encoding.negotiate_encoding(request.headers.get('Accept-Encoding'))
+    body, stats = response_encoding.encode(payload, media_type, encoding)
+    response = Response(body, status=status, mimetype=media_type)
+    if stats['encoding']:
+        response.headers['Content-Encoding'] = stats['encoding']
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    response.headers['Server-Timing'] = (
+        f"serialize;dur={stats['serialize_ms']:.2f}, compress;dur={stats['compress_ms']:.2f}"
+    )
+    return response
 
 @app.route('/api/solve', methods=['POST'])
 def solve_problem():
@@ -235,14 +470,83 @@ def solve_problem():
                 'success': False,
                 'error': 'Problem is required'
             }), 400
+
+        # ?detail=summary (or "detail" in the body) leaves the intermediate turns out
+        detail = request.args.get('detail') or data.get('detail') or 'full'
+        if detail not in response_encoding.DETAIL_LEVELS:
+            return jsonify({
+                'success': False,
+                'error': f"detail must be one of {', '.join(response_encoding.DETAIL_LEVELS)}"
+            }), 400
+
+        # Optional per-request limits, e.g. {"deadline_s": 20, "max_llm_calls": 8}
+        try:
+            budget = AGENT_BUDGET.tightened(data.get('budget'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid budget: {e}'
+            }), 400
         
-        # Process the problem asynchronously
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(process_math_problem(gemini_api_key, problem))
-        loop.close()
+        # Profiled requests always run, so there is something to profile
+        profile = request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+        cache_key = result_cache.normalize_problem(problem)
+        # A cached answer costs no model calls, so it does not wait for a slot
+        if not profile and 'no-cache' not in request.headers.get('Cache-Control', ''):
+            cached = RESULT_CACHE.get("solve", cache_key, SOLVE_VERSION)
+            if cached is not None:
+                return encoded_response(response_encoding.apply_detail({**cached, 'cache': 'hit'}, detail))
+            # The same problem with other numbers or wording: replay its calculations
+            match = PROBLEM_INDEX.match(problem) if PROBLEM_INDEX is not None else None
+            if match is not None:
+                return encoded_response(response_encoding.apply_detail(template_result(match), detail))
+
+        # Batch clients mark their requests with X-Priority: batch (or "priority": "batch")
+        lane = request.headers.get('X-Priority') or data.get('priority') or scheduler.INTERACTIVE
+        if lane not in scheduler.LANES:
+            return jsonify({
+                'success': False,
+                'error': f"priority must be one of {', '.join(scheduler.LANES)}"
+            }), 400
+
+        try:
+            ticket = SCHEDULER.acquire(scheduler.key_for(gemini_api_key), lane)
+        except scheduler.SchedulerRejected as e:
+            response = jsonify({
+                'success': False,
+                'error': str(e)
+            })
+            response.status_code = e.status
+            if e.retry_after:
+                response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+            return response
+
+        try:
+            # Process the problem asynchronously
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            if profile:
+                if not PROFILE_LIMITER.allow():
+                    result = loop.run_until_complete(process_math_problem(gemini_api_key, problem, budget=budget))
+                    result['profile'] = 'rate_limited'
+                else:
+                    trace_id = profiling.new_trace_id()
+                    with profiling.StackSampler() as sampler:
+                        result = loop.run_until_complete(process_math_problem(gemini_api_key, problem, trace_id, budget))
+                    profiling.write_profile(trace_id, "server", sampler)
+                    result['trace_id'] = trace_id
+            else:
+                result = loop.run_until_complete(process_math_problem(gemini_api_key, problem, budget=budget))
+            loop.close()
+        finally:
+            SCHEDULER.release(ticket)
+        result.setdefault('timings', {})['queue_ms'] = round(ticket.waited * 1000, 3)
+        if result.get('success') and result.get('stop_reason') in CACHEABLE_STOP_REASONS:
+            RESULT_CACHE.set("solve", cache_key, {
+                key: value for key, value in result.items() if key not in ('timings', 'profile', 'trace_id')
+            }, SOLVE_VERSION, SOLVE_CACHE_TTL)
         
-        return jsonify(result)
+        return encoded_response(response_encoding.apply_detail(result, detail))
         
     except Exception as e:
         return jsonify({
@@ -250,6 +554,37 @@ def solve_problem():
             'error': str(e)
         }), 500
 
+@app.route('/api/profiles', methods=['GET'])
+def get_profiles():
+    """Recent request profiles as collapsed stacks (flamegraph.pl / speedscope input)."""
+    # A limit that is not a number falls back to the default
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_PROFILES_LISTED)
+    return jsonify({
+        'success': True,
+        'profiles': profiling.list_profiles(limit=limit)
+    })
+
+@app.route('/api/profiles/<path:name>', methods=['GET'])
+def download_profile(name):
+    return send_from_directory(os.path.abspath(profiling.PROFILE_DIR), name, mimetype='text/plain')
+
+@app.route('/api/scheduler', methods=['GET'])
+def get_scheduler_metrics():
+    """Queue state per lane and per API key hash."""
+    return jsonify({
+        'success': True,
+        **SCHEDULER.metrics()
+    })
+
+@app.route('/api/cache', methods=['GET'])
+def get_cache_stats():
+    """Hit rates and tier sizes of the solve result cache, and the problem index's counters."""
+    return jsonify({
+        'success': True,
+        **RESULT_CACHE.get_stats(),
+        'problem_index': PROBLEM_INDEX.get_stats() if PROBLEM_INDEX is not None else None
+    })
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
@@ -0,0 +1,318 @@
+# loadgen.py
+#
+# Open-loop load generator for /api/solve:
+#   python loadgen.py --start-server --rates 10,50,200 --duration 30 --json run.json
+#   python loadgen.py --url http://localhost:5000/api/solve --server-pid 1234 --rates 10
+#
+# --start-server runs flask_server.py with the scripted local LLM (LLM_BACKEND=scripted),
+# so no network or API key is needed. Requests are sent on schedule whether or not
+# earlier ones have finished, so a slow server shows up as latency, not as a lower rate.
+
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import httpx
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+# Seed problems kept with the code, so runs on different machines and builds send the same load
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadgen_corpus.json")
+
+def load_corpus(path: str, limit: int = 1000) -> List[str]:
+    """Distinct expressions the parser supports, from a JSON list or a memory file's calculation history.
+
+    A memory keeps its history next to the file, so the file itself need not exist yet.
+    """
+    from memory import Memory
+    from expression_parser import parse_cached
+    data = None
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    if isinstance(data, list):
+        candidates = iter(data)
+    else:
+        candidates = (record.get("expression") for record in Memory(path).iter_calculation_history(reverse=True))
+    expressions = []
+    seen = set()
+    for expression in candidates:
+        if isinstance(expression, str) and expression not in seen and parse_cached(expression) is not None:
+            seen.add(expression)
+            expressions.append(expression)
+            if len(expressions) >= limit:
+                break
+    return expressions
+
+def process_tree_stats(pid: Optional[int]) -> Optional[Dict[str, float]]:
+    """Total RSS and process count of a process and all its descendants (Linux /proc)."""
+    if pid is None or not os.path.isdir("/proc"):
+        return None
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                fields = f.read().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError):
+            continue
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    rss_kb = 0
+    for member in tree:
+        try:
+            with open(f"/proc/{member}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return {"rss_mb": rss_kb / 1024, "processes": len(tree)}
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+def summarize(records: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Counts, rates and latency percentiles (ms) for a set of request records.
+
+    Answers served from the result cache or problem index count as "cached" and
+    are left out of the latency percentiles, which describe real solves.
+    """
+    latencies = sorted(record["latency"] * 1000 for record in records if record["outcome"] == "ok")
+    total = len(records)
+    counts = {outcome: sum(record["outcome"] == outcome for record in records)
+              for outcome in ("ok", "cached", "error", "timeout", "rate_limited", "dropped")}
+    return {
+        "requests": total,
+        **counts,
+        "throughput_rps": (counts["ok"] + counts["cached"]) / elapsed if elapsed else 0.0,
+        "error_rate": counts["error"] / total if total else 0.0,
+        "timeout_rate": counts["timeout"] / total if total else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None
+        }
+    }
+
+async def _send(client: httpx.AsyncClient, url: str, api_key: str, problem: str, lane: str = "interactive",
+                use_cache: bool = False) -> str:
+    headers = {"X-Priority": lane}
+    if not use_cache:
+        # Otherwise a corpus that repeats problems measures cache hits instead of solves
+        headers["Cache-Control"] = "no-cache"
+    try:
+        response = await client.post(url, json={"api_key": api_key, "problem": problem}, headers=headers)
+    except httpx.TimeoutException:
+        return "timeout"
+    except httpx.HTTPError:
+        return "error"
+    if response.status_code == 429:
+        return "rate_limited"
+    if response.status_code != 200:
+        return "error"
+    try:
+        body = response.json()
+    except ValueError:
+        return "error"
+    if not body.get("success"):
+        return "error"
+    return "cached" if body.get("cache") == "hit" or body.get("stop_reason") == "template_match" else "ok"
+
+async def run_stage(url: str, rate: float, duration: float, corpus: List[str], timeout: float = 30.0,
+                    max_inflight: int = 1000, interval: float = 5.0, api_key: str = "loadgen",
+                    server_pid: Optional[int] = None, lane: str = "interactive",
+                    use_cache: bool = False) -> Dict[str, Any]:
+    """Send `rate` requests per second for `duration` seconds and report on them.
+
+    Requests beyond `max_inflight` outstanding ones are counted as dropped rather
+    than delayed, keeping the offered load fixed. Unless `use_cache` is set, every
+    request asks the server to skip its result cache.
+    """
+    records, server_samples = [], []
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def request(offset: float, problem: str):
+        sent = time.perf_counter()
+        outcome = await _send(client, url, api_key, problem, lane, use_cache)
+        records.append({"offset": offset, "latency": time.perf_counter() - sent, "outcome": outcome})
+
+    async def sample_server():
+        while True:
+            stats = process_tree_stats(server_pid)
+            if stats is not None:
+                server_samples.append({"offset": loop.time() - start, **stats})
+            await asyncio.sleep(interval)
+
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        sampler = asyncio.create_task(sample_server())
+        inflight = set()
+        for i in range(int(rate * duration)):
+            offset = i / rate
+            await asyncio.sleep(max(0.0, start + offset - loop.time()))
+            if len(inflight) >= max_inflight:
+                records.append({"offset": offset, "latency": 0.0, "outcome": "dropped"})
+                continue
+            task = asyncio.create_task(request(offset, corpus[i % len(corpus)]))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+        if inflight:
+            await asyncio.wait(inflight)
+        sampler.cancel()
+    elapsed = loop.time() - start
+
+    timeline = []
+    buckets = max(1, int(-(-duration // interval)))
+    for bucket in range(buckets):
+        low, high = bucket * interval, (bucket + 1) * interval
+        in_bucket = [record for record in records if low <= record["offset"] < high]
+        stats = [sample for sample in server_samples if low <= sample["offset"] < high]
+        timeline.append({
+            "start_s": low,
+            **summarize(in_bucket, min(interval, duration - low)),
+            "server": stats[-1] if stats else None
+        })
+
+    return {
+        "rate": rate,
+        "duration_s": duration,
+        "summary": summarize(records, elapsed),
+        "server": server_samples[-1] if server_samples else None,
+        "timeline": timeline
+    }
+
+def _rounded(value: Any) -> Any:
+    """Round floats for stable, diffable JSON output."""
+    if isinstance(value, float):
+        return round(value, 4)
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rounded(item) for item in value]
+    return value
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+def print_stage(stage: Dict[str, Any]):
+    summary = stage["summary"]
+    console.print(
+        f"\n[bold cyan]{stage['rate']:g} RPS for {stage['duration_s']:g}s[/bold cyan]: "
+        f"{summary['ok']}/{summary['requests']} ok, {summary['cached']} cached, "
+        f"{summary['throughput_rps']:.1f} RPS achieved, "
+        f"errors {summary['error_rate']:.1%}, timeouts {summary['timeout_rate']:.1%}, "
+        f"rate limited {summary['rate_limited']}, dropped {summary['dropped']}"
+    )
+    table = Table(caption="latencies in ms; server RSS in MB", header_style="bold cyan")
+    for column in ("From s", "Sent", "OK/s", "Err", "T/O", "p50", "p90", "p99", "RSS", "Procs"):
+        table.add_column(column, justify="right")
+    for bucket in stage["timeline"] + [{"start_s": "all", **summary, "server": stage["server"]}]:
+        server = bucket["server"] or {}
+        table.add_row(
+            str(bucket["start_s"]), str(bucket["requests"]), f"{bucket['throughput_rps']:.1f}",
+            f"{bucket['error_rate']:.1%}", f"{bucket['timeout_rate']:.1%}",
+            _ms(bucket["latency_ms"]["p50"]), _ms(bucket["latency_ms"]["p90"]), _ms(bucket["latency_ms"]["p99"]),
+            _ms(server.get("rss_mb")), str(server.get("processes", "-"))
+        )
+    console.print(table)
+
+def start_scripted_server(port: int, latency: float) -> subprocess.Popen:
+    """Run flask_server.py with the scripted LLM and wait until it answers health checks."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    # Rate limiting is off unless asked for: the generator sends everything under one API key
+    env = {**os.environ, "LLM_BACKEND": "scripted", "SCRIPTED_LLM_LATENCY": str(latency), "PORT": str(port),
+           "SCHEDULER_RATE": os.environ.get("SCHEDULER_RATE", "0")}
+    server = subprocess.Popen([sys.executable, os.path.join(directory, "flask_server.py")], cwd=directory,
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None:
+            break
+        time.sleep(0.5)
+    stop_server(server)
+    raise RuntimeError("flask_server.py did not come up")
+
+def stop_server(server: subprocess.Popen):
+    # The server runs in its own session, so this also stops the tool servers it spawned
+    try:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(server.pid, signal.SIGKILL)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Open-loop load generator for /api/solve.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/api/solve")
+    parser.add_argument("--rates", default="10,50,200", help="comma-separated target RPS, one stage each")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per stage")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds per timeline bucket")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="outstanding requests before dropping")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS,
+                        help="JSON list of problems, or a memory file whose history supplies them")
+    parser.add_argument("--server-pid", type=int, help="process to report RSS and process counts for")
+    parser.add_argument("--start-server", action="store_true", help="run flask_server.py with the scripted LLM")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="scripted LLM seconds per call")
+    parser.add_argument("--api-key", default="loadgen", help="API key sent with every request")
+    parser.add_argument("--lane", choices=("interactive", "batch"), default="interactive",
+                        help="scheduler lane, sent as the X-Priority header")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="let the server answer from its result cache; hits are reported as cached")
+    parser.add_argument("--json", metavar="PATH", help="write the report as JSON for diffing across builds")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error(f"{args.corpus} has no problems the parser supports")
+    server = None
+    if args.start_server:
+        port = int(args.url.split(":")[2].split("/")[0]) if args.url.count(":") > 1 else 5000
+        server = start_scripted_server(port, args.llm_latency)
+    server_pid = server.pid if server else args.server_pid
+
+    try:
+        stages = []
+        for rate in (float(rate) for rate in args.rates.split(",")):
+            stage = asyncio.run(run_stage(args.url, rate, args.duration, corpus, args.timeout,
+                                          args.max_inflight, args.interval, args.api_key, server_pid,
+                                          args.lane, args.use_cache))
+            print_stage(stage)
+            stages.append(stage)
+    finally:
+        if server:
+            stop_server(server)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(_rounded({"url": args.url, "corpus_size": len(corpus), "stages": stages}),
+                      f, indent=2, sort_keys=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
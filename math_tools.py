@@ -1,42 +1,100 @@
 # math_tools.py
 
 from mcp.server.fastmcp import FastMCP
-from mcp.types import TextContent
+import multiprocessing
+import os
+import signal
+import sys
 from perceive import Perceive
+from memory import Memory
+from action import Action
+from result_cache import ResultCache
+from tool_registry import register_mcp_tools
+from verification import VerificationExecutor
+import number_theory
 
-# Instantiate MCP server and Perceive class
-mcp = FastMCP("Calculator")
+# Big factorial and fibonacci results must survive str() and JSON on their way out
+number_theory.allow_result_digits()
+
+# Instantiate the components behind the tools, then the MCP server. Perceive comes
+# first so its perceive.log logging setup is in place before FastMCP configures logging
 perceive = Perceive()
+mcp = FastMCP("Calculator")
+# Shared SSE servers (`python math_tools.py sse`, or MEMORY_SHARED=1) keep the memory in
+# shared mode from the start, so its first load is already synced and locked
+SHARED_MEMORY = (__name__ == "__main__" and sys.argv[1:2] == ["sse"]) or os.environ.get("MEMORY_SHARED") == "1"
+# With RESULT_CACHE_PATH set, expression results are shared with other tool servers on the host.
+# With VERIFY_PROCESSES set, expressions are evaluated in that many worker processes, and one
+# running longer than VERIFY_STEP_TIMEOUT_S seconds (default 2) fails instead of blocking the server.
+action = Action(Memory(shared=SHARED_MEMORY), perceive, sink=None,
+                result_cache=ResultCache.from_env() if os.environ.get("RESULT_CACHE_PATH") else None,
+                executor=VerificationExecutor(int(os.environ["VERIFY_PROCESSES"]),
+                                              float(os.environ.get("VERIFY_STEP_TIMEOUT_S", "2")))
+                if os.environ.get("VERIFY_PROCESSES") else None)
+
+# Every tool is defined once in tool_registry.TOOLS
+register_mcp_tools(mcp, action)
+
+def warm_result_cache():
+    """Load the newest results of the calculation history into the result cache, when there is one.
+    
+    Only the first server on the host scans the history; later ones find the cache's marker and skip it.
+    """
+    if action.result_cache is None:
+        return
+    warmed = action.result_cache.warm_from_history(
+        action.memory, limit=int(os.environ.get("RESULT_CACHE_WARM_ENTRIES", "10000")))
+    if warmed:
+        print(f"Warmed the result cache with {warmed} results from history", file=sys.stderr)
+
+def _run_sse(host: str, port: int):
+    mcp.settings.host = host
+    mcp.settings.port = port
+    mcp.run(transport="sse")
 
-@mcp.tool()
-def show_reasoning(expression: str) -> TextContent:
-    """Show step-by-step reasoning for a calculation."""
-    reasoning = perceive.show_reasoning(expression)
-    return TextContent(type="text", text=reasoning)
-
-@mcp.tool()
-def calculate(expression: str) -> TextContent:
-    """Calculate the result of an expression."""
-    result = perceive.parse_expression(expression)
-    if result is None:
-        return TextContent(type="text", text="Invalid expression or error in calculation.")
-    return TextContent(type="text", text=str(result))
-
-@mcp.tool()
-def verify(expression: str, expected: float) -> TextContent:
-    """Check if a calculation is correct."""
-    is_correct = perceive.verify_calculation(expression, expected)
-    return TextContent(type="text", text="Correct" if is_correct else "Incorrect")
-
-@mcp.tool()
-def check_consistency(expression: str, result: float) -> TextContent:
-    """Check if a calculation is consistent with mathematical rules."""
-    is_consistent = perceive.check_consistency(expression, result)
-    return TextContent(type="text", text="Consistent" if is_consistent else "Inconsistent")
+def serve_shared(host: str = "127.0.0.1", port: int = 8765, workers: int = 1):
+    """Serve the tools over SSE so many clients share long-lived server processes.
+    
+    Each worker process listens on its own port (port, port + 1, ...) because an
+    SSE session has to stay on the process that opened it. Workers keep one
+    memory file in shared mode, so they see each other's history and results.
+    """
+    if not action.memory.shared:
+        # Started from another entry point: reload under the lock in shared mode
+        action.memory.shared = True
+        action.memory.load_memory()
+    # Warm the shared cache once, before the workers start
+    warm_result_cache()
+    for i in range(workers):
+        print(f"Serving math tools on http://{host}:{port + i}/sse", file=sys.stderr)
+    if workers == 1:
+        _run_sse(host, port)
+        return
+    processes = [multiprocessing.Process(target=_run_sse, args=(host, port + i)) for i in range(workers)]
+    for process in processes:
+        process.start()
+    # Stopping the parent, by Ctrl+C or SIGTERM, stops the workers too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
 
 if __name__ == "__main__":
-    import sys
     if len(sys.argv) > 1 and sys.argv[1] == "dev":
         mcp.run()
+    elif len(sys.argv) > 1 and sys.argv[1] == "sse":
+        import argparse
+        parser = argparse.ArgumentParser(description="Serve the math tools to many clients over SSE.")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--workers", type=int, default=1, help="server processes, one port each")
+        args = parser.parse_args(sys.argv[2:])
+        serve_shared(args.host, args.port, args.workers)
     else:
-        mcp.run(transport="stdio")
\ No newline at end of file
+        warm_result_cache()
+        mcp.run(transport="stdio")
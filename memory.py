@@ -1,73 +1,498 @@
 from mcp.types import TextContent
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
+from collections import OrderedDict
+import atexit
 import json
+import logging
 import os
+import re
+import sys
+import tempfile
 import time
+import weakref
+from result_cache import normalize_expression
+from verification import EVALUATOR_VERSION
+
+# Not stdout: math_tools builds a Memory on import, and over stdio stdout carries the MCP protocol
+logger = logging.getLogger('Memory')
+logger.addHandler(logging.StreamHandler(sys.stderr))
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Expressions made only of numbers, arithmetic operators and math.* calls are
+# deterministic, so their results are safe to serve from the result index.
+CACHEABLE_EXPRESSION = re.compile(r'(?:[\d\s.+\-*/%()^,]|math\.[a-z_]\w*)+')
+
+# Bytes read per step when scanning the history file backwards for its tail
+HISTORY_BLOCK_SIZE = 64 * 1024
+
+# Counted lookups, or seconds since the last write, after which cache statistics are written out
+STATS_FLUSH_EVERY = 256
+STATS_FLUSH_INTERVAL = 30.0
+
+# Memories whose pending statistics are written out when the interpreter exits
+_open_memories = weakref.WeakSet()
+
+@atexit.register
+def _close_open_memories():
+    for memory in list(_open_memories):
+        memory.close()
+
+class FileLock:
+    """Advisory inter-process lock held on a sidecar lock file."""
+    
+    def __init__(self, path: str, shared: bool = False):
+        self.path = path
+        self.shared = shared
+        self._file = None
+    
+    def __enter__(self):
+        self._file = open(self.path, 'a+')
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        else:
+            # msvcrt has no shared locks, so readers lock exclusively too
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
 
 class Memory:
-    """Component responsible for storing and retrieving information."""
+    """Component responsible for storing and retrieving information.
     
-    def __init__(self, storage_path: str = "agent_memory.json"):
+    Error patterns, preferences and cache statistics live in a small JSON snapshot at
+    ``storage_path``. Calculation history is an append-only JSON Lines file next to it;
+    only its recent tail is held in memory and older records are streamed on demand.
+    In shared mode, lookup counts are appended to a small statistics journal instead
+    of rewriting the snapshot, and merged into the snapshot whenever it is saved.
+    """
+    
+    def __init__(self, storage_path: str = "agent_memory.json", max_cached_results: int = 1024,
+                 shared: bool = False, history_tail: int = 1000):
         self.storage_path = storage_path
+        self.history_path = os.path.splitext(storage_path)[0] + "_history.jsonl"
+        self.stats_journal_path = os.path.splitext(storage_path)[0] + "_stats.jsonl"
+        self.shared = shared
+        self.lock_path = storage_path + ".lock"
+        self._file_signature = None
+        # Byte offset in the history file up to which records have been read
+        self._history_offset = 0
+        self.history_tail = max(history_tail, max_cached_results)
         self.calculation_history = []
         self.error_patterns = {}
         self.user_preferences = {}
         self.paint_state = None
+        self.max_cached_results = max_cached_results
+        self.result_index = OrderedDict()
+        self.cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        # Statistics as of the snapshot file, without the journal or this process's counts
+        self._stored_stats = dict.fromkeys(self.cache_stats, 0)
+        # Counter increments not yet written, so a reload cannot drop them
+        self._unsaved_stats = dict.fromkeys(self.cache_stats, 0)
+        self._stats_saved_at = time.monotonic()
         self.load_memory()
+        _open_memories.add(self)
+    
+    def _get_file_signature(self) -> Optional[tuple]:
+        """Cheap fingerprint of the snapshot file used to detect writes by other processes."""
+        try:
+            stat = os.stat(self.storage_path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    
+    def _get_history_size(self) -> int:
+        """Current size in bytes of the history file."""
+        try:
+            return os.path.getsize(self.history_path)
+        except OSError:
+            return 0
     
     def load_memory(self):
-        """Load memory from storage if it exists."""
-        if os.path.exists(self.storage_path):
-            try:
-                with open(self.storage_path, 'r') as f:
-                    data = json.load(f)
-                    self.calculation_history = data.get('calculation_history', [])
-                    self.error_patterns = data.get('error_patterns', {})
-                    self.user_preferences = data.get('user_preferences', {})
-            except Exception as e:
-                print(f"Error loading memory: {e}")
+        """Load the snapshot and the recent tail of the calculation history."""
+        if self.shared:
+            with FileLock(self.lock_path):
+                self._load_from_disk()
+        else:
+            self._load_from_disk()
+    
+    def _load_from_disk(self):
+        """Read storage into this instance without locking."""
+        legacy_history = self._load_snapshot()
+        if legacy_history:
+            self._migrate_legacy_history(legacy_history)
+        self._history_offset = self._get_history_size()
+        self.calculation_history = self._read_history_tail(self.history_tail, self._history_offset)
+        self.rebuild_result_index()
+    
+    def _load_snapshot(self) -> Optional[List[Dict[str, Any]]]:
+        """Read the JSON snapshot, returning any history still stored in the old inline format."""
+        self._file_signature = self._get_file_signature()
+        if not os.path.exists(self.storage_path):
+            self._recount_stats()
+            return None
+        try:
+            with open(self.storage_path, 'r') as f:
+                data = json.load(f)
+                self.error_patterns = data.get('error_patterns', {})
+                self.user_preferences = data.get('user_preferences', {})
+                stored_stats = data.get('cache_stats', {})
+                self._stored_stats = {key: stored_stats.get(key, 0) for key in self.cache_stats}
+                self._recount_stats()
+                return data.get('calculation_history')
+        except Exception as e:
+            logger.error(f"Error loading memory: {e}")
+            return None
+    
+    def _read_stats_journal(self) -> Dict[str, int]:
+        """Totals of the counts appended to the statistics journal since the snapshot was saved."""
+        totals = dict.fromkeys(self.cache_stats, 0)
+        try:
+            with open(self.stats_journal_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return totals
+        # A partial last line is still being written; it is counted next time
+        for line in data[:data.rfind(b'\n') + 1].split(b'\n'):
+            if line.strip():
+                for key, count in json.loads(line).items():
+                    if key in totals:
+                        totals[key] += count
+        return totals
+    
+    def _recount_stats(self):
+        """Statistics from the snapshot, plus the journal in shared mode, plus unsaved counts."""
+        journal = self._read_stats_journal() if self.shared else {}
+        self.cache_stats = {
+            key: self._stored_stats[key] + journal.get(key, 0) + self._unsaved_stats[key]
+            for key in self.cache_stats
+        }
+    
+    def _migrate_legacy_history(self, legacy_history: List[Dict[str, Any]]):
+        """Move history stored inline in the snapshot into the history file."""
+        directory = os.path.dirname(os.path.abspath(self.history_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                for record in legacy_history:
+                    f.write(json.dumps(record) + "\n")
+                if os.path.exists(self.history_path):
+                    with open(self.history_path, 'r') as existing:
+                        for line in existing:
+                            f.write(line)
+            os.replace(temp_path, self.history_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.save_memory()
+    
+    def _read_history_tail(self, count: int, end: int) -> List[Dict[str, Any]]:
+        """Read the last `count` history records before byte offset `end`."""
+        records = []
+        for record in self._iter_history_reversed(end):
+            if len(records) >= count:
+                break
+            records.append(record)
+        records.reverse()
+        return records
+    
+    def _iter_history_reversed(self, end: int) -> Iterator[Dict[str, Any]]:
+        """Yield history records newest first by reading the file backwards in blocks."""
+        if end <= 0 or not os.path.exists(self.history_path):
+            return
+        with open(self.history_path, 'rb') as f:
+            position = end
+            remainder = b''
+            while position > 0:
+                size = min(HISTORY_BLOCK_SIZE, position)
+                position -= size
+                f.seek(position)
+                lines = (f.read(size) + remainder).split(b'\n')
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line.strip():
+                        yield json.loads(line)
+            if remainder.strip():
+                yield json.loads(remainder)
+    
+    def iter_calculation_history(self, reverse: bool = False) -> Iterator[Dict[str, Any]]:
+        """Stream the full calculation history from disk, oldest first unless `reverse` is set.
+        
+        Records are read lazily, so the whole history is never held in memory at once.
+        """
+        self.refresh()
+        end = self._history_offset
+        if reverse:
+            yield from self._iter_history_reversed(end)
+            return
+        if end <= 0 or not os.path.exists(self.history_path):
+            return
+        with open(self.history_path, 'rb') as f:
+            consumed = 0
+            for line in f:
+                consumed += len(line)
+                if consumed > end:
+                    break
+                if line.strip():
+                    yield json.loads(line)
+    
+    def _sync_history(self):
+        """Pick up history records appended by other processes since the last read."""
+        size = self._get_history_size()
+        if size < self._history_offset:
+            # The history file was replaced or truncated, start over from its tail
+            self._history_offset = size
+            self.calculation_history = self._read_history_tail(self.history_tail, size)
+            self.rebuild_result_index()
+            return
+        if size == self._history_offset:
+            return
+        with open(self.history_path, 'rb') as f:
+            f.seek(self._history_offset)
+            data = f.read(size - self._history_offset)
+        # Only consume complete lines; a partial write is picked up next time
+        complete = data.rfind(b'\n') + 1
+        for line in data[:complete].split(b'\n'):
+            if line.strip():
+                record = json.loads(line)
+                self._remember_calculation(record)
+        self._history_offset += complete
+    
+    def _sync_from_disk(self):
+        """Apply changes other processes made to the snapshot or history, without locking."""
+        if self._get_file_signature() != self._file_signature:
+            self._load_snapshot()
+        self._sync_history()
+    
+    def refresh(self) -> bool:
+        """Catch up with writes made by other processes since we last looked.
+        
+        Only does work in shared mode; returns True when anything was reloaded.
+        """
+        if not self.shared:
+            return False
+        if (self._get_file_signature() == self._file_signature
+                and self._get_history_size() == self._history_offset):
+            return False
+        with FileLock(self.lock_path, shared=True):
+            self._sync_from_disk()
+        return True
     
     def save_memory(self):
-        """Save memory to storage."""
+        """Save the snapshot (error patterns, preferences and cache statistics) to storage.
+        
+        In shared mode this runs under the exclusive lock and folds the statistics
+        journal into the snapshot.
+        """
         try:
+            if self.shared:
+                self._recount_stats()
             data = {
-                'calculation_history': self.calculation_history,
                 'error_patterns': self.error_patterns,
-                'user_preferences': self.user_preferences
+                'user_preferences': self.user_preferences,
+                'cache_stats': self.cache_stats
             }
-            with open(self.storage_path, 'w') as f:
-                json.dump(data, f)
+            # Write to a temporary file and swap it in, so readers never see a partial file
+            directory = os.path.dirname(os.path.abspath(self.storage_path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f)
+                os.replace(temp_path, self.storage_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self._file_signature = self._get_file_signature()
+            if self.shared and os.path.exists(self.stats_journal_path):
+                # Its counts are in the snapshot now
+                open(self.stats_journal_path, 'w').close()
+            self._stored_stats = dict(self.cache_stats)
+            self._unsaved_stats = dict.fromkeys(self.cache_stats, 0)
+            self._stats_saved_at = time.monotonic()
         except Exception as e:
-            print(f"Error saving memory: {e}")
+            logger.error(f"Error saving memory: {e}")
+    
+    def _update(self, change):
+        """Apply a change that persists itself.
+        
+        In shared mode the change is applied under an exclusive lock on top of the
+        latest on-disk state, so concurrent writers never lose each other's updates.
+        """
+        if not self.shared:
+            change()
+            return
+        with FileLock(self.lock_path):
+            self._sync_from_disk()
+            change()
+    
+    def _count(self, stat: str):
+        """Increment a cache statistic."""
+        self.cache_stats[stat] += 1
+        self._unsaved_stats[stat] += 1
+    
+    def _remember_calculation(self, record: Dict[str, Any]):
+        """Add a history record to the in-memory tail and the result index."""
+        self.calculation_history.append(record)
+        if len(self.calculation_history) > 2 * self.history_tail:
+            del self.calculation_history[:-self.history_tail]
+        self._index_record(record)
+    
+    def _index_record(self, record: Dict[str, Any]):
+        """Index a history record's result, unless an older evaluator computed it."""
+        if record.get('evaluator') == EVALUATOR_VERSION:
+            self.cache_result(record.get('expression', ''), record.get('result'))
     
     def add_calculation(self, expression: str, result: Any, steps: List[str] = None):
         """Add a calculation to history."""
-        self.calculation_history.append({
+        record = {
             'timestamp': time.time(),
             'expression': expression,
             'result': result,
-            'steps': steps or []
-        })
-        self.save_memory()
+            'steps': steps or [],
+            'evaluator': EVALUATOR_VERSION
+        }
+        def change():
+            try:
+                with open(self.history_path, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+                self._history_offset = self._get_history_size()
+            except Exception as e:
+                logger.error(f"Error saving memory: {e}")
+            self._remember_calculation(record)
+        self._update(change)
     
     def get_calculation_history(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent calculation history."""
+        self.refresh()
+        if limit > len(self.calculation_history):
+            return self._read_history_tail(limit, self._history_offset)
         return self.calculation_history[-limit:] if self.calculation_history else []
     
+    @staticmethod
+    def _result_key(expression: str) -> str:
+        """Normalize an expression into its result index key."""
+        return normalize_expression(expression)
+    
+    def rebuild_result_index(self):
+        """Rebuild the expression -> result index from the most recent history.
+        
+        Records of an older EVALUATOR_VERSION, or without one, are left out.
+        """
+        self.result_index = OrderedDict()
+        for entry in self.calculation_history[-self.max_cached_results:]:
+            self._index_record(entry)
+    
+    def cache_result(self, expression: str, result: Any):
+        """Index a deterministic expression's result, evicting the least recently used entry when full."""
+        if result is None or self.max_cached_results <= 0:
+            return
+        if not CACHEABLE_EXPRESSION.fullmatch(expression):
+            return
+        key = self._result_key(expression)
+        self.result_index[key] = result
+        self.result_index.move_to_end(key)
+        while len(self.result_index) > self.max_cached_results:
+            self.result_index.popitem(last=False)
+            self._count('evictions')
+    
+    def get_cached_result(self, expression: str) -> Optional[Any]:
+        """Look up a previously computed result, recording a hit or a miss."""
+        self.refresh()
+        key = self._result_key(expression)
+        result = self.result_index.get(key)
+        if result is not None:
+            self.result_index.move_to_end(key)
+        self._count('hits' if result is not None else 'misses')
+        pending = sum(self._unsaved_stats.values())
+        if pending >= STATS_FLUSH_EVERY or time.monotonic() - self._stats_saved_at >= STATS_FLUSH_INTERVAL:
+            self.save_stats()
+        return result
+    
+    def save_stats(self):
+        """Write out cache statistics counted since the last save.
+        
+        Lookups only count in memory; they are written every STATS_FLUSH_EVERY
+        lookups or STATS_FLUSH_INTERVAL seconds, and on close. In shared mode they
+        are appended to the statistics journal under the shared lock, so workers
+        neither wait on each other nor rewrite the snapshot.
+        """
+        if not any(self._unsaved_stats.values()):
+            return
+        if not self.shared:
+            self.save_memory()
+            return
+        line = json.dumps(self._unsaved_stats) + "\n"
+        try:
+            with FileLock(self.lock_path, shared=True):
+                # One small append per write, so lines from several processes never interleave
+                fd = os.open(self.stats_journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line.encode())
+                finally:
+                    os.close(fd)
+        except Exception as e:
+            logger.error(f"Error saving memory: {e}")
+            return
+        # The counts stay in cache_stats; they are now part of the journal instead
+        self._unsaved_stats = dict.fromkeys(self.cache_stats, 0)
+        self._stats_saved_at = time.monotonic()
+    
+    def close(self):
+        """Write out pending cache statistics; also done for every open memory at exit."""
+        self.save_stats()
+    
+    def invalidate_cached_result(self, expression: Optional[str] = None):
+        """Drop one expression from the result index, or the whole index when none is given."""
+        if expression is None:
+            self.result_index.clear()
+        else:
+            self.result_index.pop(self._result_key(expression), None)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get result index hit/miss statistics, including other processes' in shared mode."""
+        if self.shared:
+            self.refresh()
+            with FileLock(self.lock_path, shared=True):
+                self._recount_stats()
+        lookups = self.cache_stats['hits'] + self.cache_stats['misses']
+        return {
+            **self.cache_stats,
+            'size': len(self.result_index),
+            'max_size': self.max_cached_results,
+            'hit_rate': self.cache_stats['hits'] / lookups if lookups else 0.0
+        }
+    
     def add_error_pattern(self, error_type: str, error_message: str, resolution: str):
         """Add an error pattern and its resolution."""
-        if error_type not in self.error_patterns:
-            self.error_patterns[error_type] = []
-        
-        self.error_patterns[error_type].append({
-            'message': error_message,
-            'resolution': resolution,
-            'timestamp': time.time()
-        })
-        self.save_memory()
+        def change():
+            if error_type not in self.error_patterns:
+                self.error_patterns[error_type] = []
+            
+            self.error_patterns[error_type].append({
+                'message': error_message,
+                'resolution': resolution,
+                'timestamp': time.time()
+            })
+            self.save_memory()
+        self._update(change)
     
     def get_error_resolution(self, error_type: str, error_message: str) -> Optional[str]:
         """Get resolution for a specific error if available."""
+        self.refresh()
         if error_type in self.error_patterns:
             for pattern in self.error_patterns[error_type]:
                 if pattern['message'] in error_message:
@@ -76,11 +501,14 @@ class Memory:
     
     def set_user_preference(self, key: str, value: Any):
         """Set a user preference."""
-        self.user_preferences[key] = value
-        self.save_memory()
+        def change():
+            self.user_preferences[key] = value
+            self.save_memory()
+        self._update(change)
     
     def get_user_preference(self, key: str, default: Any = None) -> Any:
         """Get a user preference."""
+        self.refresh()
         return self.user_preferences.get(key, default)
     
     def set_paint_state(self, state: Dict[str, Any]):
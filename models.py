@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from decimal import Decimal
+from typing import Dict, List, Literal, Optional, Union
 
 # Input/Output models for tools
 
@@ -24,9 +25,10 @@ class StringsToIntsOutput(BaseModel):
 
 class ExpSumInput(BaseModel):
     int_list: List[int]
+    mode: Literal["float", "log", "exact"] = "float"
 
 class ExpSumOutput(BaseModel):
-    result: float
+    result: Union[float, Decimal]
 
 # Text/Reasoning Based Function Models
 
@@ -62,6 +64,45 @@ class FallbackReasoningInput(BaseModel):
 class FallbackReasoningOutput(BaseModel):
     text: str
 
+# Batch Text/Reasoning Function Models
+
+class CalculationItem(BaseModel):
+    expression: str
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+class VerificationItem(BaseModel):
+    expression: str
+    expected: float
+    actual: Optional[float] = None
+    correct: Optional[bool] = None
+    error: Optional[str] = None
+
+class CalculateManyInput(BaseModel):
+    expressions: List[str]
+
+class CalculateManyOutput(BaseModel):
+    result: List[CalculationItem]
+
+class VerifyManyInput(BaseModel):
+    pairs: List[VerifyInput]
+
+class VerifyManyOutput(BaseModel):
+    result: List[VerificationItem]
+
+class CalculateAndVerifyInput(BaseModel):
+    expression: str
+    expected: float
+
+class CalculateAndVerifyOutput(BaseModel):
+    result: VerificationItem
+
+class EvaluationStatsInput(BaseModel):
+    pass
+
+class EvaluationStatsOutput(BaseModel):
+    result: Dict[str, int]
+
 # Basic Math Operations Models
 
 class SubtractInput(BaseModel):
@@ -90,7 +131,7 @@ class PowerInput(BaseModel):
     b: int
 
 class PowerOutput(BaseModel):
-    result: int
+    result: Union[int, float]
 
 class CbrtInput(BaseModel):
     a: int
@@ -135,9 +176,81 @@ class TanInput(BaseModel):
 class TanOutput(BaseModel):
     result: float
 
+class FibonacciInput(BaseModel):
+    n: int
+
+class FibonacciOutput(BaseModel):
+    result: int
+
+class FibonacciNumbersInput(BaseModel):
+    n: int
+
+class FibonacciNumbersOutput(BaseModel):
+    result: List[int]
+
 class MineInput(BaseModel):
     a: int
     b: int
 
 class MineOutput(BaseModel):
     result: int
+
+# Batch (elementwise) Math Operations Models
+
+class SqrtBatchInput(BaseModel):
+    a: List[float]
+
+class SqrtBatchOutput(BaseModel):
+    result: List[float]
+
+class CbrtBatchInput(BaseModel):
+    a: List[float]
+
+class CbrtBatchOutput(BaseModel):
+    result: List[float]
+
+class LogBatchInput(BaseModel):
+    a: List[float]
+
+class LogBatchOutput(BaseModel):
+    result: List[float]
+
+class SinBatchInput(BaseModel):
+    a: List[float]
+
+class SinBatchOutput(BaseModel):
+    result: List[float]
+
+class CosBatchInput(BaseModel):
+    a: List[float]
+
+class CosBatchOutput(BaseModel):
+    result: List[float]
+
+class TanBatchInput(BaseModel):
+    a: List[float]
+
+class TanBatchOutput(BaseModel):
+    result: List[float]
+
+class FactorialBatchInput(BaseModel):
+    a: List[int]
+
+class FactorialBatchOutput(BaseModel):
+    result: List[int]
+
+class PowerBatchInput(BaseModel):
+    a: Union[float, List[float]]
+    b: Union[float, List[float]]
+
+class PowerBatchOutput(BaseModel):
+    # A single number when both arguments are
+    result: Union[float, List[float]]
+
+class RemainderBatchInput(BaseModel):
+    a: Union[float, List[float]]
+    b: Union[float, List[float]]
+
+class RemainderBatchOutput(BaseModel):
+    # A single number when both arguments are
+    result: Union[float, List[float]]
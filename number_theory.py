@@ -0,0 +1,84 @@
+from typing import Iterator, Tuple
+from functools import lru_cache
+import math
+import sys
+
+# Largest result, in decimal digits, the engine will build before refusing
+MAX_RESULT_DIGITS = 1_000_000
+
+LOG10_PHI = math.log10((1 + math.sqrt(5)) / 2)
+LOG10_SQRT5 = math.log10(math.sqrt(5))
+
+class ResultTooLargeError(ValueError):
+    """Raised when a result would exceed the allowed number of digits."""
+
+def fibonacci_digits(n: int) -> int:
+    """Estimated number of decimal digits in the nth Fibonacci number."""
+    if n < 2:
+        return 1
+    return int(n * LOG10_PHI - LOG10_SQRT5) + 1
+
+def factorial_digits(n: int) -> int:
+    """Estimated number of decimal digits in n!."""
+    if n < 2:
+        return 1
+    return int(math.lgamma(n + 1) / math.log(10)) + 1
+
+def allow_result_digits(max_digits: int = MAX_RESULT_DIGITS):
+    """Let this process convert ints of up to `max_digits` digits to and from text.
+
+    Python refuses conversions past 4300 digits by default, which factorial and
+    fibonacci results pass long before MAX_RESULT_DIGITS.
+    """
+    if not hasattr(sys, "get_int_max_str_digits"):
+        return
+    current = sys.get_int_max_str_digits()
+    if current and current < max_digits:
+        sys.set_int_max_str_digits(max_digits)
+
+def _check_size(digits: int, max_digits: int, what: str):
+    if digits > max_digits:
+        raise ResultTooLargeError(f"{what} would have about {digits} digits (limit {max_digits})")
+
+def _fibonacci_pair(n: int) -> Tuple[int, int]:
+    """Return (F(n), F(n+1)) by fast doubling over the bits of n."""
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        # F(2k) = F(k) * (2F(k+1) - F(k)), F(2k+1) = F(k)^2 + F(k+1)^2
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        a, b = (d, c + d) if bit == '1' else (c, d)
+    return a, b
+
+def fibonacci(n: int, max_digits: int = MAX_RESULT_DIGITS) -> int:
+    """The nth Fibonacci number (F(0) = 0), in O(log n) big-integer multiplications."""
+    if n < 0:
+        raise ValueError("Fibonacci index must be non-negative")
+    _check_size(fibonacci_digits(n), max_digits, f"fibonacci({n})")
+    return _fibonacci_pair(n)[0]
+
+def fibonacci_sequence(n: int, start: int = 0) -> Iterator[int]:
+    """Stream n consecutive Fibonacci numbers beginning at F(start), one term at a time."""
+    if n < 0 or start < 0:
+        raise ValueError("Number of Fibonacci numbers must be non-negative")
+    if n == 0:
+        return
+    a, b = _fibonacci_pair(start) if start else (0, 1)
+    for _ in range(n):
+        yield a
+        a, b = b, a + b
+
+def fibonacci_sequence_digits(n: int) -> int:
+    """Estimated total decimal digits in the first n Fibonacci numbers."""
+    return n + int(LOG10_PHI * n * n / 2)
+
+@lru_cache(maxsize=256)
+def _factorial(n: int) -> int:
+    return math.factorial(n)
+
+def factorial(n: int, max_digits: int = MAX_RESULT_DIGITS) -> int:
+    """n!, memoized in a bounded cache so repeated calls are instant."""
+    if n < 0:
+        raise ValueError("Cannot calculate factorial of negative number")
+    _check_size(factorial_digits(n), max_digits, f"factorial({n})")
+    return _factorial(n)
@@ -0,0 +1,157 @@
+from typing import Any, Callable, Dict, Optional
+
+# Consistency check codes and how they are rendered
+CHECK_LABELS = {
+    "verified": "[green]✓ Calculation verified[/green]",
+    "calculation_error": "[red]✗ Calculation error[/red]",
+    "verification_failed": "[yellow]! Verification failed[/yellow]",
+    "verification_timeout": "[yellow]! Verification timed out[/yellow]",
+    "empty_result": "[red]✗ Empty result[/red]",
+    "uses_previous": "[green]✓ Uses previous result[/green]",
+    "independent": "[blue]○ Independent step[/blue]",
+    "large_increase": "[yellow]! Large magnitude increase[/yellow]",
+    "large_decrease": "[yellow]! Large magnitude decrease[/yellow]",
+    "magnitude_failed": "[yellow]! Magnitude comparison failed[/yellow]",
+    "invalid_parentheses": "[red]✗ Invalid parentheses[/red]",
+    "large_result": "[yellow]! Large result[/yellow]",
+    "small_result": "[yellow]! Small result[/yellow]",
+    "range_failed": "[yellow]! Range check failed[/yellow]",
+}
+
+class CallbackSink:
+    """Output sink that passes every event as a dict to a callback, e.g. `queue.put`."""
+
+    def __init__(self, callback: Callable[[Dict[str, Any]], Any]):
+        self.callback = callback
+
+    def emit(self, event: str, **fields):
+        self.callback({"event": event, **fields})
+
+class ConsoleSink:
+    """Output sink that renders events on a rich console.
+
+    Events:
+        call: name, args (dict), and optionally result, error or cached
+        verification: expression, expected, actual, correct
+        reasoning: steps
+        consistency: report
+        fallback: step_description
+    """
+
+    def __init__(self, console=None, render_reports: Optional[bool] = None):
+        if console is None:
+            from rich.console import Console
+            console = Console()
+        self.console = console
+        # Consistency reports are costly to render; by default only do it on a terminal
+        self.render_reports = console.is_terminal if render_reports is None else render_reports
+        self._handlers = {
+            "call": self._render_call,
+            "verification": self._render_verification,
+            "reasoning": self._render_reasoning,
+            "consistency": self._render_consistency,
+            "fallback": self._render_fallback,
+        }
+
+    def emit(self, event: str, **fields):
+        self._handlers[event](**fields)
+
+    def _render_call(self, name: str, args: Optional[Dict[str, Any]] = None, **outcome):
+        self.console.print(f"[blue]FUNCTION CALL:[/blue] {name}()")
+        for key, value in (args or {}).items():
+            self.console.print(f"[blue]{key.replace('_', ' ').title()}:[/blue] {value}")
+        if outcome.get("cached"):
+            self.console.print("[cyan]Cache hit[/cyan]")
+        if "error" in outcome:
+            self.console.print(f"[red]Error:[/red] {outcome['error']}")
+        elif "result" in outcome:
+            self.console.print(f"[green]Result:[/green] {outcome['result']}")
+
+    def _render_verification(self, expression: str, expected: float, actual: float, correct: bool):
+        if correct:
+            self.console.print(f"[green]✓ Correct! {expression} = {expected}[/green]")
+        else:
+            self.console.print(f"[red]✗ Incorrect! {expression} should be {actual}, got {expected}[/red]")
+
+    def _render_reasoning(self, steps):
+        from rich.panel import Panel
+        for i, step in enumerate(steps, 1):
+            self.console.print(Panel(
+                f"{step}",
+                title=f"Step {i}",
+                border_style="cyan"
+            ))
+
+    def _render_fallback(self, step_description: str):
+        from rich.panel import Panel
+        self.console.print(Panel(
+            f"[yellow]Fallback triggered:[/yellow]\n{step_description}",
+            title="Fallback Reasoning",
+            border_style="red"
+        ))
+
+    def _render_consistency(self, report: Dict[str, Any]):
+        if not self.render_reports:
+            return
+        from rich.panel import Panel
+        self.console.print("\n[bold cyan]Consistency Analysis Report[/bold cyan]")
+        self.console.print(render_consistency_table(report))
+
+        if report["issues"]:
+            self.console.print(Panel(
+                "\n".join(f"[red]• {issue}[/red]" for issue in report["issues"]),
+                title="Critical Issues",
+                border_style="red"
+            ))
+
+        if report["warnings"]:
+            self.console.print(Panel(
+                "\n".join(f"[yellow]• {warning}[/yellow]" for warning in report["warnings"]),
+                title="Warnings",
+                border_style="yellow"
+            ))
+
+        if report["insights"]:
+            self.console.print(Panel(
+                "\n".join(f"[blue]• {insight}[/blue]" for insight in report["insights"]),
+                title="Analysis Insights",
+                border_style="blue"
+            ))
+
+        consistency_score = report["score"]
+        self.console.print(Panel(
+            f"[bold]Consistency Score: {consistency_score:.1f}%[/bold]\n" +
+            f"Passed Checks: {report['passed_checks']}/{report['total_checks']}\n" +
+            f"Critical Issues: {len(report['issues'])}\n" +
+            f"Warnings: {len(report['warnings'])}\n" +
+            f"Insights: {len(report['insights'])}",
+            title="Summary",
+            border_style="green" if consistency_score > 80 else "yellow" if consistency_score > 60 else "red"
+        ))
+
+def render_consistency_table(report: Dict[str, Any]):
+    """Build the rich step-by-step table for a consistency report."""
+    from rich.table import Table
+    from rich import box
+    table = Table(
+        title="Step-by-Step Consistency Analysis",
+        box=box.ROUNDED,
+        show_header=True,
+        header_style="bold cyan"
+    )
+    table.add_column("Step", style="cyan")
+    table.add_column("Expression", style="blue")
+    table.add_column("Result", style="green")
+    table.add_column("Checks", style="yellow")
+
+    for step in report["steps"]:
+        if step["status"] == "invalid":
+            continue
+        table.add_row(
+            str(step["step"]),
+            step["expression"],
+            step["result"],
+            ", ".join(CHECK_LABELS[check] for check in step["checks"])
+        )
+
+    return table
@@ -4,43 +4,21 @@ from typing import List, Dict, Any, Union
 import math
 import re
 import logging
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
-from rich import box
 import sys
-from models import (
-    AddInput, AddOutput, SqrtInput, SqrtOutput, 
-    StringsToIntsInput, StringsToIntsOutput, 
-    ExpSumInput, ExpSumOutput,
-    ShowReasoningInput, ShowReasoningOutput,
-    CalculateInput, CalculateOutput,
-    VerifyInput, VerifyOutput,
-    CheckConsistencyInput, CheckConsistencyOutput,
-    FallbackReasoningInput, FallbackReasoningOutput,
-    SubtractInput, SubtractOutput,
-    MultiplyInput, MultiplyOutput,
-    DivideInput, DivideOutput,
-    PowerInput, PowerOutput,
-    CbrtInput, CbrtOutput,
-    FactorialInput, FactorialOutput,
-    LogInput, LogOutput,
-    RemainderInput, RemainderOutput,
-    SinInput, SinOutput,
-    CosInput, CosOutput,
-    TanInput, TanOutput,
-    MineInput, MineOutput
-)
 
-# Configure logging
-logging.basicConfig(
-    filename='perceive.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger('Perceive')
 
-console = Console()
+def _configure_logging():
+    """Send logs to perceive.log, set up on first use rather than at import.
+    
+    The file itself is only opened when the first record is written.
+    """
+    if not logging.getLogger().handlers:
+        logging.basicConfig(
+            handlers=[logging.FileHandler('perceive.log', delay=True)],
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
 
 class Perceive:
     """Component responsible for perceiving and understanding the environment."""
@@ -49,6 +27,7 @@ class Perceive:
         self.last_expression = None
         self.last_result = None
         self.error_patterns = {}
+        _configure_logging()
         logger.info("Perceive class initialized")
     
     def parse_expression(self, expression: str) -> Union[float, None]:
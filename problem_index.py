@@ -0,0 +1,436 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from array import array
+from collections import Counter
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from expression_parser import ParseError, tokenize
+
+try:
+    # Compact bucket arrays and vectorized signatures; without it buckets stay in dicts
+    import numpy as np
+except ImportError:
+    np = None
+
+# MinHash signature length, split into BANDS bands of ROWS values for LSH. Two problems
+# become candidates when any band agrees, which is likely above a Jaccard similarity
+# of about (1 / BANDS) ** (1 / ROWS) = 0.44.
+NUM_PERM = 36
+BANDS = 12
+ROWS = NUM_PERM // BANDS
+
+# Words per shingle of the normalized problem text; pairs survive light rewording
+SHINGLE_SIZE = 2
+
+# Near-duplicate candidates checked per lookup, most band matches first
+MAX_CANDIDATES = 4
+
+# Newest entries of a bucket looked at, bounding lookups when one template is very common
+BUCKET_SCAN = 16
+
+# Estimated Jaccard similarity a reworded problem needs before its structure is compared
+MIN_SIMILARITY = 0.5
+
+# Words that flip what a sentence says; a reworded problem must use as many of them
+NEGATIONS = {"not", "no", "never", "t", "without", "none"}
+
+# Sentence ends in problem text, for finding its question
+SENTENCE_END = re.compile(r"(?<=[.?!])\s+")
+
+# Bucket entries kept in dicts before they are merged into the sorted arrays
+SEAL_EVERY = 65536
+
+# Problem numbers a compiled step reads, e.g. {n0}
+STEP_NUMBER = re.compile(r"\{n(\d+)\}")
+
+# Numbers in problem text; thousands separators are dropped
+PROBLEM_NUMBER = re.compile(r"\d+(?:,\d{3})*(?:\.\d+)?")
+# Words, placeholders and operator symbols, so "# + #" and "# * #" stay apart
+PROBLEM_WORD = re.compile(r"[a-z]+|#|[-+*/^%=()]")
+
+# Universal hash (a * x + b) mod p per signature value; p is prime and larger than any crc32
+_PRIME = (1 << 32) + 15
+_MASK = (1 << 64) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, 1 << 32), _rng.randrange(0, 1 << 32)) for _ in range(NUM_PERM)]
+if np is not None:
+    _A = np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64)
+    _B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)
+
+def parse_problem(problem: str) -> Tuple[List[str], List[float]]:
+    """Words of a problem with every number replaced by '#', and the numbers."""
+    numbers = []
+
+    def placeholder(match):
+        text = match.group(0).replace(",", "")
+        numbers.append(float(text) if "." in text else int(text))
+        return " # "
+
+    words = PROBLEM_WORD.findall(PROBLEM_NUMBER.sub(placeholder, problem.lower()))
+    return words, numbers
+
+def skeleton(words: Sequence[str]) -> str:
+    """The template a problem's chain is reused for: its normalized words, numbers as '#'."""
+    return " ".join(words)
+
+def skeleton_key(template: str) -> int:
+    """63-bit bucket key of a skeleton, kept next to the band keys so exact matches are never missed."""
+    return int.from_bytes(hashlib.blake2b(template.encode(), digest_size=8).digest(), "big") >> 1
+
+def structure(problem: str) -> Tuple[List[Tuple[str, str]], List[str], List[str], int]:
+    """What a reworded problem must keep for a chain to carry over.
+
+    That is the word before and after each number, the operator symbols in order,
+    the words of the question (the last sentence) and the count of negations.
+    Names and other words away from the numbers may change: "Sam has 12 apples"
+    and "Tom has 12 apples" share a chain, "eats 5" and "buys 5" do not.
+    """
+    words = parse_problem(problem)[0]
+    padded = ["", *words, ""]
+    slots = [(padded[i - 1], padded[i + 1]) for i, word in enumerate(padded) if word == "#"]
+    operators = [word for word in words if not word.isalpha() and word != "#"]
+    sentences = [sentence for sentence in SENTENCE_END.split(problem.strip()) if sentence]
+    question = parse_problem(sentences[-1])[0] if sentences else []
+    return slots, operators, question, sum(word in NEGATIONS for word in words)
+
+def shingles(words: Sequence[str]) -> List[int]:
+    """Hashes of the word n-grams of a normalized problem."""
+    if len(words) <= SHINGLE_SIZE:
+        return [zlib.crc32(" ".join(words).encode())]
+    return list({zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode())
+                 for i in range(len(words) - SHINGLE_SIZE + 1)})
+
+def minhash(hashes: Sequence[int]) -> List[int]:
+    """MinHash signature of a set of shingle hashes."""
+    if np is not None:
+        values = np.array(hashes, dtype=np.uint64)
+        return ((np.outer(values, _A) + _B) % np.uint64(_PRIME)).min(axis=0).tolist()
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+def band_keys(signature: Sequence[int]) -> List[int]:
+    """One 63-bit bucket key per band, from the band's signature values and its position."""
+    keys = []
+    for band in range(BANDS):
+        key = band + 1
+        for value in signature[band * ROWS:(band + 1) * ROWS]:
+            key = ((key ^ value) * 0x100000001B3) & _MASK
+        keys.append(key >> 1)
+    return keys
+
+def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+def _format_number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+def compile_chain(numbers: Sequence[float], calculations: Sequence[Tuple[str, float]],
+                  final_answer: Any) -> Optional[Tuple[List[str], int]]:
+    """Rewrite a solve's calculate chain in terms of the problem's numbers.
+
+    Each literal becomes {nI} when it is the problem's I-th number or {sJ} when it is
+    the result of step J; other literals stay as they are. Returns the step templates
+    and the step whose result is the final answer, or None when the chain cannot be
+    reused: a literal matching more than one source, or an answer no step produced.
+    """
+    steps, results = [], []
+    for expression, result in calculations:
+        try:
+            tokens = tokenize(expression)
+        except ParseError:
+            return None
+        parts = []
+        for kind, value in tokens:
+            if kind != "number":
+                parts.append(str(value))
+                continue
+            sources = [f"{{n{i}}}" for i, number in enumerate(numbers) if number == value]
+            sources += [f"{{s{j}}}" for j, earlier in enumerate(results) if earlier == value]
+            if len(sources) > 1:
+                return None
+            parts.append(sources[0] if sources else _format_number(value))
+        steps.append(" ".join(parts))
+        results.append(result)
+
+    try:
+        answer = float(str(final_answer).strip().replace(",", ""))
+    except ValueError:
+        return None
+    for j in range(len(results) - 1, -1, -1):
+        if results[j] == answer:
+            return steps, j
+    return None
+
+def replay(steps: Sequence[str], answer_step: int, numbers: Sequence[float],
+           perceive) -> Optional[Tuple[List[Tuple[str, float]], float]]:
+    """Run a compiled chain with new numbers through Perceive; None when a step does not evaluate."""
+    values = {f"n{i}": _format_number(number) for i, number in enumerate(numbers)}
+    done = []
+    for j, step in enumerate(steps):
+        try:
+            expression = step.format(**values)
+        except (KeyError, IndexError):
+            return None
+        result = perceive.parse_expression(expression)
+        if result is None:
+            return None
+        values[f"s{j}"] = _format_number(result)
+        done.append((expression, result))
+    return done, done[answer_step][1]
+
+def confirms(record: Dict[str, Any], steps: Sequence[str], answer_step: int, numbers: Sequence[float]) -> bool:
+    """Whether a solve with `numbers` that compiled to `steps` confirms an indexed record's chain.
+
+    The chains must be the same, and every problem number they read must differ
+    between the two problems: a literal that only equalled a problem number by
+    coincidence, like the 2 of "half" in "2 bags", compiles differently then.
+    """
+    if list(record["steps"]) != list(steps) or record["answer_step"] != answer_step:
+        return False
+    earlier = record.get("numbers", [])
+    used = {int(i) for step in steps for i in STEP_NUMBER.findall(step)}
+    return all(i < len(earlier) and i < len(numbers) and earlier[i] != numbers[i] for i in used)
+
+def make_record(problem: str, steps: Sequence[str], answer_step: int, confirmed: bool = False) -> Dict[str, Any]:
+    """The index file's record of a problem and its compiled chain."""
+    words, numbers = parse_problem(problem)
+    signature = minhash(shingles(words))
+    return {
+        "timestamp": time.time(),
+        "problem": problem,
+        "numbers": numbers,
+        "skeleton": skeleton(words),
+        "signature": signature,
+        "bands": band_keys(signature),
+        "steps": list(steps),
+        "answer_step": answer_step,
+        "confirmed": confirmed
+    }
+
+class ProblemIndex:
+    """Near-duplicate index of solved problems whose answers can be recomputed.
+
+    Each solve that ended in an answer is stored with its calculate chain compiled
+    against the problem's numbers (see compile_chain). The chain is only served
+    once a solve of a matching problem with other numbers compiled to the same
+    chain (see `confirms`), since a constant step such as "/ 2" for "half" looks
+    like a problem number when the problem happens to contain a 2. A new problem
+    is answered by replaying a confirmed chain with its own numbers when it has the same skeleton,
+    i.e. the same words once numbers, case and punctuation are set aside, or
+    when it is a rewording that keeps the problem's structure (see `structure`).
+    Exact skeletons have a bucket of their own; reworded candidates are found
+    through MinHash LSH buckets of the word shingles, so lookups stay fast
+    however many problems are indexed.
+
+    Records are appended to a JSON Lines file at `path`, which several processes
+    may share; memory holds only the LSH buckets and the records' file offsets.
+    Buckets are a dict until SEAL_EVERY records accumulate, then they are merged
+    into a sorted numpy array searched by bisection.
+    """
+
+    def __init__(self, path: str, perceive=None):
+        self.path = path
+        if perceive is None:
+            from perceive import Perceive
+            perceive = Perceive()
+        self.perceive = perceive
+        self._lock = threading.Lock()
+        self._offsets = array("q")
+        # Band keys differ between bands (see band_keys), so all bands share one table
+        self._pending = {}
+        self._pending_count = 0
+        self._sealed_keys = self._sealed_ids = None
+        self._file_offset = 0
+        self._reader = None
+        self.stats = {"lookups": 0, "matches": 0, "candidates": 0, "unconfirmed": 0, "replay_failures": 0,
+                      "added": 0, "confirmed": 0}
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def _insert(self, keys: Sequence[int], record_id: int):
+        for key in keys:
+            self._pending.setdefault(key, []).append(record_id)
+        self._pending_count += 1
+        if np is not None and self._pending_count >= SEAL_EVERY:
+            self._seal()
+
+    def _seal(self):
+        """Merge the pending bucket entries into the sorted arrays."""
+        keys = np.fromiter((key for key, ids in self._pending.items() for _ in ids), dtype=np.int64)
+        ids = np.fromiter((record_id for ids in self._pending.values() for record_id in ids), dtype=np.uint32)
+        # Stable, so the entries of a key stay in insertion order
+        order = np.argsort(keys, kind="stable")
+        keys, ids = keys[order], ids[order]
+        if self._sealed_keys is None:
+            self._sealed_keys, self._sealed_ids = keys, ids
+        else:
+            # Insert after existing entries of the same key; copies the arrays once
+            positions = np.searchsorted(self._sealed_keys, keys, side="right")
+            self._sealed_keys = np.insert(self._sealed_keys, positions, keys)
+            self._sealed_ids = np.insert(self._sealed_ids, positions, ids)
+        self._pending = {}
+        self._pending_count = 0
+
+    def refresh(self):
+        """Index records appended to the file since the last look, by this or another process."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size <= self._file_offset:
+            return
+        with self._lock:
+            with open(self.path, "rb") as f:
+                f.seek(self._file_offset)
+                offset = self._file_offset
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # A partial write is picked up next time
+                        break
+                    if line.strip():
+                        record = json.loads(line)
+                        self._offsets.append(offset)
+                        self._insert([*record["bands"], skeleton_key(record["skeleton"])], len(self._offsets) - 1)
+                    offset += len(line)
+                self._file_offset = offset
+
+    def _read(self, record_id: int) -> Dict[str, Any]:
+        if self._reader is None:
+            self._reader = os.open(self.path, os.O_RDONLY)
+        start, data = self._offsets[record_id], b""
+        while b"\n" not in data:
+            chunk = os.pread(self._reader, 4096, start + len(data))
+            if not chunk:
+                break
+            data += chunk
+        return json.loads(data.split(b"\n", 1)[0])
+
+    def _buckets(self, keys: Sequence[int]) -> List[List[int]]:
+        """The newest BUCKET_SCAN record ids under each key, oldest first."""
+        buckets = [[] for _ in keys]
+        if self._sealed_keys is not None:
+            query = np.array(keys, dtype=np.int64)
+            lows = np.searchsorted(self._sealed_keys, query, side="left").tolist()
+            highs = np.searchsorted(self._sealed_keys, query, side="right").tolist()
+            for bucket, low, high in zip(buckets, lows, highs):
+                if high > low:
+                    # The newest entries of a key are last
+                    bucket.extend(self._sealed_ids[max(low, high - BUCKET_SCAN):high].tolist())
+        for bucket, key in zip(buckets, keys):
+            bucket.extend(self._pending.get(key, ())[-BUCKET_SCAN:])
+        return [bucket[-BUCKET_SCAN:] for bucket in buckets]
+
+    def _candidates(self, buckets: List[List[int]]) -> Iterator[int]:
+        """Record ids from `_buckets`: the same skeleton's newest first, then MAX_CANDIDATES
+        sharing the most bands, ranked only once the exact ones are used up."""
+        exact, *bands = buckets
+        yield from reversed(exact)
+        votes = Counter(record_id for bucket in bands for record_id in bucket)
+        for record_id in exact:
+            votes.pop(record_id, None)
+        # Newest first among equals: a later solve of the same template is likelier to be right
+        yield from sorted(votes, key=lambda record_id: (-votes[record_id], -record_id))[:MAX_CANDIDATES]
+
+    def _similar(self, problem: str, words: List[str], signature: List[int]) -> Iterator[Dict[str, Any]]:
+        """Indexed records of the same skeleton, then rewordings with the same structure."""
+        template = skeleton(words)
+        with self._lock:
+            buckets = self._buckets([skeleton_key(template), *band_keys(signature)])
+        shape = None
+        for record_id in self._candidates(buckets):
+            with self._lock:
+                record = self._read(record_id)
+            if record.get("skeleton") != template:
+                if similarity(signature, record["signature"]) < MIN_SIMILARITY:
+                    continue
+                shape = shape or structure(problem)
+                if structure(record["problem"]) != shape:
+                    continue
+            yield record
+
+    def add(self, problem: str, calculations: Sequence[Tuple[str, float]], final_answer: Any) -> bool:
+        """Index a model-solved problem; returns False when its chain cannot be reused.
+
+        The chain is replayed with the problem's own numbers first and only kept
+        when that reproduces every recorded result. It is stored as confirmed when
+        an indexed matching problem confirms it (see `confirms`).
+        """
+        numbers = parse_problem(problem)[1]
+        compiled = compile_chain(numbers, calculations, final_answer)
+        if compiled is None or not compiled[0]:
+            return False
+        steps, answer_step = compiled
+        replayed = replay(steps, answer_step, numbers, self.perceive)
+        if replayed is None or any(
+            abs(value - float(result)) > 1e-9 * max(1.0, abs(float(result)))
+            for (_, value), (_, result) in zip(replayed[0], calculations)
+        ):
+            return False
+
+        confirmed = False
+        if self._offsets:
+            words = parse_problem(problem)[0]
+            confirmed = any(confirms(record, steps, answer_step, numbers)
+                            for record in self._similar(problem, words, minhash(shingles(words))))
+        line = json.dumps(make_record(problem, steps, answer_step, confirmed)) + "\n"
+        # One append per record, so records from several processes never interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+        self.refresh()
+        self.stats["added"] += 1
+        self.stats["confirmed"] += confirmed
+        return True
+
+    def match(self, problem: str) -> Optional[Dict[str, Any]]:
+        """Answer a problem from the chain of the same or a reworded solved one, or None.
+
+        A solved problem with the same skeleton always qualifies. One with other
+        wording qualifies at an estimated similarity of MIN_SIMILARITY or more when
+        its structure (see `structure`) is the same. Only confirmed chains are
+        replayed. Returns the replayed steps, the answer, the source problem and
+        the similarity.
+        """
+        self.refresh()
+        self.stats["lookups"] += 1
+        if not self._offsets:
+            return None
+        words, numbers = parse_problem(problem)
+        signature = minhash(shingles(words))
+        for record in self._similar(problem, words, signature):
+            self.stats["candidates"] += 1
+            if not record.get("confirmed"):
+                self.stats["unconfirmed"] += 1
+                continue
+            replayed = replay(record["steps"], record["answer_step"], numbers, self.perceive)
+            if replayed is None:
+                self.stats["replay_failures"] += 1
+                continue
+            self.stats["matches"] += 1
+            steps, answer = replayed
+            return {
+                "final_answer": _format_number(answer),
+                "steps": steps,
+                "source": record["problem"],
+                "similarity": similarity(signature, record["signature"])
+            }
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "size": len(self._offsets),
+            "pending": self._pending_count,
+            "numpy": np is not None
+        }
@@ -0,0 +1,137 @@
+from typing import Any, Dict, List, Optional
+from collections import Counter, deque
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+# Where profiles are written, one collapsed-stacks file per trace and side
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+# Trace ids end up in file names, so only plain hex ids are accepted
+TRACE_ID_PATTERN = re.compile(r"[0-9a-f]{1,32}")
+
+class StackSampler:
+    """Samples the Python stack of one thread while active, for flamegraphs.
+
+    Stacks are counted in collapsed ("folded") form, `outer;...;inner count`,
+    which flamegraph.pl and speedscope read directly. A sample is taken at most
+    once per interval and only when the sampler thread gets the GIL, so work
+    shorter than a few milliseconds may not show up at all.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.001,
+                 root: Optional[str] = None, base_code=None):
+        """Sample `thread_id` (default: the calling thread) every `interval` seconds.
+
+        With `base_code`, only frames called from that code object are kept and
+        `root`, when given, names the bottom of every stack in their place.
+        """
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.root = root
+        self.base_code = base_code
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and frame.f_code is not self.base_code:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if self.base_code is not None and frame is None:
+                # Not inside the base frame (yet, or any more)
+                continue
+            if self.root:
+                names.append(self.root)
+            self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def collapsed(self) -> str:
+        """The samples as collapsed stacks, one `stack count` line each."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+class ProfileRateLimiter:
+    """Allows at most `max_profiles` profiles in any `window` seconds."""
+
+    def __init__(self, max_profiles: int = 5, window: float = 60.0):
+        self.max_profiles = max_profiles
+        self.window = window
+        self._started = deque()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._started and now - self._started[0] > self.window:
+                self._started.popleft()
+            if len(self._started) >= self.max_profiles:
+                return False
+            self._started.append(now)
+            return True
+
+def new_trace_id() -> str:
+    """Short random id tying a request's server and tool profiles together."""
+    return uuid.uuid4().hex[:16]
+
+def is_valid_trace_id(trace_id: Any) -> bool:
+    return isinstance(trace_id, str) and TRACE_ID_PATTERN.fullmatch(trace_id) is not None
+
+def profile_path(trace_id: str, side: str, directory: Optional[str] = None) -> str:
+    """Path of the collapsed-stacks file for one side ("server" or "tools") of a trace."""
+    if not is_valid_trace_id(trace_id):
+        raise ValueError(f"Invalid trace id: {trace_id!r}")
+    return os.path.join(directory or PROFILE_DIR, f"{trace_id}.{side}.folded")
+
+def write_profile(trace_id: str, side: str, sampler: StackSampler, directory: Optional[str] = None):
+    """Append a sampler's stacks to the trace's file; appending merges several tool calls."""
+    if not sampler.stacks:
+        return
+    directory = directory or PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    with open(profile_path(trace_id, side, directory), "a") as f:
+        f.write(sampler.collapsed())
+
+def list_profiles(limit: int = 20, directory: Optional[str] = None) -> List[Dict[str, Any]]:
+    """The most recently written profiles, newest first."""
+    directory = directory or PROFILE_DIR
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(".folded")]
+    except OSError:
+        return []
+    profiles = []
+    for name in names:
+        stat = os.stat(os.path.join(directory, name))
+        trace_id, side, _ = name.split(".", 2)
+        profiles.append({
+            "file": name,
+            "trace_id": trace_id,
+            "side": side,
+            "size": stat.st_size,
+            "modified": stat.st_mtime
+        })
+    profiles.sort(key=lambda profile: profile["modified"], reverse=True)
+    return profiles[:limit]
@@ -0,0 +1,121 @@
+from typing import Any, Dict, Optional, Tuple
+import gzip
+import json
+import time
+
+try:
+    # Faster JSON serialization for the solve responses
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Levels of detail for solve results; "summary" leaves out the intermediate turns
+DETAIL_LEVELS = ("summary", "full")
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Bodies smaller than this are sent uncompressed; the headers would eat the savings
+MIN_COMPRESS_BYTES = 512
+
+# Fast settings suited to compressing every response on the fly
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+def apply_detail(result: Dict[str, Any], detail: str = "full") -> Dict[str, Any]:
+    """The result at the requested level of detail.
+
+    A summary drops the conversation, keeping only its length and the last
+    assistant turn, which usually holds the final answer.
+    """
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"detail must be one of {', '.join(DETAIL_LEVELS)}")
+    if detail == "full" or "conversation" not in result:
+        return result
+    summary = {key: value for key, value in result.items() if key != "conversation"}
+    conversation = result["conversation"]
+    summary["turns"] = len(conversation)
+    summary["last_turn"] = next(
+        (turn["content"] for turn in reversed(conversation) if turn.get("role") == "assistant"), None
+    )
+    return summary
+
+def dumps_json(obj: Any) -> bytes:
+    """Compact JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+def _accepted(header: Optional[str]) -> Dict[str, float]:
+    """Values of an Accept-style header mapped to their q weights."""
+    accepted = {}
+    for part in (header or "").split(","):
+        value, *params = [item.strip() for item in part.split(";")]
+        if not value:
+            continue
+        weight = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    weight = float(param[2:])
+                except ValueError:
+                    weight = 0.0
+        accepted[value.lower()] = weight
+    return accepted
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """MessagePack when the client asks for it and msgpack is installed, else JSON."""
+    accepted = _accepted(accept)
+    if msgpack is not None:
+        for media_type in MSGPACK_TYPES:
+            if accepted.get(media_type, 0) > 0 and accepted[media_type] >= accepted.get("application/json", 0):
+                return media_type
+    return "application/json"
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The preferred content coding the client accepts: br (when installed), then gzip."""
+    accepted = _accepted(accept_encoding)
+    candidates = [coding for coding in (("br",) if brotli is not None else ()) + ("gzip",)
+                  if accepted.get(coding, accepted.get("*", 0)) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda coding: accepted.get(coding, accepted.get("*", 0)))
+
+def encode(obj: Any, media_type: str = "application/json", encoding: Optional[str] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """Serialize and optionally compress `obj`.
+
+    Returns the body and stats: the raw and sent sizes in bytes, the coding
+    actually applied and the milliseconds spent serializing and compressing.
+    """
+    start = time.perf_counter()
+    if media_type in MSGPACK_TYPES:
+        body = msgpack.packb(obj, use_bin_type=True)
+    else:
+        body = dumps_json(obj)
+    serialized = time.perf_counter()
+    raw_bytes = len(body)
+
+    if len(body) < MIN_COMPRESS_BYTES:
+        encoding = None
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    done = time.perf_counter()
+
+    return body, {
+        "raw_bytes": raw_bytes,
+        "bytes": len(body),
+        "encoding": encoding,
+        "serialize_ms": (serialized - start) * 1000,
+        "compress_ms": (done - serialized) * 1000
+    }
@@ -0,0 +1,337 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Not stdout: inside the stdio tool server that carries the MCP protocol
+logger = logging.getLogger('ResultCache')
+
+# Returned by a tier for keys it does not hold
+MISS = None
+
+# Shared-tier writes between checks for expired entries and the size bound
+EVICT_EVERY = 256
+
+# Seconds before a shared-tier hit refreshes the entry's last use, keeping reads mostly read-only
+TOUCH_INTERVAL = 60.0
+
+# Whitespace next to an operator or bracket. Whitespace between two operands is kept,
+# so "1 0" (not an expression) never shares a key with "10".
+OPERATOR_SPACE = re.compile(r"\s*([^\w.\s])\s*")
+
+def make_key(kind: str, key: str, version: Sequence[Any] = ()) -> str:
+    """Cache key of `key` within a kind of result, e.g. a solve for one model and prompt version.
+
+    Changing any part of `version` makes the old entries unreachable, so they age out.
+    """
+    digest = hashlib.sha256(json.dumps([kind, list(version), key]).encode()).hexdigest()
+    return f"{kind}:{digest[:32]}"
+
+def normalize_problem(problem: str) -> str:
+    """Problem text with whitespace runs collapsed, so reformatting does not miss the cache."""
+    return " ".join(problem.split())
+
+def normalize_expression(expression: str) -> str:
+    """Expression without whitespace around operators, the way Memory's result index keys it."""
+    return OPERATOR_SPACE.sub(r"\1", " ".join(expression.split()))
+
+class MemoryTier:
+    """Per-process LRU tier."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str, now: float) -> Optional[Tuple[Any, Optional[float]]]:
+        """(value, expiry) of a live entry, or MISS."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            if entry[1] is not None and entry[1] <= now:
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return entry
+
+    def set_many(self, items: Iterable[Tuple[str, Any, Optional[float]]], replace: bool = True):
+        with self._lock:
+            for key, value, expires in items:
+                if not replace and key in self._entries:
+                    continue
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteTier:
+    """Tier in a SQLite file shared by every worker process on the host.
+
+    Values are stored as JSON. The file runs in WAL mode, so readers do not
+    block the writer, and each thread keeps its own connection. Once the table
+    grows past `max_entries`, the least recently used entries are deleted.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross a fork, so worker processes open their own
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def get(self, key: str, now: float) -> Optional[Tuple[Any, Optional[float]]]:
+        """(value, expiry) of a live entry, or MISS."""
+        connection = self._connection()
+        row = connection.execute("SELECT value, expires, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return MISS
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            connection.execute("DELETE FROM entries WHERE key = ? AND expires <= ?", (key, now))
+            return MISS
+        if now - accessed > TOUCH_INTERVAL:
+            connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(value), expires
+
+    def set_many(self, items: Iterable[Tuple[str, Any, Optional[float]]], replace: bool = True):
+        now = time.time()
+        rows = [(key, json.dumps(value), expires, now) for key, value, expires in items]
+        if not rows:
+            return
+        connection = self._connection()
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(f"{verb} INTO entries (key, value, expires, accessed) VALUES (?, ?, ?, ?)", rows)
+        self._writes += len(rows)
+        if self._writes >= EVICT_EVERY:
+            self._writes = 0
+            self.evict(now)
+
+    def evict(self, now: Optional[float] = None):
+        """Delete expired entries, then the least recently used ones beyond `max_entries`."""
+        now = time.time() if now is None else now
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            expired = connection.execute("DELETE FROM entries WHERE expires <= ?", (now,)).rowcount
+            count = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)", (excess,)
+                )
+        self.evictions += expired + max(0, excess)
+
+    def newest(self, prefix: str, limit: int, now: float) -> List[Tuple[str, Any, Optional[float]]]:
+        """The `limit` most recently used live entries whose keys start with `prefix`, oldest first."""
+        rows = self._connection().execute(
+            "SELECT key, value, expires FROM entries WHERE key >= ? AND key < ? AND (expires IS NULL OR expires > ?) "
+            "ORDER BY accessed DESC LIMIT ?", (prefix, prefix + "\uffff", now, limit)
+        ).fetchall()
+        return [(key, json.loads(value), expires) for key, value, expires in reversed(rows)]
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+class ResultCache:
+    """Cache of solve results and expression values, checked tier by tier.
+
+    Lookups go through the tiers in order, fastest first, and a hit in a later
+    tier is copied into the earlier ones. Writes go to every tier. Values must
+    be JSON-serializable; anything else is simply not cached.
+    """
+
+    def __init__(self, tiers: List[Any], default_ttl: Optional[float] = None):
+        self.tiers = tiers
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0, **{f"{tier.name}_hits": 0 for tier in tiers}}
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Tiers from RESULT_CACHE_MEMORY_ENTRIES and, when set, the shared RESULT_CACHE_PATH file."""
+        tiers = [MemoryTier(int(os.environ.get("RESULT_CACHE_MEMORY_ENTRIES", "1024")))]
+        path = os.environ.get("RESULT_CACHE_PATH")
+        if path:
+            tiers.append(SQLiteTier(path, int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "100000"))))
+        return cls(tiers)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, kind: str, key: str, version: Sequence[Any] = ()) -> Optional[Any]:
+        """The cached value, or None when no tier holds a live one."""
+        cache_key = make_key(kind, key, version)
+        now = time.time()
+        for index, tier in enumerate(self.tiers):
+            try:
+                entry = tier.get(cache_key, now)
+            except (sqlite3.Error, ValueError) as e:
+                logger.error(f"Error reading result cache: {e}")
+                self._count("errors")
+                continue
+            if entry is MISS:
+                continue
+            self._count("hits")
+            self._count(f"{tier.name}_hits")
+            value, expires = entry
+            for faster in self.tiers[:index]:
+                faster.set_many([(cache_key, value, expires)])
+            return value
+        self._count("misses")
+        return None
+
+    def set(self, kind: str, key: str, value: Any, version: Sequence[Any] = (), ttl: Optional[float] = None):
+        """Store a value in every tier; `ttl` seconds (default `default_ttl`) bounds how long it is served."""
+        self.set_many(kind, [(key, value)], version, ttl)
+
+    def set_many(self, kind: str, items: Iterable[Tuple[str, Any]], version: Sequence[Any] = (),
+                 ttl: Optional[float] = None, replace: bool = True):
+        """Store several values of one kind, in a single transaction per tier."""
+        ttl = self.default_ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else None
+        entries = []
+        for key, value in items:
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                continue
+            entries.append((make_key(kind, key, version), value, expires))
+        for tier in self.tiers:
+            try:
+                tier.set_many(entries, replace)
+            except sqlite3.Error as e:
+                logger.error(f"Error writing result cache: {e}")
+                self._count("errors")
+        with self._lock:
+            self.stats["sets"] += len(entries)
+
+    def invalidate(self, kind: str, key: str, version: Sequence[Any] = ()):
+        cache_key = make_key(kind, key, version)
+        for tier in self.tiers:
+            tier.delete(cache_key)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def warm_from_shared(self, kind: str, limit: int = 1024) -> int:
+        """Copy the most recently used results of a kind from the shared tier into the faster ones.
+
+        Returns how many were copied; 0 without a shared tier.
+        """
+        shared = [tier for tier in self.tiers if hasattr(tier, "newest")]
+        if not shared:
+            return 0
+        try:
+            entries = shared[0].newest(f"{kind}:", limit, time.time())
+        except sqlite3.Error as e:
+            logger.error(f"Error reading result cache: {e}")
+            self._count("errors")
+            return 0
+        for tier in self.tiers[:self.tiers.index(shared[0])]:
+            tier.set_many(entries, replace=False)
+        return len(entries)
+
+    def warm_from_history(self, memory, limit: int = 10000) -> int:
+        """Load the newest `limit` expression results of a Memory's history; returns how many.
+
+        Only results of the current evaluator are loaded, keyed by its version like
+        Action keys them. Entries already in the cache are kept, so warming never overwrites newer results.
+        With a shared tier a history is loaded once per host: a marker entry records
+        it, and later processes skip the scan. Results computed after that go into
+        the cache as they are made, so nothing is missed.
+        """
+        from memory import CACHEABLE_EXPRESSION
+        from verification import EVALUATOR_VERSION
+        shared = [tier for tier in self.tiers if hasattr(tier, "newest")]
+        marker = make_key("warmed", os.path.abspath(memory.history_path))
+        if shared:
+            try:
+                if shared[0].get(marker, time.time()) is not MISS:
+                    return 0
+            except sqlite3.Error as e:
+                logger.error(f"Error reading result cache: {e}")
+                self._count("errors")
+        items, seen = [], set()
+        for record in memory.iter_calculation_history(reverse=True):
+            if len(items) >= limit:
+                break
+            expression, result = record.get("expression", ""), record.get("result")
+            if record.get("evaluator") != EVALUATOR_VERSION:
+                continue
+            if result is None or not CACHEABLE_EXPRESSION.fullmatch(expression):
+                continue
+            key = normalize_expression(expression)
+            if key not in seen:
+                seen.add(key)
+                items.append((key, result))
+        items.reverse()
+        self.set_many("expression", items, (EVALUATOR_VERSION,), replace=False)
+        if shared:
+            try:
+                shared[0].set_many([(marker, time.time(), None)])
+            except sqlite3.Error as e:
+                logger.error(f"Error writing result cache: {e}")
+                self._count("errors")
+        return len(items)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit and miss counters, plus each tier's size and evictions."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "tiers": [
+                {"name": tier.name, "size": len(tier), "max_size": tier.max_entries, "evictions": tier.evictions}
+                for tier in self.tiers
+            ]
+        }
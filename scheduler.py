@@ -0,0 +1,285 @@
+from typing import Any, Dict, Optional
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+# Queue wait times kept per key for the percentiles in the metrics
+WAIT_SAMPLES = 200
+
+# Per-key scheduling state is pruned of idle keys once it holds this many
+PRUNE_THRESHOLD = 1024
+
+# Keys whose counters and wait times are kept for the metrics; the least recently
+# active idle keys are forgotten beyond this
+MAX_TRACKED_KEYS = 1024
+
+class SchedulerRejected(Exception):
+    """A request the scheduler will not run; `status` is the HTTP status to answer with."""
+    status = 503
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RateLimited(SchedulerRejected):
+    status = 429
+
+class QueueFull(SchedulerRejected):
+    status = 429
+
+class QueueTimeout(SchedulerRejected):
+    status = 503
+
+def key_for(api_key: str) -> str:
+    """Scheduling key of an API key: a short hash, so keys never show up in metrics or logs."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+class TokenBucket:
+    """Allows `rate` requests per second on average and bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0 on success, else the seconds until they are available."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+class _Ticket:
+    def __init__(self, key: str, lane: str, finish: float, seq: int):
+        self.key = key
+        self.lane = lane
+        self.finish = finish
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.waited = 0.0
+        self.granted = threading.Event()
+        self.cancelled = False
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+class FairScheduler:
+    """Admits solves in a fair order when more arrive than may run at once.
+
+    Work is keyed by API key hash. Within a lane, keys share the slots by
+    weighted fair queuing (self-clocked: each request's finish tag is its key's
+    previous tag, or the lane's virtual time when later, plus 1/weight), so a
+    key with 500 queued requests waits its turn behind nobody but itself.
+    Interactive requests always go first, and `reserved_interactive` slots are
+    never given to batch work, because a running solve cannot be preempted.
+    Each key is also rate-limited by a token bucket before it is queued.
+    """
+
+    def __init__(self, max_concurrent: int = 16, reserved_interactive: int = 2, rate: Optional[float] = 5.0,
+                 burst: float = 30.0, max_queued_per_key: int = 100, max_wait: float = 60.0,
+                 weights: Optional[Dict[str, float]] = None):
+        """
+        max_concurrent: solves running at once.
+        reserved_interactive: slots batch work may not use.
+        rate / burst: token bucket per key; rate None disables rate limiting.
+        max_queued_per_key: waiting requests per key before new ones are rejected.
+        max_wait: seconds a request may wait for a slot.
+        weights: key -> share of its lane relative to the default of 1.
+        """
+        self.max_concurrent = max_concurrent
+        self.reserved_interactive = min(reserved_interactive, max_concurrent - 1)
+        self.rate = rate
+        self.burst = burst
+        self.max_queued_per_key = max_queued_per_key
+        self.max_wait = max_wait
+        self.weights = weights or {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._queues = {lane: [] for lane in LANES}
+        self._virtual_time = {lane: 0.0 for lane in LANES}
+        self._last_finish = {lane: {} for lane in LANES}
+        self._running = {lane: 0 for lane in LANES}
+        self._buckets = {}
+        # key -> counters and recent waits, least recently active first
+        self._keys = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "FairScheduler":
+        """Settings from SOLVE_CONCURRENCY, SCHEDULER_RATE (0 disables), SCHEDULER_BURST, ..."""
+        weights = {}
+        for item in os.environ.get("SCHEDULER_WEIGHTS", "").split(","):
+            if ":" in item:
+                key, weight = item.split(":", 1)
+                weights[key.strip()] = float(weight)
+        rate = float(os.environ.get("SCHEDULER_RATE", "5"))
+        return cls(
+            max_concurrent=int(os.environ.get("SOLVE_CONCURRENCY", "16")),
+            reserved_interactive=int(os.environ.get("SCHEDULER_RESERVED_INTERACTIVE", "2")),
+            rate=rate or None,
+            burst=float(os.environ.get("SCHEDULER_BURST", "30")),
+            max_queued_per_key=int(os.environ.get("SCHEDULER_MAX_QUEUED_PER_KEY", "100")),
+            max_wait=float(os.environ.get("SCHEDULER_MAX_WAIT_S", "60")),
+            weights=weights
+        )
+
+    def _prune(self):
+        """Forget state that no longer changes anything: full buckets and finish tags already passed."""
+        if len(self._buckets) > PRUNE_THRESHOLD:
+            now = time.monotonic()
+            self._buckets = {
+                key: bucket for key, bucket in self._buckets.items()
+                if bucket.tokens + (now - bucket.updated) * bucket.rate < bucket.burst
+            }
+        for lane in LANES:
+            if len(self._last_finish[lane]) > PRUNE_THRESHOLD:
+                self._last_finish[lane] = {
+                    key: finish for key, finish in self._last_finish[lane].items()
+                    if finish > self._virtual_time[lane]
+                }
+
+    def _key_stats(self, key: str) -> Dict[str, Any]:
+        """A key's counters, marking it as the most recently active. Needs the lock."""
+        stats = self._keys.get(key)
+        if stats is None:
+            self._evict_keys()
+            stats = self._keys[key] = {
+                "queued": 0, "running": 0, "completed": 0, "rate_limited": 0, "rejected": 0,
+                "waits": deque(maxlen=WAIT_SAMPLES)
+            }
+        else:
+            self._keys.move_to_end(key)
+        return stats
+
+    def _evict_keys(self):
+        """Make room for a new key by forgetting the least recently active idle ones beyond MAX_TRACKED_KEYS."""
+        excess = len(self._keys) + 1 - MAX_TRACKED_KEYS
+        if excess <= 0:
+            return
+        idle = [key for key, stats in self._keys.items() if not stats["queued"] and not stats["running"]]
+        for key in idle[:excess]:
+            del self._keys[key]
+
+    def _can_start(self, lane: str) -> bool:
+        running = sum(self._running.values())
+        if running >= self.max_concurrent:
+            return False
+        if lane == BATCH:
+            return self._running[BATCH] < self.max_concurrent - self.reserved_interactive
+        return True
+
+    def _next_ticket(self, lane: str) -> Optional[_Ticket]:
+        queue = self._queues[lane]
+        while queue and queue[0].cancelled:
+            heapq.heappop(queue)
+        return queue[0] if queue else None
+
+    def _dispatch(self):
+        """Start waiting tickets while slots are free, interactive lane first. Needs the lock."""
+        for lane in LANES:
+            while self._can_start(lane):
+                ticket = self._next_ticket(lane)
+                if ticket is None:
+                    break
+                heapq.heappop(self._queues[lane])
+                self._virtual_time[lane] = ticket.finish
+                self._running[lane] += 1
+                stats = self._key_stats(ticket.key)
+                stats["queued"] -= 1
+                stats["running"] += 1
+                ticket.waited = time.monotonic() - ticket.enqueued
+                stats["waits"].append(ticket.waited)
+                ticket.granted.set()
+
+    def acquire(self, key: str, lane: str = INTERACTIVE) -> _Ticket:
+        """Wait for a slot for one solve of `key`; raises SchedulerRejected when it will not get one."""
+        if lane not in LANES:
+            raise ValueError(f"lane must be one of {', '.join(LANES)}")
+        with self._lock:
+            self._prune()
+            stats = self._key_stats(key)
+            if self.rate is not None:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                retry_after = bucket.take()
+                if retry_after:
+                    stats["rate_limited"] += 1
+                    raise RateLimited("Rate limit exceeded for this API key", retry_after)
+            if stats["queued"] >= self.max_queued_per_key:
+                stats["rejected"] += 1
+                raise QueueFull("Too many queued requests for this API key", retry_after=1.0)
+
+            weight = self.weights.get(key, 1.0)
+            start = max(self._virtual_time[lane], self._last_finish[lane].get(key, 0.0))
+            ticket = _Ticket(key, lane, start + 1.0 / weight, next(self._seq))
+            self._last_finish[lane][key] = ticket.finish
+            heapq.heappush(self._queues[lane], ticket)
+            stats["queued"] += 1
+            self._dispatch()
+
+        if ticket.granted.wait(self.max_wait):
+            return ticket
+        with self._lock:
+            if ticket.granted.is_set():
+                # Granted just as the wait ran out
+                return ticket
+            ticket.cancelled = True
+            stats["queued"] -= 1
+            stats["rejected"] += 1
+        raise QueueTimeout("Timed out waiting for a free slot", retry_after=1.0)
+
+    def release(self, ticket: _Ticket):
+        with self._lock:
+            self._running[ticket.lane] -= 1
+            stats = self._key_stats(ticket.key)
+            stats["running"] -= 1
+            stats["completed"] += 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, key: str, lane: str = INTERACTIVE):
+        """Hold a slot for the duration of one solve."""
+        ticket = self.acquire(key, lane)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-lane and per-key queue state, with wait percentiles in milliseconds."""
+        with self._lock:
+            keys = {}
+            for key, stats in self._keys.items():
+                waits = sorted(stats["waits"])
+                keys[key] = {
+                    **{name: value for name, value in stats.items() if name != "waits"},
+                    "wait_ms": {
+                        "p50": waits[len(waits) // 2] * 1000 if waits else None,
+                        "p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else None
+                    }
+                }
+            return {
+                "max_concurrent": self.max_concurrent,
+                "lanes": {
+                    lane: {
+                        "running": self._running[lane],
+                        "queued": sum(not ticket.cancelled for ticket in self._queues[lane])
+                    }
+                    for lane in LANES
+                },
+                "keys": keys
+            }
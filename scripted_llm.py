@@ -0,0 +1,83 @@
+from typing import Optional
+import json
+import os
+import re
+import time
+
+# Where the problem sits in the agent prompt, and the tool results fed back to the model
+PROBLEM_PATTERN = re.compile(r"Solve this problem step by step: (.*?)(?:\nUser:|\nAssistant:|$)", re.S)
+RESULT_PATTERN = re.compile(r"\nUser: Result is (.*?)\. Let's verify this step\.")
+
+class ScriptedResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+# Scripts a ScriptedModels can play; see generate_content
+SCRIPTS = ("sequential", "batched")
+
+class ScriptedModels:
+    """Stands in for `genai.Client().models`, answering from a fixed script."""
+
+    def __init__(self, latency: float = 0.0, script: str = "sequential"):
+        if script not in SCRIPTS:
+            raise ValueError(f"script must be one of {', '.join(SCRIPTS)}")
+        self.latency = latency
+        self.script = script
+
+    def generate_content(self, model: str, contents: str) -> ScriptedResponse:
+        """Play the next turn of the script.
+
+        "sequential" is show_reasoning -> calculate -> verify -> final answer, one
+        call per turn. "batched" sends show_reasoning and calculate_and_verify in
+        one turn, with the value the problem evaluates to as the expected result,
+        then answers. The turn is read off the prompt itself, which grows by one
+        user message per turn, so concurrent conversations need no state here.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        match = PROBLEM_PATTERN.search(contents)
+        problem = match.group(1).strip() if match else ""
+        turn = contents.count("\nUser: ")
+        if self.script == "batched":
+            return self._batched_turn(problem, turn)
+        results = RESULT_PATTERN.findall(contents)
+
+        if turn == 0:
+            call = {"name": "show_reasoning", "args": {"steps": [f"Arithmetic: evaluate {problem}"]}}
+        elif turn == 1:
+            call = {"name": "calculate", "args": {"expression": problem}}
+        elif turn == 2 and results:
+            call = {"name": "verify", "args": {"expression": problem, "expected": float(results[-1])}}
+        else:
+            return ScriptedResponse(f"FINAL_ANSWER: [{results[-1] if results else 'unknown'}]")
+        return ScriptedResponse(f"FUNCTION_CALL: {json.dumps(call)}")
+
+    @staticmethod
+    def _batched_turn(problem: str, turn: int) -> ScriptedResponse:
+        from verification import evaluate_expression
+        try:
+            expected = evaluate_expression(problem)
+        except Exception:
+            expected = None
+        if turn > 0 or expected is None:
+            return ScriptedResponse(f"FINAL_ANSWER: [{'unknown' if expected is None else expected}]")
+        calls = [
+            {"name": "show_reasoning", "args": {"steps": [f"Arithmetic: evaluate {problem}"]}},
+            {"name": "calculate_and_verify", "args": {"expression": problem, "expected": float(expected)}}
+        ]
+        return ScriptedResponse("\n".join(f"FUNCTION_CALL: {json.dumps(call)}" for call in calls))
+
+class ScriptedClient:
+    """Local, deterministic replacement for `genai.Client` for load tests and benchmarks.
+
+    The simulated model latency per call comes from SCRIPTED_LLM_LATENCY (seconds),
+    and the script from SCRIPTED_LLM_SCRIPT (default "sequential").
+    """
+
+    def __init__(self, api_key: Optional[str] = None, latency: Optional[float] = None,
+                 script: Optional[str] = None):
+        if latency is None:
+            latency = float(os.environ.get("SCRIPTED_LLM_LATENCY", "0"))
+        if script is None:
+            script = os.environ.get("SCRIPTED_LLM_SCRIPT", "sequential")
+        self.models = ScriptedModels(latency, script)
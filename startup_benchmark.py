@@ -0,0 +1,170 @@
+# startup_benchmark.py
+#
+# Measures how quickly the math tool server becomes useful:
+#   python startup_benchmark.py                  # import report + spawn-to-first-result timing
+#   python startup_benchmark.py --max-ms 1500    # exit non-zero when the median is slower
+#   python startup_benchmark.py --json startup.json
+#   python startup_benchmark.py --shared-url http://127.0.0.1:8765/sse   # vs. a shared server
+
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "math_tools.py")
+
+def import_time_report(module: str = "math_tools", top: int = 15) -> Dict[str, Any]:
+    """Import a module in a fresh interpreter under `-X importtime`.
+
+    Returns the total import time and the slowest imports by cumulative time,
+    in microseconds.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(SERVER_SCRIPT),
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr}")
+
+    imports = []
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us)
+        })
+
+    total = next(item["cumulative_us"] for item in imports if item["module"] == module and item["depth"] == 0)
+    slowest = sorted(imports, key=lambda item: item["cumulative_us"], reverse=True)[:top]
+    return {"module": module, "total_us": total, "slowest": slowest}
+
+def _spawn_server(errlog):
+    from mcp import StdioServerParameters
+    from mcp.client.stdio import stdio_client
+    return stdio_client(StdioServerParameters(
+        command=sys.executable,
+        args=[SERVER_SCRIPT],
+        cwd=os.path.dirname(SERVER_SCRIPT),
+        env=dict(os.environ)
+    ), errlog=errlog)
+
+async def time_first_tool_result(url: Optional[str] = None) -> float:
+    """Seconds from opening a session to the result of its first tool call.
+
+    Spawns a stdio server unless `url` points at a shared one (`math_tools.py sse`).
+    """
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as errlog:
+        async with (sse_client(url) if url else _spawn_server(errlog)) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                await session.call_tool("calculate", arguments={"expression": "2+3"})
+                return time.perf_counter() - start
+
+def measure_startup(runs: int = 5, timeout: float = 60.0) -> List[float]:
+    """Spawn-to-first-result latencies, in milliseconds, over several cold starts."""
+    return [asyncio.run(asyncio.wait_for(time_first_tool_result(), timeout)) * 1000 for _ in range(runs)]
+
+async def _session_throughput(url: Optional[str], sessions: int, concurrency: int) -> Dict[str, float]:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one_session():
+        async with limit:
+            return await time_first_tool_result(url)
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one_session() for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    return {
+        "sessions_per_s": sessions / elapsed,
+        "median_ms": statistics.median(latencies) * 1000
+    }
+
+def compare_transports(url: str, sessions: int = 20, concurrency: int = 4) -> Dict[str, Dict[str, float]]:
+    """Session throughput of spawning a stdio server per session vs. connecting to a shared one."""
+    return {
+        "stdio_spawn": asyncio.run(_session_throughput(None, sessions, concurrency)),
+        "shared": asyncio.run(_session_throughput(url, sessions, concurrency))
+    }
+
+def print_report(report: Dict[str, Any], latencies: List[float]):
+    table = Table(title=f"Slowest imports of {report['module']}", header_style="bold cyan")
+    table.add_column("Module", style="blue")
+    table.add_column("Self (ms)", justify="right")
+    table.add_column("Cumulative (ms)", justify="right", style="yellow")
+    for item in report["slowest"]:
+        table.add_row("  " * item["depth"] + item["module"],
+                      f"{item['self_us'] / 1000:.1f}", f"{item['cumulative_us'] / 1000:.1f}")
+    console.print(table)
+    console.print(f"[bold]Import time:[/bold] {report['total_us'] / 1000:.1f} ms")
+    console.print(
+        f"[bold]Spawn to first tool result:[/bold] median {statistics.median(latencies):.1f} ms, "
+        f"min {min(latencies):.1f} ms, max {max(latencies):.1f} ms over {len(latencies)} runs"
+    )
+
+def print_comparison(comparison: Dict[str, Dict[str, float]], sessions: int, concurrency: int):
+    table = Table(title=f"{sessions} sessions, {concurrency} at a time", header_style="bold cyan")
+    table.add_column("Transport", style="blue")
+    table.add_column("Sessions/s", justify="right", style="green")
+    table.add_column("Median session (ms)", justify="right")
+    for transport, result in comparison.items():
+        table.add_row(transport, f"{result['sessions_per_s']:.1f}", f"{result['median_ms']:.1f}")
+    console.print(table)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Startup profile of the math tool server.")
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--max-ms", type=float, help="fail when the median spawn-to-first-result exceeds this")
+    parser.add_argument("--json", metavar="PATH", help="also write the results to a JSON file")
+    parser.add_argument("--shared-url", metavar="URL",
+                        help="also compare session throughput against a shared server, e.g. http://127.0.0.1:8765/sse")
+    parser.add_argument("--sessions", type=int, default=20, help="sessions per transport in the comparison")
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions open at once in the comparison")
+    args = parser.parse_args(argv)
+
+    report = import_time_report(top=args.top)
+    latencies = measure_startup(args.runs)
+    print_report(report, latencies)
+
+    comparison = None
+    if args.shared_url:
+        comparison = compare_transports(args.shared_url, args.sessions, args.concurrency)
+        print_comparison(comparison, args.sessions, args.concurrency)
+
+    median = statistics.median(latencies)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "import_ms": report["total_us"] / 1000,
+                "first_result_ms": {"median": median, "min": min(latencies), "max": max(latencies)},
+                "slowest_imports": report["slowest"],
+                "transports": comparison
+            }, f, indent=2)
+
+    if args.max_ms is not None and median > args.max_ms:
+        console.print(f"[red]✗ Startup regression: {median:.1f} ms > {args.max_ms:.1f} ms[/red]")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Run each test in its own directory, since Memory and Perceive write files to the working directory."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,47 @@
+import pytest
+from action import Action
+from memory import Memory
+from perceive import Perceive
+from verification import evaluate_expression
+
+@pytest.fixture
+def action(workdir):
+    return Action(Memory(str(workdir / "memory.json")), Perceive(), sink=None)
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').getcwd()",
+    "().__class__.__bases__",
+    "math.__dict__",
+    "open('x', 'w')",
+    "[x for x in (1, 2)]",
+])
+def test_calculate_refuses_code(action, expression):
+    assert action.calculate(expression).text.startswith("Error: Unsupported character")
+
+def test_verify_refuses_code(action):
+    assert action.verify("__import__('os').getcwd()", 0).text.startswith("Error")
+
+def test_caret_is_power(action):
+    assert action.calculate("2^3").text == "8"
+    assert action.verify("2^3", 8).text == "True"
+
+@pytest.mark.parametrize("expression, expected", [
+    ("2 ** 10", 1024),
+    ("(1 + 2) * 3 / 4", 2.25),
+    ("math.sqrt(16) + 1", 5.0),
+    ("1e3 * 2", 2000.0),
+    ("7 % 4", 3),
+])
+def test_arithmetic_still_evaluates(expression, expected):
+    assert evaluate_expression(expression) == expected
+
+def test_cached_result_is_not_added_to_history(action):
+    action.calculate("6 * 7")
+    action.calculate("6*7")
+    assert [record["expression"] for record in action.memory.iter_calculation_history()] == ["6 * 7"]
+
+def test_old_history_is_recomputed(workdir):
+    with open(str(workdir / "memory_history.jsonl"), "w") as f:
+        f.write('{"timestamp": 0.0, "expression": "20 / 4", "result": 5, "steps": []}\n')
+    action = Action(Memory(str(workdir / "memory.json")), Perceive(), sink=None)
+    assert action.calculate("20 / 4").text == "5.0"
@@ -0,0 +1,51 @@
+from budget import AgentBudget, BudgetTracker
+
+def tracker_with(*verified):
+    tracker = BudgetTracker(AgentBudget())
+    tracker.record_results([(expression, value, True) for expression, value in verified])
+    return tracker
+
+def test_final_answer_after_calls_ends_the_run():
+    tracker = tracker_with(("12 - 5", 7.0))
+    text = 'FUNCTION_CALL: {"name": "verify", "args": {"expression": "12 - 5", "expected": 7}}\nFINAL_ANSWER: [7]'
+    assert tracker.verified_final_answer(text) == "7"
+
+def test_final_answer_after_remarks_ends_the_run():
+    assert tracker_with(("2 * 3", 6.0)).verified_final_answer("All checks pass.\nFINAL_ANSWER: [6]") == "6"
+
+def test_recheck_turn_does_not_end_the_run():
+    tracker = tracker_with(("12 - 5", 7.0))
+    assert tracker.verified_final_answer('FUNCTION_CALL: {"name": "verify", "args": '
+                                         '{"expression": "12 - 5", "expected": 7}}') is None
+
+def test_mentioning_a_verified_value_does_not_end_the_run():
+    tracker = tracker_with(("12 - 5", 7.0))
+    assert tracker.verified_final_answer("So 7 apples are left, but 7 still has to be checked against the total.") is None
+
+def test_unverified_final_answer_is_not_taken():
+    tracker = tracker_with(("12 - 5", 7.0))
+    assert tracker.verified_final_answer("Checked.\nFINAL_ANSWER: [8]") is None
+    assert BudgetTracker(AgentBudget()).verified_final_answer("Checked.\nFINAL_ANSWER: [7]") is None
+
+def test_stating_the_last_verified_value_as_the_answer_ends_the_run():
+    tracker = tracker_with(("12 - 5", 7.0))
+    assert tracker.verified_final_answer("All checks pass, so the answer is 7.") == "7"
+    assert tracker.verified_final_answer("The answer is **7**") == "7"
+    assert tracker.verified_final_answer("Final answer: 7") == "7"
+
+def test_a_trailing_verified_value_without_an_answer_does_not_end_the_run():
+    tracker = tracker_with(("12 - 5", 7.0))
+    assert tracker.verified_final_answer("All checks pass, so the number of apples left is 7.") is None
+
+def test_wording_about_more_steps_does_not_end_the_run():
+    tracker = tracker_with(("1 + 2", 3.0))
+    assert tracker.verified_final_answer("Next, multiply the result by 3") is None
+    assert tracker.verified_final_answer("We will use this result in step 3.") is None
+    assert tracker.verified_final_answer("The answer is 3, but next we still need to add the tax: 3") is None
+    assert tracker.verified_final_answer("Before the answer is 3, check the total. The answer is 3") is None
+
+def test_restating_an_older_or_unverified_value_does_not_end_the_run():
+    tracker = tracker_with(("12 - 5", 7.0), ("7 * 2", 14.0))
+    assert tracker.verified_final_answer("Earlier we found 7.") is None
+    assert tracker.verified_final_answer("So the answer should be 15.") is None
+    assert BudgetTracker(AgentBudget()).verified_final_answer("The answer is 7.") is None
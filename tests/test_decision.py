@@ -0,0 +1,70 @@
+import pytest
+from action import Action
+from decision import Decision
+from expression_parser import Node
+from memory import Memory
+from perceive import Perceive
+from verification import evaluate_expression
+
+STEPS = ["12 - 5 = 7", "7 * 3 = 21", "21 / 0.001 = 21000", "21000 + 7 = 21008", "2 ** 10 = 1000", "bad step"]
+
+def full_check(workdir, steps):
+    report = Decision(Memory(str(workdir / "fresh.json"))).check_consistency(steps)
+    del report["rechecked_steps"]
+    return report
+
+@pytest.fixture
+def decision(workdir):
+    return Decision(Memory(str(workdir / "memory.json")))
+
+@pytest.mark.parametrize("edits", [
+    [STEPS[:2], STEPS[:4], STEPS],
+    [STEPS, STEPS[:3] + ["21 / 3 = 7"] + STEPS[4:]],
+    [STEPS, ["12 - 4 = 8"] + STEPS[1:]],
+    [STEPS, STEPS[:2]],
+    [STEPS[:3], STEPS[:3], STEPS[3:]],
+])
+def test_incremental_check_matches_a_full_recheck(decision, workdir, edits):
+    for steps in edits:
+        report = decision.check_consistency(steps)
+        del report["rechecked_steps"]
+        assert report == full_check(workdir, steps)
+
+def test_only_changed_steps_are_rechecked(decision):
+    assert decision.check_consistency(STEPS[:4])["rechecked_steps"] == 4
+    assert decision.check_consistency(STEPS)["rechecked_steps"] == 2
+    assert decision.check_consistency(STEPS[:1] + ["7 * 3 = 22"] + STEPS[2:])["rechecked_steps"] == 5
+    assert decision.check_consistency(STEPS[:1] + ["7 * 3 = 22"] + STEPS[2:])["rechecked_steps"] == 0
+
+def test_dependencies_follow_earlier_results(decision):
+    report = decision.check_consistency(STEPS[:4])
+    assert report["dependencies"] == [(1, 2), (2, 3), (1, 4), (3, 4)]
+    assert [step["status"] for step in decision.check_consistency(STEPS)["steps"]][4:] == ["error", "invalid"]
+
+def number(value):
+    return Node('number', (value,))
+
+@pytest.mark.parametrize("expression, operation, args", [
+    ("3*4+1", 'add', [Node('multiply', (number(3), number(4))), 1]),
+    ("2 - -3", 'subtract', [2, -3]),
+    ("(2 + 3) * 4", 'multiply', [Node('add', (number(2), number(3))), 4]),
+    ("sqrt(16)", 'sqrt', [16]),
+    ("5!", 'factorial', [5]),
+    ("7", 'calculate', ["7"]),
+    ("abs(-3)", 'calculate', ["abs(-3)"]),
+])
+def test_decide_operation_routes_on_the_parse_tree(decision, expression, operation, args):
+    assert decision.decide_operation(expression) == (operation, args)
+
+@pytest.mark.parametrize("expression", [
+    "3*4+1", "2 - -3", "10 - 2 - 3", "(2 + 3) * 4", "7 / 2", "-7 % 3", "2 ** 10", "2 ** -1", "-2 ** 2",
+    "1.5e3 * 2", "math.sqrt(16)", "math.sin(0) + math.cos(0)", "math.log(100)",
+])
+def test_execute_operation_matches_eval(decision, expression):
+    action = Action(decision.memory, Perceive(), sink=None)
+    assert decision.execute_operation(expression, action) == evaluate_expression(expression)
+
+def test_execute_operation_reads_caret_and_bang_as_power_and_factorial(decision):
+    action = Action(decision.memory, Perceive(), sink=None)
+    assert decision.execute_operation("2 ^ 3", action) == 8
+    assert decision.execute_operation("4! + 1", action) == 25
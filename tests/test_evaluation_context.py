@@ -0,0 +1,75 @@
+import pytest
+from evaluation_context import EvaluationContext, current_context, using
+from verification import evaluate_expression
+
+EXPRESSIONS = [
+    "2 + 3 * 4", "(2 + 3) * 4", "8 - 3 - 2", "7 / 2", "8 / 4", "7 % 3", "-7 % 3", "7.5 % 2",
+    "2 ** 10", "2 ** -1", "2 ** 0.5", "2.0 * 3", "2 * 3.0", "3 * 2", "0.1 + 0.2", "0.2 + 0.1",
+    "-2 ** 2", "(-2) ** 2", "-0.0", "-(0.0)", "0 - 0.0", "-0.0 * 1", "1e308 * 10",
+    "math.sqrt(16)", "sqrt(2) * sqrt(2)", "math.log(100)", "sin(0)", "cos(0) + 1", "tan(1) * 2",
+    "2 ^ 3", "5!", "3! + 1", "007", "1_000 + 1", "abs(-3)", "round(2.5)",
+]
+
+def result(evaluate, expression):
+    try:
+        value = evaluate(expression)
+    except Exception as error:
+        return type(error)
+    return type(value), repr(value)
+
+@pytest.fixture
+def context():
+    return EvaluationContext()
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_matches_eval_on_first_sight(context, expression):
+    assert result(lambda e: context.evaluate(e, evaluate_expression), expression) == result(evaluate_expression, expression)
+
+def test_matches_eval_with_everything_memoized(context):
+    # Second and reversed passes are served from whole-expression, subtree and node memos
+    for expression in EXPRESSIONS + EXPRESSIONS[::-1]:
+        assert result(lambda e: context.evaluate(e, evaluate_expression), expression) == result(evaluate_expression, expression)
+    assert context.stats["expression_hits"] > 0 and context.stats["nodes_reused"] > 0
+
+def test_commutative_nodes_are_reused_but_not_across_types(context):
+    assert context.evaluate("3 * 4 + 1", evaluate_expression) == 13
+    assert context.evaluate("4 * 3 - 1", evaluate_expression) == 11
+    assert context.stats["nodes_reused"] == 1
+    assert repr(context.evaluate("4.0 * 3 - 1", evaluate_expression)) == "11.0"
+
+def test_mismatched_syntax_goes_to_the_fallback(context):
+    calls = []
+    def fallback(expression):
+        calls.append(expression)
+        return evaluate_expression(expression)
+    for expression in ["2 ^ 3", "5!", "007", "abs(-3)"]:
+        try:
+            context.evaluate(expression, fallback)
+        except Exception:
+            pass
+    assert calls == ["2 ^ 3", "5!", "007", "abs(-3)"]
+
+def test_without_folding_only_whole_expressions_are_reused(context):
+    calls = []
+    def fallback(expression):
+        calls.append(expression)
+        return evaluate_expression(expression)
+    assert context.evaluate("6 * 7", fallback, fold=False) == 42
+    assert context.evaluate("6 * 7", fallback, fold=False) == 42
+    assert context.evaluate("6 * 7 + 1", fallback, fold=False) == 43
+    assert calls == ["6 * 7", "6 * 7 + 1"] and context.stats["nodes_evaluated"] == 0
+
+def test_errors_are_not_memoized(context):
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            context.evaluate("1 / 0", evaluate_expression)
+    assert context.stats["expression_hits"] == 0
+
+def test_using_sets_and_restores_the_current_context(context):
+    assert current_context() is None
+    with using(context):
+        assert current_context() is context
+        with using(None):
+            assert current_context() is None
+        assert current_context() is context
+    assert current_context() is None
@@ -0,0 +1,58 @@
+import pytest
+from expression_parser import Node, ParseError, parse
+
+def number(value):
+    return Node('number', (value,))
+
+def op(name, *args):
+    return Node(name, args)
+
+@pytest.mark.parametrize("expression, tree", [
+    ("2 + 3 * 4", op('add', number(2), op('multiply', number(3), number(4)))),
+    ("(2 + 3) * 4", op('multiply', op('add', number(2), number(3)), number(4))),
+    ("8 - 3 - 2", op('subtract', op('subtract', number(8), number(3)), number(2))),
+    ("8 / 4 % 3", op('remainder', op('divide', number(8), number(4)), number(3))),
+    ("2 * 3 ** 2", op('multiply', number(2), op('power', number(3), number(2)))),
+])
+def test_precedence_and_left_associativity(expression, tree):
+    assert parse(expression) == tree
+
+@pytest.mark.parametrize("expression", ["2 ** 3 ** 2", "2 ^ 3 ^ 2", "2 ** 3 ^ 2"])
+def test_power_is_right_associative(expression):
+    assert parse(expression) == op('power', number(2), op('power', number(3), number(2)))
+
+@pytest.mark.parametrize("expression, tree", [
+    ("-2", number(-2)),
+    ("--2", number(2)),
+    ("+2", number(2)),
+    ("-2 ** 2", op('subtract', number(0), op('power', number(2), number(2)))),
+    ("2 ** -1", op('power', number(2), number(-1))),
+    ("-(1 + 2)", op('subtract', number(0), op('add', number(1), number(2)))),
+])
+def test_unary_minus(expression, tree):
+    assert parse(expression) == tree
+
+@pytest.mark.parametrize("expression, tree", [
+    ("5!", op('factorial', number(5))),
+    ("3!!", op('factorial', op('factorial', number(3)))),
+    ("2 * 3!", op('multiply', number(2), op('factorial', number(3)))),
+    ("(1 + 2)!", op('factorial', op('add', number(1), number(2)))),
+    ("2 ** 3!", op('power', number(2), op('factorial', number(3)))),
+])
+def test_postfix_factorial(expression, tree):
+    assert parse(expression) == tree
+
+@pytest.mark.parametrize("expression, tree", [
+    ("math.sqrt(16)", op('sqrt', number(16))),
+    ("sqrt(16) + 1", op('add', op('sqrt', number(16)), number(1))),
+    ("1.5e3 * 2", op('multiply', number(1500.0), number(2))),
+])
+def test_functions_and_numbers(expression, tree):
+    assert parse(expression) == tree
+
+@pytest.mark.parametrize("expression", [
+    "", "2 +", "(2 + 3", "2 + 3)", "2 3", "foo(2)", "math.exp(1)", "sqrt 4", "2 $ 3", "*2",
+])
+def test_unsupported_input_is_rejected(expression):
+    with pytest.raises(ParseError):
+        parse(expression)
@@ -0,0 +1,24 @@
+import json
+from memory import Memory
+from loadgen import DEFAULT_CORPUS, load_corpus, summarize
+
+def test_cached_answers_stay_out_of_solve_latencies():
+    records = [{"offset": 0.0, "latency": 6.0, "outcome": "ok"},
+               {"offset": 0.1, "latency": 0.016, "outcome": "cached"},
+               {"offset": 0.2, "latency": 0.016, "outcome": "cached"}]
+    summary = summarize(records, 1.0)
+    assert (summary["ok"], summary["cached"]) == (1, 2)
+    assert summary["latency_ms"]["p50"] == 6000.0
+    assert summary["throughput_rps"] == 3.0
+
+def test_the_seed_corpus_is_all_supported():
+    with open(DEFAULT_CORPUS) as f:
+        problems = json.load(f)
+    assert load_corpus(DEFAULT_CORPUS) == problems
+
+def test_corpus_from_a_memory_file(workdir):
+    memory = Memory(str(workdir / "memory.json"))
+    for expression in ["2 + 3", "foo(1)", "12 * 7", "2 + 3"]:
+        memory.add_calculation(expression, 0)
+    memory.close()
+    assert load_corpus(str(workdir / "memory.json")) == ["2 + 3", "12 * 7"]
@@ -0,0 +1,118 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import pytest
+from memory import Memory
+
+PROCESSES = 8
+WRITES = 25
+
+def _worker(path, worker):
+    memory = Memory(path, shared=True)
+    memory.add_error_pattern("ValueError", f"worker {worker}", "retry")
+    for i in range(WRITES):
+        expression = f"{worker} * 1000 + {i}"
+        assert memory.get_cached_result(expression) is None
+        memory.add_calculation(expression, worker * 1000 + i)
+        assert memory.get_cached_result(expression) == worker * 1000 + i
+    # Forked workers skip atexit handlers, so pending statistics are written here
+    memory.close()
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_shared_mode_keeps_every_write_and_lookup(workdir):
+    path = str(workdir / "memory.json")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_worker, args=(path, worker)) for worker in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    memory = Memory(path)
+    history = list(memory.iter_calculation_history())
+    assert len(history) == PROCESSES * WRITES
+    assert len(memory.error_patterns["ValueError"]) == PROCESSES
+    # Every lookup is on disk, including the hit after each worker's last write
+    stats = Memory(path, shared=True).get_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (PROCESSES * WRITES, PROCESSES * WRITES)
+
+def test_lookups_are_written_in_batches(workdir, monkeypatch):
+    monkeypatch.setattr("memory.STATS_FLUSH_EVERY", 3)
+    path = str(workdir / "memory.json")
+    memory = Memory(path)
+    memory.add_calculation("2 + 3", 5)
+    signature = memory._get_file_signature()
+    memory.get_cached_result("2 + 3")
+    memory.get_cached_result("2 + 4")
+    assert memory._get_file_signature() == signature
+    memory.get_cached_result("2 + 3")
+    with open(path) as f:
+        assert json.load(f)["cache_stats"]["hits"] == 2
+    memory.get_cached_result("2 + 3")
+    memory.close()
+    assert Memory(path).cache_stats["hits"] == 3
+
+def test_shared_lookups_go_to_the_journal(workdir, monkeypatch):
+    monkeypatch.setattr("memory.STATS_FLUSH_EVERY", 2)
+    path = str(workdir / "memory.json")
+    first, second = Memory(path, shared=True), Memory(path, shared=True)
+    first.set_user_preference("units", "metric")
+    signature = first._get_file_signature()
+    first.get_cached_result("2 + 3")
+    second.get_cached_result("2 + 3")
+    second.get_cached_result("2 + 4")
+    first.get_cached_result("2 + 5")
+    assert first._get_file_signature() == signature
+    assert first.get_cache_stats()["misses"] == 4
+    # Saving the snapshot folds the journal in
+    second.set_user_preference("units", "imperial")
+    with open(path) as f:
+        assert json.load(f)["cache_stats"]["misses"] == 4
+    assert Memory(path, shared=True).get_cache_stats()["misses"] == 4
+
+def test_whitespace_variants_share_a_result(workdir):
+    memory = Memory(str(workdir / "memory.json"))
+    memory.add_calculation("2 + 3", 5)
+    assert memory.get_cached_result("2+3") == 5
+
+@pytest.mark.parametrize("first, second", [("1 0", "10"), ("1 0 + 2", "10 + 2"), ("2 3 * 4", "23 * 4")])
+def test_separate_numbers_do_not_share_a_result(workdir, first, second):
+    memory = Memory(str(workdir / "memory.json"))
+    memory.add_calculation(second, 12)
+    assert memory.get_cached_result(first) is None
+
+@pytest.mark.parametrize("expression", ["2+3", " 2 +  3 ", "2\t+\n3"])
+def test_spacing_around_operators_is_ignored(workdir, expression):
+    memory = Memory(str(workdir / "memory.json"))
+    memory.add_calculation("2 + 3", 5)
+    assert memory.get_cached_result(expression) == 5
+
+def test_results_of_an_older_evaluator_are_not_served(workdir):
+    path = str(workdir / "memory.json")
+    with open(str(workdir / "memory_history.jsonl"), "w") as f:
+        f.write(json.dumps({"timestamp": 0.0, "expression": "20 / 4", "result": 5, "steps": []}) + "\n")
+        f.write(json.dumps({"timestamp": 0.0, "expression": "2 ^ 3", "result": 1, "steps": [], "evaluator": 1}) + "\n")
+    memory = Memory(path)
+    assert memory.get_cached_result("20 / 4") is None
+    assert memory.get_cached_result("2 ^ 3") is None
+    assert len(list(memory.iter_calculation_history())) == 2
+
+def test_load_errors_stay_off_stdout(workdir, capsys, caplog):
+    (workdir / "memory.json").write_text("{not json")
+    Memory(str(workdir / "memory.json"))
+    assert capsys.readouterr().out == ""
+    assert "Error loading memory" in caplog.text
+
+def test_tool_server_import_keeps_stdout_clean(workdir):
+    # Over stdio, anything on stdout before the first message corrupts the protocol stream
+    (workdir / "agent_memory.json").write_text("{not json")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": root}
+    run = subprocess.run([sys.executable, "-c", "import math_tools"], cwd=workdir, env=env,
+                         capture_output=True, text=True, timeout=60)
+    assert run.returncode == 0, run.stderr
+    assert run.stdout == ""
+    assert "Error loading memory" in run.stderr
@@ -0,0 +1,62 @@
+import io
+import pytest
+from rich.console import Console
+from action import Action
+from memory import Memory
+from output import CHECK_LABELS, CallbackSink, ConsoleSink
+from perceive import Perceive
+
+def make_action(workdir, sink):
+    return Action(Memory(str(workdir / "memory.json")), Perceive(), sink=sink)
+
+def recording_console():
+    return Console(file=io.StringIO(), width=200, color_system=None)
+
+def test_callback_sink_gets_events_as_data(workdir):
+    events = []
+    action = make_action(workdir, CallbackSink(events.append))
+    action.calculate("6 * 7")
+    action.calculate("6 * 7")
+    action.verify("6 * 7", 42)
+    assert events == [
+        {"event": "call", "name": "calculate", "args": {"expression": "6 * 7"}, "result": 42, "cached": False},
+        {"event": "call", "name": "calculate", "args": {"expression": "6 * 7"}, "result": 42, "cached": True},
+        {"event": "call", "name": "verify", "args": {"expression": "6 * 7", "expected": 42}},
+        {"event": "verification", "expression": "6 * 7", "expected": 42, "actual": 42.0, "correct": True},
+    ]
+
+def test_callback_sink_gets_errors(workdir):
+    events = []
+    make_action(workdir, CallbackSink(events.append)).calculate("1 / 0")
+    assert events[-1]["name"] == "calculate" and "division by zero" in events[-1]["error"]
+
+def test_without_a_sink_nothing_is_emitted(workdir, capsys):
+    action = make_action(workdir, None)
+    assert action.calculate("6 * 7").text == "42"
+    assert action.check_consistency(["6 * 7 = 42"]).text.startswith("Consistency check completed")
+    assert capsys.readouterr().out == ""
+
+def test_console_sink_renders_calls_and_verifications():
+    console = recording_console()
+    sink = ConsoleSink(console)
+    sink.emit("call", name="calculate", args={"expression": "6 * 7"}, result=42, cached=True)
+    sink.emit("verification", expression="6 * 7", expected=41, actual=42.0, correct=False)
+    text = console.file.getvalue()
+    assert "FUNCTION CALL: calculate()" in text
+    assert "Cache hit" in text and "Result: 42" in text
+    assert "Incorrect! 6 * 7 should be 42.0, got 41" in text
+
+@pytest.mark.parametrize("render_reports, rendered", [(True, True), (False, False), (None, False)])
+def test_console_sink_renders_consistency_reports_only_when_asked(workdir, render_reports, rendered):
+    # A console writing to a buffer is not a terminal, so None means no rendering
+    console = recording_console()
+    action = make_action(workdir, ConsoleSink(console, render_reports=render_reports))
+    action.check_consistency(["12 - 5 = 7", "7 * 3 = 22"])
+    text = console.file.getvalue()
+    assert ("Consistency Analysis Report" in text) == rendered
+    assert ("Calculation error" in text) == rendered
+
+def test_every_check_code_has_a_label(workdir):
+    decision = make_action(workdir, None).decision
+    report = decision.check_consistency(["12 - 5 = 7", "7 * 3 = 22", "1 / 0 = 1", "22 * 100000 = 2200000"])
+    assert all(check in CHECK_LABELS for step in report["steps"] for check in step["checks"])
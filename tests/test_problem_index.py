@@ -0,0 +1,73 @@
+import pytest
+from perceive import Perceive
+from problem_index import ProblemIndex
+
+SOLVED = "Sam has 12 apples and eats 5 of them. How many apples are left?"
+BAGS = "Sam has {} bags of {} apples and gives away half of them. How many apples does Sam keep?"
+
+@pytest.fixture
+def index(workdir):
+    index = ProblemIndex(str(workdir / "problems.jsonl"), Perceive())
+    assert index.add("Sam has 9 apples and eats 3 of them. How many apples are left?", [("9 - 3", 6)], "6")
+    assert index.add(SOLVED, [("12 - 5", 7)], "7")
+    return index
+
+@pytest.mark.parametrize("problem, answer", [
+    ("Sam has 20 apples and eats 4 of them. How many apples are left?", "16"),
+    ("sam has 1,200 apples and eats 300 of them.  How many apples are left", "900"),
+])
+def test_same_problem_with_other_numbers_matches(index, problem, answer):
+    assert index.match(problem)["final_answer"] == answer
+
+@pytest.mark.parametrize("problem", [
+    "Sam has 20 apples and buys 4 apples. How many apples does Sam have now?",
+    "Sam has 20 apples and gets 4 of them. How many apples are left?",
+    "Sam has 20 apples and 4 apples. How many apples are there in total?",
+    "Sam has 20 apples and eats 4 of them. How many apples did Sam eat?",
+    "Sam has 20 pears and eats 4 of them. How many pears are left?",
+    "Sam has 20 apples and never eats 4 of them. How many apples are left?",
+    "Sam has 20 apples and eats 4 of them. How many apples are left in the bag?",
+])
+def test_near_duplicates_do_not_match(index, problem):
+    assert index.match(problem) is None
+
+@pytest.mark.parametrize("problem, answer", [
+    ("Tom has 20 apples and eats 4 of them. How many apples are left?", "16"),
+    ("Sam has 20 apples, and then Sam eats 4 of them. How many apples are left?", "16"),
+])
+def test_reworded_problem_matches(index, problem, answer):
+    match = index.match(problem)
+    assert match["final_answer"] == answer
+    assert match["source"] == SOLVED
+
+def test_a_chain_is_served_only_once_another_solve_confirms_it(workdir):
+    index = ProblemIndex(str(workdir / "problems.jsonl"), Perceive())
+    index.add(SOLVED, [("12 - 5", 7)], "7")
+    problem = "Sam has 20 apples and eats 4 of them. How many apples are left?"
+    assert index.match(problem) is None
+    # The same numbers again, or another number in one role, prove nothing about the roles
+    index.add(SOLVED, [("12 - 5", 7)], "7")
+    index.add("Sam has 12 apples and eats 3 of them. How many apples are left?", [("12 - 3", 9)], "9")
+    assert index.match(problem) is None
+    index.add("Sam has 9 apples and eats 3 of them. How many apples are left?", [("9 - 3", 6)], "6")
+    assert index.match(problem)["final_answer"] == "16"
+
+def test_a_constant_that_equals_a_problem_number_is_not_replayed(workdir):
+    index = ProblemIndex(str(workdir / "problems.jsonl"), Perceive())
+    # The 2 of "half" compiles to {n0} here, and to a plain 2 in the other solves
+    assert index.add(BAGS.format(2, 10), [("2 * 10", 20), ("20 / 2", 10)], "10")
+    assert index.match(BAGS.format(3, 10)) is None
+    assert index.add(BAGS.format(3, 10), [("3 * 10", 30), ("30 / 2", 15)], "15")
+    assert index.match(BAGS.format(5, 8)) is None
+    assert index.add(BAGS.format(4, 6), [("4 * 6", 24), ("24 / 2", 12)], "12")
+    assert index.match(BAGS.format(2, 10))["final_answer"] == "10"
+    assert index.match(BAGS.format(5, 8))["final_answer"] == "20"
+
+def test_exact_match_is_found_among_many_near_duplicates(index, workdir):
+    for name in ["Ann", "Bob", "Cid", "Dee", "Eve", "Fay", "Gus", "Hal"]:
+        assert index.add(f"{name} has 12 apples and eats 5 of them. How many apples are left?", [("12 - 5", 7)], "7")
+    assert index.match("Sam has 30 apples and eats 10 of them. How many apples are left?")["source"] == SOLVED
+
+def test_index_is_shared_through_the_file(index, workdir):
+    other = ProblemIndex(str(workdir / "problems.jsonl"), Perceive())
+    assert other.match("Sam has 9 apples and eats 2 of them. How many apples are left?")["final_answer"] == "7"
@@ -0,0 +1,111 @@
+import gzip
+import json
+import pytest
+import response_encoding
+from response_encoding import apply_detail, encode, negotiate_encoding, negotiate_media_type
+
+RESULT = {
+    "success": True,
+    "conversation": [
+        {"role": "assistant", "content": "FUNCTION_CALL: " + json.dumps({"name": "calculate", "args": {"expression": "12 - 5"}})},
+        {"role": "user", "content": "Result is 7. Let's verify this step."},
+    ] * 20 + [{"role": "assistant", "content": "FINAL_ANSWER: [7]"}],
+    "final_answer": "7",
+}
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(response_encoding, "brotli", None)
+
+@pytest.fixture
+def without_msgpack(monkeypatch):
+    monkeypatch.setattr(response_encoding, "msgpack", None)
+
+@pytest.mark.parametrize("header, encoding", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("*, gzip;q=0", None),
+])
+def test_gzip_negotiation(without_brotli, header, encoding):
+    assert negotiate_encoding(header) == encoding
+
+@pytest.mark.parametrize("header, encoding", [
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br, gzip;q=0", "br"),
+    ("*", "br"),
+])
+def test_brotli_is_preferred_when_installed(header, encoding):
+    pytest.importorskip("brotli")
+    assert negotiate_encoding(header) == encoding
+
+def test_brotli_is_not_offered_when_missing(without_brotli):
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("br, gzip") == "gzip"
+
+@pytest.mark.parametrize("header, media_type", [
+    (None, "application/json"),
+    ("application/json", "application/json"),
+    ("application/msgpack", "application/msgpack"),
+    ("application/x-msgpack", "application/x-msgpack"),
+    ("application/json, application/msgpack;q=0.5", "application/json"),
+    ("application/msgpack;q=0", "application/json"),
+])
+def test_media_type_negotiation(header, media_type):
+    pytest.importorskip("msgpack")
+    assert negotiate_media_type(header) == media_type
+
+def test_json_without_msgpack(without_msgpack):
+    assert negotiate_media_type("application/msgpack") == "application/json"
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_round_trips_with_and_without_orjson(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(response_encoding, "orjson", None)
+    body, stats = encode(RESULT)
+    assert json.loads(body) == RESULT
+    assert stats["encoding"] is None and stats["bytes"] == stats["raw_bytes"] == len(body)
+
+def test_gzip_round_trips():
+    body, stats = encode(RESULT, encoding="gzip")
+    assert json.loads(gzip.decompress(body)) == RESULT
+    assert stats["encoding"] == "gzip" and stats["bytes"] < stats["raw_bytes"]
+
+def test_brotli_round_trips():
+    brotli = pytest.importorskip("brotli")
+    body, stats = encode(RESULT, encoding="br")
+    assert json.loads(brotli.decompress(body)) == RESULT
+    assert stats["encoding"] == "br"
+
+def test_msgpack_round_trips():
+    msgpack = pytest.importorskip("msgpack")
+    body, _ = encode(RESULT, "application/msgpack")
+    assert msgpack.unpackb(body, raw=False) == RESULT
+
+def test_small_bodies_are_not_compressed():
+    body, stats = encode({"success": True}, encoding="gzip")
+    assert stats["encoding"] is None and json.loads(body) == {"success": True}
+
+def test_summary_keeps_the_last_assistant_turn():
+    summary = apply_detail(RESULT, "summary")
+    assert "conversation" not in summary
+    assert summary["turns"] == 41 and summary["last_turn"] == "FINAL_ANSWER: [7]"
+    assert apply_detail(RESULT, "full") is RESULT
+    with pytest.raises(ValueError):
+        apply_detail(RESULT, "brief")
+
+def test_responses_vary_on_the_negotiated_headers(without_brotli):
+    flask_server = pytest.importorskip("flask_server")
+    with flask_server.app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = flask_server.encoded_response(RESULT)
+    assert response.headers["Vary"] == "Accept, Accept-Encoding"
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype == "application/json"
+    assert json.loads(gzip.decompress(response.get_data())) == RESULT
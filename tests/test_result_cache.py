@@ -0,0 +1,53 @@
+import sqlite3
+from memory import Memory
+from result_cache import MemoryTier, ResultCache, SQLiteTier
+from verification import EVALUATOR_VERSION
+
+def make_cache(path):
+    return ResultCache([MemoryTier(16), SQLiteTier(str(path))])
+
+def test_warm_from_shared_fills_the_memory_tier(workdir):
+    writer = make_cache(workdir / "cache.sqlite")
+    writer.set("solve", "problem 1", {"final_answer": "1"})
+    writer.set("solve", "problem 2", {"final_answer": "2"})
+    writer.set("expression", "1+1", 2)
+
+    reader = make_cache(workdir / "cache.sqlite")
+    assert reader.warm_from_shared("solve") == 2
+    assert len(reader.tiers[0]) == 2
+    assert reader.get("solve", "problem 2") == {"final_answer": "2"}
+    assert reader.stats["memory_hits"] == 1
+
+def test_warm_from_shared_without_shared_tier():
+    assert ResultCache([MemoryTier(16)]).warm_from_shared("solve") == 0
+
+class BrokenTier(MemoryTier):
+    name = "broken"
+
+    def get(self, key, now):
+        raise sqlite3.OperationalError("database is locked")
+
+def test_tier_errors_stay_off_stdout(capsys, caplog):
+    cache = ResultCache([BrokenTier(16), MemoryTier(16)])
+    assert cache.get("expression", "1+1") is None
+    assert capsys.readouterr().out == ""
+    assert "database is locked" in caplog.text
+    assert cache.stats["errors"] == 1
+
+def test_history_is_warmed_once_per_shared_cache(workdir):
+    memory = Memory(str(workdir / "memory.json"))
+    memory.add_calculation("2 + 3", 5)
+    assert make_cache(workdir / "cache.sqlite").warm_from_history(memory) == 1
+    cache = make_cache(workdir / "cache.sqlite")
+    assert cache.warm_from_history(memory) == 0
+    assert cache.get("expression", "2+3", (EVALUATOR_VERSION,)) == 5
+
+def test_warming_skips_results_of_an_older_evaluator(workdir):
+    with open(str(workdir / "memory_history.jsonl"), "w") as f:
+        f.write('{"timestamp": 0.0, "expression": "2 ^ 3", "result": 1, "steps": []}\n')
+    memory = Memory(str(workdir / "memory.json"))
+    memory.add_calculation("2 + 3", 5)
+    cache = make_cache(workdir / "cache.sqlite")
+    assert cache.warm_from_history(memory) == 1
+    assert cache.get("expression", "2^3", (EVALUATOR_VERSION,)) is None
+    assert cache.get("expression", "2+3", (EVALUATOR_VERSION,)) == 5
@@ -0,0 +1,26 @@
+import scheduler
+from scheduler import FairScheduler
+
+def test_idle_keys_are_evicted_beyond_the_cap(monkeypatch):
+    monkeypatch.setattr(scheduler, "MAX_TRACKED_KEYS", 8)
+    fair = FairScheduler(max_concurrent=4, rate=None)
+    held = fair.acquire("busy")
+    for i in range(100):
+        with fair.slot(f"key-{i}"):
+            pass
+    keys = fair.metrics()["keys"]
+    assert len(keys) == 8
+    assert keys["busy"]["running"] == 1
+    assert "key-99" in keys and "key-0" not in keys
+    fair.release(held)
+    assert fair.metrics()["keys"]["busy"]["completed"] == 1
+
+def test_returning_key_keeps_its_counters(monkeypatch):
+    monkeypatch.setattr(scheduler, "MAX_TRACKED_KEYS", 4)
+    fair = FairScheduler(max_concurrent=2, rate=None)
+    for i in range(10):
+        with fair.slot("regular"):
+            pass
+        with fair.slot(f"once-{i}"):
+            pass
+    assert fair.metrics()["keys"]["regular"]["completed"] == 10
@@ -0,0 +1,111 @@
+import json
+import math
+import pytest
+import number_theory
+from action import Action
+from memory import Memory
+from perceive import Perceive
+from tool_registry import TOOLS, make_tool_function, validate_arguments
+
+# One valid call per registered tool
+CALLS = {
+    "show_reasoning": {"steps": ["add the apples"]},
+    "calculate": {"expression": "2 + 3"},
+    "verify": {"expression": "2 + 3", "expected": 5},
+    "check_consistency": {"steps": ["2 + 3 = 5", "5 * 2 = 10"]},
+    "fallback_reasoning": {"step_description": "not sure"},
+    "calculate_many": {"expressions": ["1 + 1", "2 * 3"]},
+    "verify_many": {"pairs": [{"expression": "1 + 1", "expected": 2}]},
+    "calculate_and_verify": {"expression": "4 * 4", "expected": 16},
+    "evaluation_stats": {},
+    "add": {"a": 2, "b": 3},
+    "subtract": {"a": 2, "b": 3},
+    "multiply": {"a": 2, "b": 3},
+    "divide": {"a": 3, "b": 2},
+    "power": {"a": 2, "b": 10},
+    "sqrt": {"a": 16},
+    "cbrt": {"a": 27},
+    "factorial": {"a": 5},
+    "log": {"a": 1},
+    "remainder": {"a": 7, "b": 3},
+    "sin": {"a": 0},
+    "cos": {"a": 0},
+    "tan": {"a": 0},
+    "mine": {"a": 2, "b": 3},
+    "strings_to_chars_to_int": {"string": "Hi"},
+    "int_list_to_exponential_sum": {"int_list": [0, 0]},
+    "fibonacci": {"n": 10},
+    "fibonacci_numbers": {"n": 5},
+    "sqrt_many": {"a": [4, 9]},
+    "cbrt_many": {"a": [8, 27]},
+    "log_many": {"a": [1, 1]},
+    "sin_many": {"a": [0, 0]},
+    "cos_many": {"a": [0, 0]},
+    "tan_many": {"a": [0, 0]},
+    "factorial_many": {"a": [3, 4]},
+    "power_many": {"a": [2, 3], "b": 2},
+    "remainder_many": {"a": [7, 8], "b": 3},
+}
+
+@pytest.fixture
+def action(workdir):
+    return Action(Memory(str(workdir / "memory.json")), Perceive(), sink=None)
+
+def call_tool(action, name, arguments):
+    tool = make_tool_function(TOOLS[name], action)
+    return tool(**validate_arguments(name, arguments)).text
+
+def test_every_tool_has_a_call():
+    assert set(CALLS) == set(TOOLS)
+
+@pytest.mark.parametrize("name", sorted(TOOLS))
+def test_every_tool_answers(action, name):
+    text = call_tool(action, name, CALLS[name])
+    assert not text.startswith("Error"), text
+
+def test_ascii_values_field(action):
+    assert json.loads(call_tool(action, "strings_to_chars_to_int", {"string": "Hi"})) == {"ascii_values": [72, 105]}
+
+@pytest.mark.parametrize("a, b, expected", [(2, 10, 1024), (2, -1, 0.5), (4, -2, 0.0625)])
+def test_power_accepts_fractional_results(action, a, b, expected):
+    assert json.loads(call_tool(action, "power", {"a": a, "b": b})) == {"result": expected}
+
+@pytest.mark.parametrize("name, arguments, expected", [
+    ("power_many", {"a": 2, "b": 3}, 8),
+    ("power_many", {"a": [2, 3], "b": [3, 2]}, [8, 9]),
+    ("remainder_many", {"a": 7, "b": 3}, 1),
+])
+def test_batch_tools_accept_two_scalars(action, name, arguments, expected):
+    assert json.loads(call_tool(action, name, arguments)) == {"result": expected}
+
+@pytest.mark.parametrize("name, arguments", [
+    ("power", {"a": 10, "b": 400}),
+    ("power_many", {"a": 10, "b": 400}),
+    ("power_many", {"a": [2, 10], "b": 400}),
+])
+def test_power_overflow_is_an_error(action, name, arguments):
+    assert call_tool(action, name, arguments) == "Error: math range error"
+
+@pytest.mark.parametrize("arguments", [{"a": 0, "b": -1}, {"a": [1, 0], "b": -1}])
+def test_power_of_zero_to_negative_is_an_error(action, arguments):
+    assert call_tool(action, "power_many", arguments).startswith("Error: Cannot raise zero to a negative power")
+
+def test_results_past_4300_digits(action, workdir):
+    number_theory.allow_result_digits()
+    assert len(str(json.loads(call_tool(action, "factorial", {"a": 2000}))["result"])) == 5736
+    assert len(call_tool(action, "calculate", {"expression": "2 ** 20000"})) == 6021
+    assert json.loads(call_tool(action, "fibonacci", {"n": 30000}))["result"] % 10 == 0
+
+def test_fibonacci_numbers_history_is_a_summary(action):
+    assert len(json.loads(call_tool(action, "fibonacci_numbers", {"n": 3000}))["result"]) == 3000
+    record = action.memory.get_calculation_history(1)[0]
+    assert record["expression"] == "fibonacci_numbers(3000)"
+    assert record["result"] == {"count": 3000, "last_digit_count": 627}
+
+def test_exp_sum_modes(action):
+    assert json.loads(call_tool(action, "int_list_to_exponential_sum", {"int_list": [0, 0]})) == {"result": 2.0}
+    log = json.loads(call_tool(action, "int_list_to_exponential_sum", {"int_list": [1000, 1000], "mode": "log"}))
+    assert log["result"] == pytest.approx(1000 + math.log(2))
+    exact = json.loads(call_tool(action, "int_list_to_exponential_sum", {"int_list": [1000], "mode": "exact"}))
+    assert exact["result"].startswith("1.970071114017046993888879352")
+    assert call_tool(action, "int_list_to_exponential_sum", {"int_list": [1000]}) == "Error: math range error"
@@ -0,0 +1,56 @@
+import pytest
+from action import Action
+from decision import Decision
+from evaluation_context import EvaluationContext, using
+from memory import Memory
+from perceive import Perceive
+from verification import STEP_TIMEOUT, VerificationExecutor
+
+# Takes far longer than any step budget below
+SLOW = "9 ** 9 ** 9"
+
+@pytest.fixture
+def executor():
+    with VerificationExecutor(processes=1, step_timeout=0.5) as executor:
+        yield executor
+
+def test_slow_step_times_out(executor):
+    assert executor.verify_many([(SLOW, "1"), ("2 + 3", "5"), ("2 * 3", "7")]) == [
+        STEP_TIMEOUT, "verified", "calculation_error"]
+
+def test_slow_expression_raises(executor):
+    with pytest.raises(TimeoutError):
+        executor.evaluate(SLOW)
+    assert executor.evaluate("2 ^ 10") == 1024
+
+def test_action_calculate_times_out(executor, workdir):
+    action = Action(Memory(str(workdir / "memory.json")), Perceive(), sink=None, executor=executor)
+    assert action.decision.executor is executor
+    assert action.calculate(SLOW).text.startswith("Error: Evaluation exceeded")
+    assert action.calculate("6 * 7").text == "42"
+
+def test_action_calculate_times_out_within_a_solve(executor, workdir):
+    action = Action(Memory(str(workdir / "memory.json")), Perceive(), sink=None, executor=executor)
+    with using(EvaluationContext()):
+        assert action.calculate(SLOW).text.startswith("Error: Evaluation exceeded")
+        assert action.verify(SLOW, 1).text.startswith("Error: Evaluation exceeded")
+        assert action.calculate("6 * 7").text == "42"
+
+class TimingOutExecutor:
+    """Stand-in executor whose steps always overrun, counting how often it is asked."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def verify_many(self, pairs):
+        self.calls += 1
+        return [STEP_TIMEOUT] * len(pairs)
+
+def test_timeouts_are_not_cached(workdir):
+    executor = TimingOutExecutor()
+    decision = Decision(Memory(str(workdir / "memory.json")), executor=executor)
+    steps = ["2 + 3 = 5", "5 * 2 = 10"]
+    first = decision.check_consistency(steps)
+    assert [report["checks"][0] for report in first["steps"]] == [STEP_TIMEOUT, STEP_TIMEOUT]
+    decision.check_consistency(steps)
+    assert executor.calls == 2
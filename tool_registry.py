@@ -0,0 +1,166 @@
+from typing import Any, Dict, Iterable, Literal, NamedTuple, Optional, Type, Union, get_args, get_origin
+import inspect
+from pydantic import BaseModel
+from mcp.types import TextContent
+import models
+from profiling import StackSampler, is_valid_trace_id, write_profile
+from evaluation_context import context_for, using
+
+class ToolSpec(NamedTuple):
+    """Binds a tool's Input/Output models to the Action method that implements it."""
+    name: str
+    method: str
+    input_model: Type[BaseModel]
+    output_model: Type[BaseModel]
+    description: str
+    # Field of the output model that holds the method's return value
+    result_field: str = "result"
+
+def _spec(name: str, method: str, schema: str, description: str, result_field: str = "result") -> ToolSpec:
+    return ToolSpec(name, method, getattr(models, f"{schema}Input"), getattr(models, f"{schema}Output"), description,
+                    result_field)
+
+# The single definition of the tool surface: one entry per tool
+TOOLS: Dict[str, ToolSpec] = {spec.name: spec for spec in [
+    # Text/reasoning tools
+    _spec("show_reasoning", "show_reasoning", "ShowReasoning", "Display your reasoning steps."),
+    _spec("calculate", "calculate", "Calculate", "Calculate the result of an expression."),
+    _spec("verify", "verify", "Verify", "Check if a calculation is correct."),
+    _spec("check_consistency", "check_consistency", "CheckConsistency",
+          "Check if calculation steps ('expression = result') are consistent with each other."),
+    _spec("fallback_reasoning", "fallback_reasoning", "FallbackReasoning",
+          "Use this if a tool fails or you are uncertain how to proceed."),
+    _spec("calculate_many", "calculate_many", "CalculateMany",
+          "Calculate several independent expressions in one call."),
+    _spec("verify_many", "verify_many", "VerifyMany", "Check several calculations in one call."),
+    _spec("calculate_and_verify", "calculate_and_verify", "CalculateAndVerify",
+          "Calculate an expression and check it against your expected value in one call."),
+    _spec("evaluation_stats", "evaluation_stats", "EvaluationStats",
+          "How much of this session's evaluation work was reused."),
+    # Basic math operations
+    _spec("add", "add", "Add", "Add two numbers."),
+    _spec("subtract", "subtract", "Subtract", "Subtract two numbers."),
+    _spec("multiply", "multiply", "Multiply", "Multiply two numbers."),
+    _spec("divide", "divide", "Divide", "Divide two numbers."),
+    _spec("power", "power", "Power", "Power of two numbers."),
+    _spec("sqrt", "sqrt", "Sqrt", "Square root of a number."),
+    _spec("cbrt", "cbrt", "Cbrt", "Cube root of a number."),
+    _spec("factorial", "factorial", "Factorial", "Factorial of a number."),
+    _spec("log", "log", "Log", "Natural log of a number."),
+    _spec("remainder", "remainder", "Remainder", "Remainder of two numbers division."),
+    _spec("sin", "sin", "Sin", "Sin of a number (radians)."),
+    _spec("cos", "cos", "Cos", "Cos of a number (radians)."),
+    _spec("tan", "tan", "Tan", "Tan of a number (radians)."),
+    _spec("mine", "mine", "Mine", "Special mining tool."),
+    _spec("strings_to_chars_to_int", "strings_to_chars_to_int", "StringsToInts",
+          "Return the ASCII values of the characters in a word.", result_field="ascii_values"),
+    _spec("int_list_to_exponential_sum", "int_list_to_exponential_sum", "ExpSum",
+          "Return sum of exponentials of numbers in a list; mode \"log\" returns the log of the sum "
+          "and \"exact\" an exact decimal, for values too large for \"float\"."),
+    _spec("fibonacci", "fibonacci", "Fibonacci", "Return the nth Fibonacci number."),
+    _spec("fibonacci_numbers", "fibonacci_numbers", "FibonacciNumbers", "Return the first n Fibonacci numbers."),
+    # Batch (elementwise) math operations
+    _spec("sqrt_many", "sqrt", "SqrtBatch", "Square root of every number in a list."),
+    _spec("cbrt_many", "cbrt", "CbrtBatch", "Cube root of every number in a list."),
+    _spec("log_many", "log", "LogBatch", "Natural log of every number in a list."),
+    _spec("sin_many", "sin", "SinBatch", "Sine of every number in a list (radians)."),
+    _spec("cos_many", "cos", "CosBatch", "Cosine of every number in a list (radians)."),
+    _spec("tan_many", "tan", "TanBatch", "Tangent of every number in a list (radians)."),
+    _spec("factorial_many", "factorial", "FactorialBatch", "Factorial of every number in a list."),
+    _spec("power_many", "power", "PowerBatch", "Elementwise a ** b; either side may be a single number."),
+    _spec("remainder_many", "remainder", "RemainderBatch", "Elementwise a % b; either side may be a single number."),
+]}
+
+# Errors an Action method raises for bad input, reported back as text instead of failing the call
+TOOL_ERRORS = (ValueError, ArithmeticError, ImportError)
+
+def validate_arguments(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate tool-call arguments against the tool's input model.
+
+    Raises ValueError for an unknown tool and pydantic's ValidationError (also a
+    ValueError) for bad arguments.
+    """
+    spec = TOOLS.get(name)
+    if spec is None:
+        raise ValueError(f"Unknown tool: {name}")
+    return spec.input_model.model_validate(arguments).model_dump()
+
+def to_text_content(spec: ToolSpec, result: Any) -> TextContent:
+    """Wrap an Action method's return value as the tool's text result."""
+    if isinstance(result, TextContent):
+        return result
+    return TextContent(type="text", text=spec.output_model(**{spec.result_field: result}).model_dump_json(exclude_none=True))
+
+def make_tool_function(spec: ToolSpec, action):
+    """Build the function MCP calls for a tool, with a signature taken from its input model."""
+    from mcp.server.fastmcp import Context
+    method = getattr(action, spec.method)
+
+    def call(arguments) -> TextContent:
+        try:
+            return to_text_content(spec, method(**arguments))
+        except TOOL_ERRORS as e:
+            return TextContent(type="text", text=f"Error: {str(e)}")
+
+    def tool(trace_id: Optional[str] = None, ctx: Optional[Context] = None, **arguments) -> TextContent:
+        # Calls from one MCP session, i.e. one solve, share its evaluation context
+        try:
+            context = context_for(ctx.session)
+        except (AttributeError, ValueError):
+            context = None
+        with using(context):
+            # A trace id from a profiled request samples this call into the trace's tool profile
+            if not is_valid_trace_id(trace_id):
+                return call(arguments)
+            with StackSampler(root=f"tool:{spec.name}", base_code=call.__code__) as sampler:
+                result = call(arguments)
+            write_profile(trace_id, "tools", sampler)
+            return result
+
+    tool.__name__ = spec.name
+    tool.__doc__ = spec.description
+    tool.__signature__ = inspect.Signature(
+        [
+            inspect.Parameter(field, inspect.Parameter.KEYWORD_ONLY, annotation=info.annotation)
+            for field, info in spec.input_model.model_fields.items()
+        ] + [
+            inspect.Parameter("trace_id", inspect.Parameter.KEYWORD_ONLY, default=None,
+                              annotation=Optional[str]),
+            # FastMCP passes the request context to the parameter annotated with Context
+            inspect.Parameter("ctx", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Context)
+        ],
+        return_annotation=TextContent
+    )
+    return tool
+
+def register_mcp_tools(mcp, action, names: Optional[Iterable[str]] = None):
+    """Register tools from the registry on a FastMCP server, all of them unless `names` is given."""
+    for name in names or TOOLS:
+        spec = TOOLS[name]
+        mcp.add_tool(make_tool_function(spec, action), name=spec.name, description=spec.description)
+
+def _type_name(annotation: Any) -> str:
+    """Prompt-friendly spelling of a field type; nested models are written out as their fields."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return "{" + _field_list(annotation) + "}"
+    origin = get_origin(annotation)
+    if origin is None:
+        return annotation.__name__ if isinstance(annotation, type) else str(annotation).replace("typing.", "")
+    if origin is Literal:
+        return "Literal[" + ", ".join(repr(arg) for arg in get_args(annotation)) + "]"
+    args = [arg for arg in get_args(annotation) if arg is not type(None)]
+    names = ", ".join(_type_name(arg) for arg in args)
+    if origin is Union:
+        return f"Optional[{names}]" if len(args) < len(get_args(annotation)) else f"Union[{names}]"
+    return f"{origin.__name__.title()}[{names}]"
+
+def _field_list(model: Type[BaseModel]) -> str:
+    return ", ".join(f"{field}: {_type_name(info.annotation)}" for field, info in model.model_fields.items())
+
+def describe_tools(names: Iterable[str]) -> str:
+    """One prompt line per tool: its call signature and description."""
+    lines = []
+    for name in names:
+        spec = TOOLS[name]
+        lines.append(f"{spec.name}({_field_list(spec.input_model)}) - {spec.description}")
+    return "\n".join(lines)
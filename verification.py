@@ -0,0 +1,121 @@
+from typing import Any, Callable, List, Optional, Tuple
+import math
+import multiprocessing
+import os
+import re
+
+# Version of evaluate_expression's semantics, stored with every result it produces. Bump it
+# whenever the same text can evaluate differently (as when ^ became power), so results of
+# the old evaluator stop being served from the memory's index or the result cache.
+EVALUATOR_VERSION = 2
+
+# Verification check code for a step that ran out of time
+STEP_TIMEOUT = "verification_timeout"
+
+# math.* names an expression may use; everything else besides numbers and operators is refused
+MATH_NAMES = ("sqrt", "cbrt", "factorial", "log10", "log2", "log", "exp", "sin", "cos", "tan",
+              "floor", "ceil", "fabs", "pi", "e")
+
+# One allowed token: a number, an operator, a parenthesis or comma, or an allowed math.* name
+SAFE_TOKEN = re.compile(r"\s*(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|\*\*|[-+*/%()^,]|math\.(?:"
+                        + "|".join(MATH_NAMES) + r")\b)")
+
+# Names visible to evaluated expressions: math, and no builtins
+EVAL_GLOBALS = {"__builtins__": {}, "math": math}
+
+def safe_expression(expression: str) -> str:
+    """The expression ready for eval, with ^ as power as in Perceive; raises ValueError for anything
+    but numbers, arithmetic operators and math.* functions."""
+    position, end = 0, len(expression.rstrip())
+    while position < end:
+        match = SAFE_TOKEN.match(expression, position)
+        if not match:
+            raise ValueError(f"Unsupported character {expression[position]!r} in expression")
+        position = match.end()
+    return expression.replace("^", "**")
+
+def evaluate_expression(expression: str) -> Any:
+    """Evaluate an arithmetic expression; runs inside a pool worker too."""
+    return eval(safe_expression(expression), EVAL_GLOBALS)
+
+def evaluate_step(expression: str, result: str, evaluate: Callable[[str], Any] = evaluate_expression) -> str:
+    """Evaluate one step and return its verification check code."""
+    try:
+        expected = evaluate(expression)
+        if abs(float(expected) - float(result)) < 1e-10:
+            return "verified"
+        return "calculation_error"
+    except:
+        return "verification_failed"
+
+class VerificationExecutor:
+    """Fans step verification out across a process pool with a per-step time budget.
+
+    An `eval` cannot be interrupted, so a step that overruns its budget is marked
+    as timed out and the pool is restarted to get rid of the busy worker.
+    """
+
+    def __init__(self, processes: Optional[int] = None, step_timeout: float = 2.0):
+        self.processes = processes or os.cpu_count() or 1
+        self.step_timeout = step_timeout
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes)
+        return self._pool
+
+    def _restart_pool(self):
+        """Kill the pool, including any worker stuck on a heavy step."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def verify_many(self, pairs: List[Tuple[str, str]]) -> List[str]:
+        """Verify (expression, result) pairs in parallel, returning a check code per pair.
+
+        Codes match `evaluate_step`, plus STEP_TIMEOUT for steps over budget.
+        """
+        results = [None] * len(pairs)
+        pending = list(range(len(pairs)))
+        while pending:
+            pool = self._get_pool()
+            submitted = [(i, pool.apply_async(evaluate_step, pairs[i])) for i in pending]
+            pending = []
+            # Tasks start in submission order, so each one is running by the time we wait on it
+            for position, (i, async_result) in enumerate(submitted):
+                try:
+                    results[i] = async_result.get(timeout=self.step_timeout)
+                except multiprocessing.TimeoutError:
+                    results[i] = STEP_TIMEOUT
+                    for j, other in submitted[position + 1:]:
+                        if other.ready():
+                            results[j] = other.get()
+                        else:
+                            pending.append(j)
+                    self._restart_pool()
+                    break
+        return results
+
+    def evaluate(self, expression: str) -> Any:
+        """Evaluate a single expression within the step budget, raising TimeoutError when it overruns."""
+        async_result = self._get_pool().apply_async(evaluate_expression, (expression,))
+        try:
+            return async_result.get(timeout=self.step_timeout)
+        except multiprocessing.TimeoutError:
+            self._restart_pool()
+            raise TimeoutError(f"Evaluation exceeded {self.step_timeout}s")
+
+    def close(self):
+        """Shut down the worker pool."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()